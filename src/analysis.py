@@ -0,0 +1,348 @@
+""" Graph analyses over the module import graph.
+
+Graphs are given as adjacency lists over integer node ids: succ[i] is an
+iterable of the ids of the nodes that node i imports, such as the succ of a
+graph.ModuleGraph. Everything here runs in time linear in the size of the
+graph (up to the dominator LCA walks, which are bounded by the dominator tree
+depth) and without recursion, so it works on graphs far larger than the
+recursion limit.
+"""
+
+
+import os
+from collections import deque
+
+
+# Node weights available to critical_path()
+WEIGHT_SIZE = "size"
+WEIGHT_IMPORTTIME = "importtime"
+WEIGHT_BYTECODE = "bytecode"
+WEIGHTS = (WEIGHT_SIZE, WEIGHT_IMPORTTIME, WEIGHT_BYTECODE)
+
+
+def bfs_distances(succ, start, max_depth=None):
+    """ Breadth first search from node start. Returns [(node, distance)] for
+    every node reachable from start (excluded), in the order found, going
+    no further than max_depth edges if given.
+    """
+    seen = {start}
+    found = []
+    frontier = [start]
+    distance = 0
+    while frontier and (max_depth is None or distance < max_depth):
+        distance += 1
+        next_frontier = []
+        for v in frontier:
+            for w in succ[v]:
+                if w not in seen:
+                    seen.add(w)
+                    found.append((w, distance))
+                    next_frontier.append(w)
+        frontier = next_frontier
+    return found
+
+
+def strongly_connected_components(succ):
+    """ Iterative Tarjan's algorithm. Returns the strongly connected
+    components as lists of node ids, in reverse topological order: every
+    component comes before the components that import it.
+    """
+    num_nodes = len(succ)
+    index = [-1] * num_nodes
+    low = [0] * num_nodes
+    on_stack = [False] * num_nodes
+    stack = []
+    sccs = []
+    counter = 0
+    for root in range(num_nodes):
+        if index[root] != -1:
+            continue
+        index[root] = low[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack[root] = True
+        work = [(root, iter(succ[root]))]
+        while work:
+            v, targets = work[-1]
+            for w in targets:
+                if index[w] == -1:
+                    index[w] = low[w] = counter
+                    counter += 1
+                    stack.append(w)
+                    on_stack[w] = True
+                    work.append((w, iter(succ[w])))
+                    break
+                elif on_stack[w] and index[w] < low[v]:
+                    low[v] = index[w]
+            else:
+                work.pop()
+                if work:
+                    u = work[-1][0]
+                    if low[v] < low[u]:
+                        low[u] = low[v]
+                if low[v] == index[v]:
+                    component = []
+                    while True:
+                        w = stack.pop()
+                        on_stack[w] = False
+                        component.append(w)
+                        if w == v:
+                            break
+                    sccs.append(component)
+    return sccs
+
+
+def component_ids(num_nodes, sccs):
+    """ The index in sccs of the component of every node. """
+    comp_of = [0] * num_nodes
+    for c, component in enumerate(sccs):
+        for v in component:
+            comp_of[v] = c
+    return comp_of
+
+
+def condense(succ, sccs):
+    """ Collapse every strongly connected component into a single node.
+
+    Returns (comp_of, comp_succ): the component id of every node, and for
+    every component a {target component: number of edges} dict. Component
+    ids are indexes into sccs, so they are in reverse topological order.
+    """
+    comp_of = component_ids(len(succ), sccs)
+    comp_succ = [{} for _ in sccs]
+    for v, targets in enumerate(succ):
+        cv = comp_of[v]
+        out = comp_succ[cv]
+        for w in targets:
+            cw = comp_of[w]
+            if cw != cv:
+                out[cw] = out.get(cw, 0) + 1
+    return comp_of, comp_succ
+
+
+def shortest_cycle(succ, comp_of, start):
+    """ A shortest cycle through node start, which must be in a cycle, as a
+    list of node ids that starts and ends with start. The breadth first
+    search stays inside start's strongly connected component (comp_of as
+    returned by condense()), so it is linear in the size of the component.
+    """
+    component = comp_of[start]
+    parent = {start: None}
+    queue = deque([start])
+    while queue:
+        v = queue.popleft()
+        for w in succ[v]:
+            if w == start:
+                cycle = [start]
+                while v is not None:
+                    cycle.append(v)
+                    v = parent[v]
+                cycle.reverse()
+                return cycle
+            if comp_of[w] == component and w not in parent:
+                parent[w] = v
+                queue.append(w)
+    raise ValueError("node {} is not in a cycle".format(start))
+
+
+def import_cycles(succ):
+    """ Every import cycle: the strongly connected components of more than
+    one node, and the nodes that import themselves.
+
+    Returns [(<sorted node ids>, <witness cycle>)], largest components
+    first, where the witness is a shortest cycle (see shortest_cycle())
+    through the component's lowest node id.
+    """
+    sccs = strongly_connected_components(succ)
+    comp_of = component_ids(len(succ), sccs)
+    cycles = []
+    for component in sccs:
+        start = min(component)
+        if len(component) == 1 and start not in succ[start]:
+            continue
+        cycles.append((sorted(component), shortest_cycle(succ, comp_of, start)))
+    cycles.sort(key=lambda item: (-len(item[0]), item[0][0]))
+    return cycles
+
+
+def cycle_edges(succ):
+    """ The (source, target) pairs of the edges that are part of a cycle,
+    i.e. whose ends are in the same strongly connected component.
+    """
+    sccs = strongly_connected_components(succ)
+    comp_of = component_ids(len(succ), sccs)
+    return set(
+        (v, w)
+        for component in sccs
+        for v in component
+        for w in succ[v]
+        if comp_of[w] == comp_of[v]
+    )
+
+
+def _code_size(code):
+    """ Total bytecode size of a code object and the ones nested in it. """
+    size = 0
+    todo = [code]
+    while todo:
+        code = todo.pop()
+        size += len(code.co_code)
+        todo.extend(c for c in code.co_consts if hasattr(c, "co_code"))
+    return size
+
+
+def node_weights(names, mod_dict, kind=WEIGHT_SIZE, import_times=None):
+    """ Weight of every node, for critical_path(): the file size in bytes,
+    the self import time in microseconds, or the bytecode size in bytes.
+    Modules outside the project weigh nothing, except by import time, and
+    so do those whose file is gone, e.g. in a graph saved on another machine.
+
+    :param import_times: {name: (self us, cumulative us)} as measured by
+    importtime.profile_entry(), needed to weigh by import time; it covers
+    vendor modules too, which aren't in mod_dict
+    """
+    weights = [0] * len(names)
+    for i, name in enumerate(names):
+        if kind == WEIGHT_IMPORTTIME:
+            import_time = import_times.get(name) if import_times else None
+            weights[i] = import_time[0] if import_time else 0
+            continue
+        if kind not in (WEIGHT_SIZE, WEIGHT_BYTECODE):
+            raise ValueError("unknown weight {!r}".format(kind))
+        module = mod_dict.get(name)
+        if module is None or not module.__file__:
+            continue
+        try:
+            if kind == WEIGHT_SIZE:
+                weights[i] = os.path.getsize(module.__file__)
+            else:
+                with open(module.__file__, "rb") as fp:
+                    code = compile(fp.read() + b"\n", module.__file__, "exec")
+                weights[i] = _code_size(code)
+        except (IOError, OSError):
+            continue
+    return weights
+
+
+def _reachable(comp_succ, start):
+    """ Components reachable from start (included), as a list of flags. """
+    seen = [False] * len(comp_succ)
+    seen[start] = True
+    todo = [start]
+    while todo:
+        c = todo.pop()
+        for d in comp_succ[c]:
+            if not seen[d]:
+                seen[d] = True
+                todo.append(d)
+    return seen
+
+
+class CriticalPathReport(object):
+    """ Result of critical_path().
+
+    path: [(<component node ids>, <component weight>)] the heaviest import
+        chain from the entry, starting with the entry's component
+    total: total weight of path
+    reachable_weight: total weight of everything the entry imports, itself
+        included
+    deferrable: [(<importer id>, <imported id>, <weight removed>,
+        <number of nodes removed>)] the imports which, if deferred (moved
+        into the functions that need them), remove the most weight from the
+        entry's import, heaviest first
+    """
+
+    def __init__(self, path, total, reachable_weight, deferrable):
+        self.path = path
+        self.total = total
+        self.reachable_weight = reachable_weight
+        self.deferrable = deferrable
+
+
+def critical_path(succ, weights, entry, top=10):
+    """ Find the heaviest import chain starting at node entry, and the top
+    imports whose deferral would remove the most weight from it.
+
+    Import cycles are handled by condensing strongly connected components:
+    importing any module of a cycle imports all of it.
+    """
+    sccs = strongly_connected_components(succ)
+    comp_of, comp_succ = condense(succ, sccs)
+    comp_weight = [sum(weights[v] for v in component) for component in sccs]
+    num_comps = len(sccs)
+    start = comp_of[entry]
+    reachable = _reachable(comp_succ, start)
+
+    # Heaviest chain: components are in reverse topological order, so every
+    # component's successors are done before it
+    best = [0] * num_comps
+    best_next = [-1] * num_comps
+    for c in range(num_comps):
+        if not reachable[c]:
+            continue
+        heaviest = 0
+        for d in comp_succ[c]:
+            if best[d] > heaviest or best_next[c] == -1:
+                heaviest = best[d]
+                best_next[c] = d
+        best[c] = comp_weight[c] + heaviest
+    path = []
+    c = start
+    while c != -1:
+        path.append((sorted(sccs[c]), comp_weight[c]))
+        c = best_next[c]
+
+    # Dominators of the condensed DAG, in topological order. A component's
+    # immediate dominator is the nearest common dominator of its importers.
+    preds = [[] for _ in range(num_comps)]
+    for c in range(num_comps):
+        if reachable[c]:
+            for d in comp_succ[c]:
+                preds[d].append(c)
+    idom = [-1] * num_comps
+    depth = [0] * num_comps
+    idom[start] = start
+    for c in range(num_comps - 1, -1, -1):
+        if not reachable[c] or c == start:
+            continue
+        dom = -1
+        for p in preds[c]:
+            if dom == -1:
+                dom = p
+                continue
+            a, b = dom, p
+            while a != b:
+                if depth[a] >= depth[b]:
+                    a = idom[a]
+                else:
+                    b = idom[b]
+            dom = a
+        idom[c] = dom
+        depth[c] = depth[dom] + 1
+
+    # Weight and size of each dominator subtree, i.e. of everything that is
+    # only imported through that component
+    sub_weight = list(comp_weight)
+    sub_count = [len(component) for component in sccs]
+    for c in range(num_comps):
+        if reachable[c] and c != start:
+            sub_weight[idom[c]] += sub_weight[c]
+            sub_count[idom[c]] += sub_count[c]
+
+    # Deferring an import u -> v only unloads v's component if it is the
+    # only edge into it; then everything v dominates goes away with it
+    deferrable = []
+    for c in range(num_comps):
+        if not reachable[c] or c == start or len(preds[c]) != 1:
+            continue
+        p = preds[c][0]
+        if comp_succ[p][c] != 1:
+            continue
+        importer = next(
+            v for v in sccs[p] if any(comp_of[w] == c for w in succ[v])
+        )
+        imported = next(w for w in succ[importer] if comp_of[w] == c)
+        deferrable.append((importer, imported, sub_weight[c], sub_count[c]))
+    deferrable.sort(key=lambda item: (-item[2], item[0], item[1]))
+
+    return CriticalPathReport(path, best[start], sub_weight[start], deferrable[:top])
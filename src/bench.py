@@ -0,0 +1,985 @@
+#!/usr/bin/env python3
+""" Micro-benchmarks for import-visualizer.
+
+Usage: python src/bench.py <benchmark> [options]
+
+`suite` times every stage of a run on a generated project, to catch
+regressions between commits:
+
+    python src/bench.py suite --json before.json
+    (change things)
+    python src/bench.py suite --compare before.json
+"""
+
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import timeit
+
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def _median(values):
+    values = sorted(values)
+    mid = len(values) // 2
+    if len(values) % 2:
+        return values[mid]
+    return (values[mid - 1] + values[mid]) / 2.0
+
+
+def _report(label, seconds):
+    print("{:<40} {:>10.2f} ms".format(label, seconds * 1000))
+
+
+def _time_subprocess(code, runs):
+    """ Median wall time of running `python -c code` from the src dir. """
+    cmd = [sys.executable, "-W", "ignore", "-c", code]
+    times = []
+    for _ in range(runs):
+        start = timeit.default_timer()
+        subprocess.check_call(cmd, cwd=SRC_DIR)
+        times.append(timeit.default_timer() - start)
+    return _median(times)
+
+
+def bench_startup(args):
+    """ Time `import vis` in a fresh interpreter, next to the cost of
+    building the stdlib index by walking the stdlib directory (what every
+    import used to pay for).
+    """
+    import libinfo
+
+    _report("python -c pass", _time_subprocess("pass", args.runs))
+    _report("python -c 'import vis'", _time_subprocess("import vis", args.runs))
+    walk = timeit.repeat(libinfo.get_std_lib_modules, number=1, repeat=args.runs)
+    _report("stdlib directory walk", _median(walk))
+    index = _time_subprocess(
+        "import libinfo; libinfo.is_std_lib_module('os', 3)", args.runs
+    )
+    _report("import libinfo + first stdlib lookup", index)
+
+
+def _synthetic_names(count):
+    """ Dotted names drawn from stdlib, third party and unknown roots, with
+    depth 1 to 4 and some repetition, like the imports of a real project.
+    """
+    import random
+
+    rng = random.Random(0)
+    roots = ["os", "xml", "json", "email", "yaml", "django", "numpy", "myapp"]
+    roots += ["pkg{}".format(i) for i in range(200)]
+    parts = ["core", "utils", "models", "views", "api", "dom", "path", "mime"]
+    names = []
+    for _ in range(count):
+        depth = rng.randint(0, 3)
+        name = rng.choice(roots)
+        for _ in range(depth):
+            name += "." + rng.choice(parts) + str(rng.randint(0, 50))
+        names.append(name)
+    return names
+
+
+def bench_classify(args):
+    """ Classify a million synthetic dotted names with the prefix-joining
+    lookups and with a ModuleClassifier, and time building and loading the
+    index of installed distributions.
+    """
+    import libinfo
+
+    names = _synthetic_names(args.names)
+    std_modules = libinfo.std_lib_modules()
+    first_party = {"myapp", "myapp.core1"}
+
+    def legacy():
+        in_collection = libinfo.is_in_module_collection
+        for name in names:
+            if name in first_party:
+                continue
+            if (
+                in_collection(libinfo.python3_std_lib_modules, name)
+                or name in std_modules
+            ):
+                continue
+            in_collection(libinfo.third_party_modules, name)
+
+    def classifier():
+        classify = libinfo.ModuleClassifier(first_party).classify
+        for name in names:
+            classify(name)
+
+    def classifier_warm(classify=libinfo.ModuleClassifier(first_party).classify):
+        for name in names:
+            classify(name)
+
+    print("{} names, {} unique".format(len(names), len(set(names))))
+    _report("prefix joins", min(timeit.repeat(legacy, number=1, repeat=args.runs)))
+    _report(
+        "ModuleClassifier (fresh memo)",
+        min(timeit.repeat(classifier, number=1, repeat=args.runs)),
+    )
+    _report(
+        "ModuleClassifier (warm memo)",
+        min(timeit.repeat(classifier_warm, number=1, repeat=args.runs)),
+    )
+
+    import distinfo
+
+    dirs = distinfo.site_packages_dirs()
+    index = distinfo.load_index(dirs)
+    print("{} installed top level names".format(len(index)))
+    _report(
+        "build distribution index",
+        min(timeit.repeat(lambda: distinfo.build_index(dirs), number=1, repeat=3)),
+    )
+    _report(
+        "load cached distribution index",
+        min(timeit.repeat(lambda: distinfo.load_index(dirs), number=1, repeat=3)),
+    )
+
+
+def _generated_module(megabytes):
+    """ Source shaped like a protobuf generated _pb2.py file: a few imports,
+    then a large serialized descriptor and lots of repetitive statements.
+    """
+    lines = [
+        "from google.protobuf import descriptor as _descriptor",
+        "from google.protobuf import descriptor_pool as _descriptor_pool",
+        "from google.protobuf import symbol_database as _symbol_database",
+        "from google.protobuf.internal import builder as _builder",
+        "_sym_db = _symbol_database.Default()",
+        "DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'{}')".format(
+            "\\x0a\\x12" * (megabytes * 50000)
+        ),
+    ]
+    i = 0
+    while sum(len(line) for line in lines) < megabytes * 1000000:
+        lines.append(
+            "_MESSAGE{0} = DESCRIPTOR.message_types_by_name['Message{0}']".format(i)
+        )
+        lines.append("_MESSAGE{0}._serialized_start = {0}".format(i))
+        i += 1
+    return "\n".join(lines).encode("utf-8")
+
+
+def _read_sources(root):
+    """ The contents of every .py file under root. """
+    sources = []
+    for top, _, files in os.walk(root):
+        for nm in files:
+            if nm.endswith(".py"):
+                with open(os.path.join(top, nm), "rb") as fp:
+                    sources.append(fp.read())
+    return sources
+
+
+def bench_extract(args):
+    """ Compare the extractor backends on a generated multi-megabyte module,
+    or on every .py file under --path. Reports time and peak allocations.
+    """
+    import tracemalloc
+    import extract
+
+    if args.path:
+        sources = _read_sources(args.path)
+    else:
+        sources = [_generated_module(args.megabytes)]
+    print(
+        "{} file(s), {:.1f} MB".format(
+            len(sources), sum(len(s) for s in sources) / 1e6
+        )
+    )
+
+    for name, scan in sorted(extract.EXTRACTORS.items()):
+
+        def run():
+            for source in sources:
+                try:
+                    scan(source)
+                except (SyntaxError, ValueError):
+                    pass
+
+        seconds = min(timeit.repeat(run, number=1, repeat=args.runs))
+        tracemalloc.start()
+        run()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print(
+            "{:<40} {:>10.2f} ms {:>10.1f} MB peak".format(
+                name, seconds * 1000, peak / 1e6
+            )
+        )
+
+
+def _walk_opargs(code, materialize):
+    """ Count the IMPORT_NAMEs of code and its nested code objects the way
+    the scanners used to: through extract._unpack_opargs(), whose list
+    modulefinder materializes first.
+    """
+    import extract
+    from types import CodeType
+
+    instructions = extract._unpack_opargs(code.co_code)
+    if materialize:
+        instructions = list(instructions)
+    found = 0
+    op1 = op2 = None
+    for _, op, arg in instructions:
+        if op == extract.EXTENDED_ARG or op == extract.CACHE:
+            continue
+        if op == extract.IMPORT_NAME and op1 == op2 == extract.LOAD_CONST:
+            found += 1
+        elif op == extract.LOAD_CONST and isinstance(code.co_consts[arg], CodeType):
+            found += _walk_opargs(code.co_consts[arg], materialize)
+        op2, op1 = op1, op
+    return found
+
+
+def bench_walker(args):
+    """ Walk the bytecode of a generated multi-megabyte module (or of every
+    .py file under --path), compiled beforehand, with the old opargs
+    walkers and with the memoryview walker of the bytecode extractor.
+    """
+    import tracemalloc
+    import extract
+
+    if args.path:
+        codes = []
+        for source in _read_sources(args.path):
+            try:
+                codes.append(compile(source, "<source>", "exec"))
+            except (SyntaxError, ValueError):
+                pass
+    else:
+        codes = [compile(_generated_module(args.megabytes), "<generated>", "exec")]
+    units = sum(len(code.co_code) // 2 for code in codes)
+    print("{} code object(s), {} top level code units".format(len(codes), units))
+
+    walkers = [
+        ("opargs list", lambda code: _walk_opargs(code, True)),
+        ("opargs generator", lambda code: _walk_opargs(code, False)),
+        (
+            "memoryview code units",
+            lambda code: extract._scan_code_imports(code, extract.MODULE_SCOPE, []),
+        ),
+    ]
+    for label, walk in walkers:
+
+        def run():
+            for code in codes:
+                walk(code)
+
+        seconds = min(timeit.repeat(run, number=1, repeat=args.runs))
+        tracemalloc.start()
+        run()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print(
+            "{:<40} {:>10.2f} ms {:>10.1f} MB peak".format(
+                label, seconds * 1000, peak / 1e6
+            )
+        )
+
+
+def _random_graph(modules, fanout, cycle_share):
+    """ A ModuleGraph of dotted module names where most imports point to
+    modules that sort later (no cycles), and cycle_share of them to any
+    module.
+    """
+    import random
+    from graph import GraphBuilder
+
+    rng = random.Random(0)
+    builder = GraphBuilder()
+    for i in range(modules):
+        builder.add_node("pkg{}.sub{}.mod{}".format(i % 97, i % 13, i), internal=True)
+    for src in range(modules):
+        for _ in range(fanout):
+            if rng.random() < cycle_share:
+                dst = rng.randrange(modules)
+            else:
+                dst = rng.randrange(src, modules)
+            if dst != src:
+                builder.add_edge(src, dst)
+    return builder.build()
+
+
+def bench_cycles(args):
+    """ Find the import cycles of a random graph of --modules modules. """
+    from analysis import import_cycles
+    from render import module_cycle_edges
+
+    start = timeit.default_timer()
+    graph = _random_graph(args.modules, 8, 0.0005)
+    _report("build graph", timeit.default_timer() - start)
+    print("{} modules, {} imports".format(len(graph), graph.num_edges))
+
+    def run():
+        return import_cycles(graph.succ)
+
+    seconds = min(timeit.repeat(run, number=1, repeat=args.runs))
+    cycles = run()
+    print(
+        "{} cycle(s), largest {} modules".format(
+            len(cycles), len(cycles[0][0]) if cycles else 0
+        )
+    )
+    _report("import_cycles", seconds)
+    edges = timeit.repeat(
+        lambda: module_cycle_edges(graph), number=1, repeat=args.runs
+    )
+    _report("module_cycle_edges", min(edges))
+
+
+def bench_snapshot(args):
+    """ Save and load a snapshot of a random graph of --modules modules. """
+    from snapshot import load_graph, save_graph
+
+    graph = _random_graph(args.modules, 8, 0.0005)
+    print("{} modules, {} imports".format(len(graph), graph.num_edges))
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        path = os.path.join(tmp_dir, "graph.snapshot")
+        save = timeit.repeat(
+            lambda: save_graph(graph, path), number=1, repeat=args.runs
+        )
+        _report("save_graph", min(save))
+        print("{:.1f} MB".format(os.path.getsize(path) / 1e6))
+        for use_mmap in (True, False):
+            load = timeit.repeat(
+                lambda: load_graph(path, use_mmap), number=1, repeat=args.runs
+            )
+            _report("load_graph{}".format("" if use_mmap else " (no mmap)"), min(load))
+    finally:
+        shutil.rmtree(tmp_dir)
+
+
+def _make_tree(root, files):
+    """ A project tree of about `files` files: python packages, plus the
+    node_modules, .git objects and virtualenv that discovery has to skip.
+    """
+    shares = [
+        ("src", 0.2, ".py"),
+        ("node_modules", 0.45, ".js"),
+        (".git/objects", 0.2, ""),
+        ("env/lib/site-packages", 0.15, ".py"),
+    ]
+    for top, share, suffix in shares:
+        count = int(files * share)
+        for i in range(count):
+            if i % 50 == 0:
+                directory = os.path.join(root, top, "d{}".format(i // 2500), str(i))
+                os.makedirs(directory)
+            open(os.path.join(directory, "f{}{}".format(i, suffix)), "w").close()
+    open(os.path.join(root, "env", "pyvenv.cfg"), "w").close()
+
+
+def bench_discover(args):
+    """ Find the .py files of a generated tree of --files files (or of
+    --path) with the old os.walk loop and with discover.iter_files(), next
+    to `find`, which shows how long the file system itself takes.
+    """
+    import discover
+
+    if args.path:
+        root = args.path
+    else:
+        root = tempfile.mkdtemp()
+        start = timeit.default_timer()
+        _make_tree(root, args.files)
+        _report("create {} files".format(args.files), timeit.default_timer() - start)
+    try:
+
+        def legacy():
+            found = 0
+            for top, _, files in os.walk(root):
+                if "venv" in top or "virt" in top:
+                    continue
+                for nm in files:
+                    if nm[-3:] == ".py":
+                        found += 1
+            return found
+
+        def scandir():
+            return sum(1 for _ in discover.iter_files(root))
+
+        find_cmd = ["find", root]
+        for name in (".git", "node_modules", "env"):
+            find_cmd += ["-name", name, "-prune", "-o"]
+        find_cmd += ["-name", "*.py", "-print"]
+
+        def find():
+            return subprocess.check_output(find_cmd).count(b"\n")
+
+        for label, walk in [
+            ("os.walk", legacy),
+            ("discover.iter_files", scandir),
+            ("find (pruned)", find),
+        ]:
+            seconds = min(timeit.repeat(walk, number=1, repeat=args.runs))
+            print(
+                "{:<40} {:>10.2f} ms {:>10} files".format(
+                    label, seconds * 1000, walk()
+                )
+            )
+    finally:
+        if not args.path:
+            shutil.rmtree(root)
+
+
+# Imported here and there by generated projects, to give them vendor nodes
+_VENDOR_MODULES = ["requests", "yaml", "numpy.linalg", "django.db.models"]
+
+
+def _relative_import(src, dst):
+    """ `from ... import ...` statement importing module dst from module src,
+    relative to their closest common package.
+    """
+    src_package = src.split(".")[:-1]
+    dst_parts = dst.split(".")
+    common = 0
+    while (
+        common < min(len(src_package), len(dst_parts) - 1)
+        and src_package[common] == dst_parts[common]
+    ):
+        common += 1
+    return "from {}{} import {}".format(
+        "." * (len(src_package) - common + 1),
+        ".".join(dst_parts[common:-1]),
+        dst_parts[-1],
+    )
+
+
+def _make_project(
+    root,
+    modules,
+    fanout=5,
+    depth=1,
+    relative_share=0.2,
+    cycle_share=0.05,
+    function_share=0.2,
+    seed=0,
+):
+    """ Generate a project of `modules` modules under root, ten to a package,
+    in packages nested `depth` levels below the top level `app` package.
+    main.py imports the first module of each package.
+
+    Each module imports `fanout` others, picked at random among the modules
+    after it, which keeps the graph acyclic. A share of the imports
+    (cycle_share) can pick any module instead, so they may form cycles.
+    Other shares are relative imports (relative_share) and imports inside
+    functions (function_share). Every module also imports two stdlib
+    modules, and every tenth a third party one.
+
+    Returns the path of main.py.
+    """
+    import random
+
+    rng = random.Random(seed)
+    packages = (modules + 9) // 10
+    # packages per level, so that `depth` levels hold them all
+    branching = max(2, int(round(packages ** (1.0 / max(depth, 1)))) + 1)
+
+    def package_of(p):
+        parts = []
+        for _ in range(max(depth, 1)):
+            p, digit = divmod(p, branching)
+            parts.append("p{}".format(digit))
+        return "app." + ".".join(reversed(parts))
+
+    names = [
+        "{}.m{}".format(package_of(i // 10), i % 10) for i in range(modules)
+    ]
+    for i in range(0, modules, 10):
+        package = package_of(i // 10).split(".")
+        for level in range(1, len(package) + 1):
+            directory = os.path.join(root, *package[:level])
+            if not os.path.isdir(directory):
+                os.makedirs(directory)
+                open(os.path.join(directory, "__init__.py"), "w").close()
+
+    for i, name in enumerate(names):
+        lines = ["import os", "from json import dumps"]
+        if i % 10 == 5:
+            lines.append("import " + _VENDOR_MODULES[i // 10 % len(_VENDOR_MODULES)])
+        for _ in range(fanout):
+            if rng.random() < cycle_share:
+                j = rng.randrange(modules)
+            elif i + 1 < modules:
+                j = rng.randrange(i + 1, modules)
+            else:
+                continue
+            if j == i:
+                continue
+            if rng.random() < relative_share:
+                statement = _relative_import(name, names[j])
+            else:
+                statement = "import " + names[j]
+            if rng.random() < function_share:
+                statement = "def f{}():\n    {}".format(j, statement)
+            lines.append(statement)
+        lines.append(
+            "\n\nclass C{0}(object):\n    def run(self, x):\n"
+            "        return dumps({{'x': x + {0}}})".format(i)
+        )
+        path = os.path.join(root, *name.split(".")) + ".py"
+        with open(path, "w") as fp:
+            fp.write("\n".join(lines) + "\n")
+    with open(os.path.join(root, "main.py"), "w") as fp:
+        for i in range(0, modules, 10):
+            fp.write("import {}\n".format(names[i]))
+    return os.path.join(root, "main.py")
+
+
+def bench_resolve(args):
+    """ Find the modules a script reaches in a generated package tree of
+    --modules modules (default: 5000, modulefinder is slow), with
+    modulefinder.ModuleFinder and with resolver.find_modules().
+    """
+    from modulefinder import ModuleFinder
+
+    import resolver
+
+    modules = args.modules
+    root = tempfile.mkdtemp()
+    try:
+        script = _make_project(root, modules)
+
+        def modulefinder():
+            # modulefinder recurses once per import in a chain
+            sys.setrecursionlimit(max(sys.getrecursionlimit(), modules * 20))
+            finder = ModuleFinder([root])
+            finder.load_file(script)
+            return len(finder.modules)
+
+        def find_modules():
+            return len(resolver.find_modules(script))
+
+        for label, find in [
+            ("ModuleFinder", modulefinder),
+            ("resolver.find_modules", find_modules),
+        ]:
+            seconds = min(timeit.repeat(find, number=1, repeat=args.runs))
+            print(
+                "{:<40} {:>10.2f} ms {:>10} modules".format(
+                    label, seconds * 1000, find()
+                )
+            )
+    finally:
+        shutil.rmtree(root)
+
+
+def bench_prefetch(args):
+    """ Read and scan the files of a generated package of --modules modules
+    (default: 2000), with --latency ms added to every read to stand in for a
+    network file system: serially, and with a pipeline.Prefetcher.
+    """
+    import time
+
+    import extract
+    import pipeline
+
+    modules = args.modules
+    latency = args.latency / 1000.0
+    root = tempfile.mkdtemp()
+    try:
+        _make_project(root, modules)
+        paths = [
+            os.path.join(top, name)
+            for top, _, files in os.walk(root)
+            for name in files
+            if name.endswith(".py")
+        ]
+
+        def slow_read(path):
+            time.sleep(latency)
+            with open(path, "rb") as fp:
+                return fp.read()
+
+        def serial():
+            for path in paths:
+                extract.scan_imports(slow_read(path), path)
+
+        def prefetched(threads):
+            reads = pipeline.Prefetcher(paths, threads, read=slow_read)
+            for path, data in reads:
+                extract.scan_imports(data, path)
+
+        print("{} files, {} ms per read".format(len(paths), args.latency))
+        runs = max(1, args.runs // 3)
+        _report("serial", min(timeit.repeat(serial, number=1, repeat=runs)))
+        for threads in (4, 16, 64):
+            _report(
+                "Prefetcher ({} threads)".format(threads),
+                min(
+                    timeit.repeat(
+                        lambda: prefetched(threads), number=1, repeat=runs
+                    )
+                ),
+            )
+    finally:
+        shutil.rmtree(root)
+
+
+def bench_stream(args):
+    """ Peak memory and time of building the whole graph of a generated
+    package of --modules modules (default: 20000), and of streaming its
+    imports with vis.iter_project_edges().
+    """
+    import tracemalloc
+
+    import render
+    import vis
+
+    modules = args.modules
+    root = tempfile.mkdtemp()
+    try:
+        _make_project(root, modules)
+
+        def full():
+            mod_dict = vis.get_modules_in_dir(root)
+            vis.add_immediate_deps_to_modules(mod_dict)
+            with open(os.devnull, "w") as fp:
+                render.write_json(vis.graph_of(mod_dict), fp, "bench")
+
+        def stream():
+            with open(os.devnull, "w") as fp:
+                render.write_edge_stream(
+                    vis.iter_project_edges(root), fp, render.FORMAT_JSONL, "bench"
+                )
+
+        print("{} modules".format(modules))
+        for label, run in [("full graph, json", full), ("--stream, jsonl", stream)]:
+            tracemalloc.start()
+            start = timeit.default_timer()
+            run()
+            seconds = timeit.default_timer() - start
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            print(
+                "{:<40} {:>10.2f} ms {:>10.1f} MB peak".format(
+                    label, seconds * 1000, peak / 1e6
+                )
+            )
+    finally:
+        shutil.rmtree(root)
+
+
+class _ScannedSource(object):
+    """ Stands in for a gitsource.GitSource in add_immediate_deps_to_modules(),
+    serving imports scanned beforehand, so that building the graph can be
+    timed on its own.
+    """
+
+    def __init__(self, imports):
+        self.imports = imports
+
+    def get_imports(self, paths, cache=None, jobs=1, extractor=None):
+        return dict((path, self.imports[path]) for path in paths)
+
+
+def _git_commit():
+    try:
+        return (
+            subprocess.check_output(
+                ["git", "-C", SRC_DIR, "rev-parse", "HEAD"], stderr=subprocess.PIPE
+            )
+            .decode("ascii")
+            .strip()
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def bench_suite(args):
+    """ Time each stage of a run on a project generated with --modules,
+    --fanout, --depth, --relative, --cycle-share and --seed: discovery,
+    extraction, classification, graph build, cycle search and rendering.
+    Results can be saved with --json and compared with those of another
+    commit with --compare.
+    """
+    import io
+
+    import extract
+    import render
+    import vis
+    from analysis import import_cycles
+    from libinfo import ModuleClassifier
+
+    params = {
+        "modules": args.modules,
+        "fanout": args.fanout,
+        "depth": args.depth,
+        "relative_share": args.relative,
+        "cycle_share": args.cycle_share,
+        "seed": args.seed,
+    }
+    stages = []
+
+    def stage(name, run):
+        result = []
+
+        def once():
+            del result[:]
+            result.append(run())
+
+        seconds = min(timeit.repeat(once, number=1, repeat=args.runs))
+        stages.append((name, seconds))
+        _report(name, seconds)
+        return result[0]
+
+    root = tempfile.mkdtemp()
+    try:
+        start = timeit.default_timer()
+        _make_project(
+            root,
+            args.modules,
+            args.fanout,
+            args.depth,
+            args.relative,
+            args.cycle_share,
+            seed=args.seed,
+        )
+        _report("(generate project)", timeit.default_timer() - start)
+
+        mod_dict = stage("discover", lambda: vis.get_modules_in_dir(root))
+        paths = sorted(module.__file__ for module in mod_dict.values())
+        imports = stage(
+            "extract", lambda: dict((path, extract.get_imports(path)) for path in paths)
+        )
+        targets = [
+            top
+            for records in imports.values()
+            for level, _, top, _ in records
+            if level == 0
+        ]
+
+        def classify():
+            classify = ModuleClassifier(mod_dict).classify
+            return [classify(top) for top in targets]
+
+        stage("classify", classify)
+        source = _ScannedSource(imports)
+        graph = stage(
+            "build graph",
+            lambda: vis.add_immediate_deps_to_modules(mod_dict, source=source),
+        )
+        cycles = stage("cycles", lambda: import_cycles(graph.module_level().succ))
+
+        def write():
+            fp = io.StringIO()
+            render.write_json(graph, fp, "bench")
+            render.write_dot(graph, fp, "bench")
+            return fp.tell()
+
+        stage("render json + dot", write)
+    finally:
+        shutil.rmtree(root)
+
+    total = sum(seconds for _, seconds in stages)
+    _report("total", total)
+    print(
+        "{} modules, {} imports, {} cycle(s)".format(
+            len(graph), graph.num_edges, len(cycles)
+        )
+    )
+    results = {
+        "benchmark": "suite",
+        "commit": _git_commit(),
+        "python": sys.version.split()[0],
+        "params": params,
+        "imports": graph.num_edges,
+        "stages": dict(stages),
+        "total": total,
+    }
+    if args.json:
+        with open(args.json, "w") as fp:
+            json.dump(results, fp, indent=2)
+            fp.write("\n")
+    if args.compare:
+        with open(args.compare) as fp:
+            baseline = json.load(fp)
+        if not _compare(baseline, results, args.threshold):
+            sys.exit(1)
+
+
+def _compare(baseline, results, threshold):
+    """ Print the change of every stage between two suite results, and
+    return False if one got slower by more than threshold percent.
+    """
+    if baseline.get("params") != results["params"]:
+        print("warning: the baseline was run with {}".format(baseline.get("params")))
+    print(
+        "\nagainst {}:".format((baseline.get("commit") or "baseline")[:12])
+    )
+    ok = True
+    old_stages = baseline.get("stages", {})
+    for name, seconds in list(results["stages"].items()) + [
+        ("total", results["total"])
+    ]:
+        old = baseline.get("total") if name == "total" else old_stages.get(name)
+        if not old:
+            print("{:<40} {:>10.2f} ms {:>10}".format(name, seconds * 1000, "new"))
+            continue
+        change = (seconds - old) / old * 100
+        # a millisecond either way is noise
+        regressed = change > threshold and seconds - old > 0.001
+        ok = ok and not regressed
+        print(
+            "{:<40} {:>10.2f} ms {:>+9.1f}%{}".format(
+                name, seconds * 1000, change, "  SLOWER" if regressed else ""
+            )
+        )
+    return ok
+
+
+BENCHMARKS = {
+    "classify": bench_classify,
+    "cycles": bench_cycles,
+    "discover": bench_discover,
+    "extract": bench_extract,
+    "prefetch": bench_prefetch,
+    "resolve": bench_resolve,
+    "snapshot": bench_snapshot,
+    "startup": bench_startup,
+    "stream": bench_stream,
+    "suite": bench_suite,
+    "walker": bench_walker,
+}
+
+# --modules, for the benchmarks that generate graphs or projects
+DEFAULT_MODULES = {
+    "cycles": 100000,
+    "prefetch": 2000,
+    "resolve": 5000,
+    "snapshot": 100000,
+    "stream": 20000,
+    "suite": 10000,
+}
+
+
+def get_args():
+    """ Parse and return command line args. """
+    parser = argparse.ArgumentParser(description="Run import-visualizer benchmarks.")
+    parser.add_argument("benchmark", choices=sorted(BENCHMARKS))
+    parser.add_argument(
+        "-n",
+        "--runs",
+        type=int,
+        default=10,
+        help="number of repetitions (default: 10)",
+    )
+    parser.add_argument(
+        "--names",
+        type=int,
+        default=1000000,
+        help="number of synthetic module names for `classify`"
+        " (default: 1000000)",
+    )
+    parser.add_argument(
+        "--modules",
+        type=int,
+        help="number of modules of the generated graph for `cycles` and"
+        " `snapshot`, or of the generated project for `resolve`, `prefetch`,"
+        " `stream` and `suite` (default: {})".format(
+            ", ".join(
+                "{} for {}".format(count, name)
+                for name, count in sorted(DEFAULT_MODULES.items())
+            )
+        ),
+    )
+    parser.add_argument(
+        "--fanout",
+        type=int,
+        default=5,
+        help="imports per module of the project generated for `suite`"
+        " (default: 5)",
+    )
+    parser.add_argument(
+        "--depth",
+        type=int,
+        default=2,
+        help="package nesting of the project generated for `suite`"
+        " (default: 2)",
+    )
+    parser.add_argument(
+        "--relative",
+        type=float,
+        default=0.2,
+        help="share of relative imports in the project generated for `suite`"
+        " (default: 0.2)",
+    )
+    parser.add_argument(
+        "--cycle-share",
+        type=float,
+        default=0.05,
+        help="share of the imports of the project generated for `suite` that"
+        " may point back and form cycles (default: 0.05)",
+    )
+    parser.add_argument(
+        "--seed",
+        type=int,
+        default=0,
+        help="random seed of the project generated for `suite` (default: 0)",
+    )
+    parser.add_argument(
+        "--json",
+        metavar="FILE",
+        help="save the results of `suite` to FILE",
+    )
+    parser.add_argument(
+        "--compare",
+        metavar="FILE",
+        help="compare the results of `suite` with those saved to FILE, and"
+        " exit with status 1 if a stage got slower by more than --threshold",
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=10.0,
+        help="percentage a stage may slow down by for --compare (default: 10)",
+    )
+    parser.add_argument(
+        "--latency",
+        type=float,
+        default=2.0,
+        help="milliseconds added to every file read for `prefetch`"
+        " (default: 2)",
+    )
+    parser.add_argument(
+        "--path",
+        help="directory of .py files for `extract`, `walker` and `discover`"
+        " (default: a generated module or tree)",
+    )
+    parser.add_argument(
+        "--files",
+        type=int,
+        default=500000,
+        help="number of files in the generated tree for `discover`"
+        " (default: 500000)",
+    )
+    parser.add_argument(
+        "--megabytes",
+        type=int,
+        default=5,
+        help="size of the generated module for `extract` and `walker`"
+        " (default: 5)",
+    )
+    args = parser.parse_args()
+    if args.modules is None:
+        args.modules = DEFAULT_MODULES.get(args.benchmark)
+    return args
+
+
+def main():
+    args = get_args()
+    BENCHMARKS[args.benchmark](args)
+
+
+if __name__ == "__main__":
+    main()
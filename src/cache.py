@@ -0,0 +1,176 @@
+""" Persistent on-disk cache of per-file import scans.
+
+Compiling a file and walking its bytecode is by far the most expensive part
+of a run, and the result only depends on the file's contents and the
+interpreter doing the compiling. The cache stores the raw import records
+produced by the scanner (not the resolved dependencies, which depend on the
+rest of the project) in a SQLite database under CACHE_DIR_NAME in the
+project root.
+
+Lookups happen in two steps:
+    - by (path, mtime, size): a hit skips reading the file entirely
+    - by content digest: a hit skips compiling (e.g. after a `touch` or a
+      fresh checkout where only the mtimes changed)
+"""
+
+
+import hashlib
+import json
+import os
+import platform
+import sqlite3
+import sys
+
+
+CACHE_DIR_NAME = ".import-visualizer"
+CACHE_FILE_NAME = "scan-cache-{}.sqlite3"
+
+# Bump when the format of the stored import records changes
+CACHE_FORMAT = 2
+
+# Scans depend on the bytecode emitted by this exact interpreter
+INTERPRETER_KEY = "{}-{}".format(platform.python_implementation(), sys.version)
+
+
+def file_digest(data):
+    """ Content hash used to key scans. """
+    return hashlib.sha1(data).hexdigest()
+
+
+def stat_key(path):
+    """ Return (mtime_ns, size) for the file at path. """
+    st = os.stat(path)
+    mtime = getattr(st, "st_mtime_ns", None)
+    if mtime is None:
+        mtime = int(st.st_mtime * 1e9)
+    return mtime, st.st_size
+
+
+class ScanCache(object):
+    """ SQLite-backed mapping of files to their raw import records.
+
+    Import records are stored as JSON lists and handed back as lists of
+    tuples, in the same shape the scanner produced them.
+    """
+
+    def __init__(self, cache_dir, namespace="bytecode"):
+        self.cache_dir = cache_dir
+        if not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir)
+        self.path = os.path.join(cache_dir, CACHE_FILE_NAME.format(namespace))
+        self._db = sqlite3.connect(self.path)
+        self._init_db()
+
+    @classmethod
+    def for_root(cls, root_dir, namespace="bytecode"):
+        """ Open the cache stored in the given project root. Scans made by
+        different extractors are kept apart by namespace.
+        """
+        return cls(os.path.join(os.path.abspath(root_dir), CACHE_DIR_NAME), namespace)
+
+    def _init_db(self):
+        db = self._db
+        db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        row = db.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+        version = "{}:{}".format(CACHE_FORMAT, INTERPRETER_KEY)
+        if row is None or row[0] != version:
+            # Different interpreter or format, nothing in here can be trusted
+            db.execute("DROP TABLE IF EXISTS files")
+            db.execute("DROP TABLE IF EXISTS scans")
+            db.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES ('version', ?)",
+                (version,),
+            )
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS files ("
+            " path TEXT PRIMARY KEY, mtime INTEGER, size INTEGER, digest TEXT)"
+        )
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS scans (digest TEXT PRIMARY KEY, imports TEXT)"
+        )
+        db.commit()
+
+    def get_by_stat(self, path, mtime, size):
+        """ Return the cached imports for path if it has not been modified
+        since it was scanned, otherwise None.
+        """
+        row = self._db.execute(
+            "SELECT s.imports FROM files f JOIN scans s ON f.digest = s.digest"
+            " WHERE f.path = ? AND f.mtime = ? AND f.size = ?",
+            (path, mtime, size),
+        ).fetchone()
+        return self._load(row)
+
+    def get_by_digest(self, digest):
+        """ Return the cached imports for the given content digest, or None. """
+        row = self._db.execute(
+            "SELECT imports FROM scans WHERE digest = ?", (digest,)
+        ).fetchone()
+        return self._load(row)
+
+    def put(self, path, mtime, size, digest, imports):
+        """ Record the imports scanned from path. path may be None to only
+        record the scan by digest.
+        """
+        self._db.execute(
+            "INSERT OR REPLACE INTO scans (digest, imports) VALUES (?, ?)",
+            (digest, json.dumps(imports)),
+        )
+        if path is not None:
+            self.touch(path, mtime, size, digest)
+
+    def touch(self, path, mtime, size, digest):
+        """ Point path at an already stored scan. """
+        self._db.execute(
+            "INSERT OR REPLACE INTO files (path, mtime, size, digest)"
+            " VALUES (?, ?, ?, ?)",
+            (path, mtime, size, digest),
+        )
+
+    def commit(self):
+        self._db.commit()
+
+    def close(self):
+        self._db.commit()
+        self._db.close()
+
+    def _load(self, row):
+        if row is None:
+            return None
+        return [
+            (level, tuple(fromlist), name, scope)
+            for level, fromlist, name, scope in json.loads(row[0])
+        ]
+
+
+class MemoryScanCache(object):
+    """ In-process stand-in for ScanCache with the same interface, for long
+    running sessions (such as watch mode) that shouldn't touch the disk.
+    """
+
+    def __init__(self):
+        self._files = {}
+        self._scans = {}
+
+    def get_by_stat(self, path, mtime, size):
+        entry = self._files.get(path)
+        if entry is None or entry[:2] != (mtime, size):
+            return None
+        return self._scans.get(entry[2])
+
+    def get_by_digest(self, digest):
+        return self._scans.get(digest)
+
+    def put(self, path, mtime, size, digest, imports):
+        self._scans[digest] = imports
+        if path is not None:
+            self.touch(path, mtime, size, digest)
+
+    def touch(self, path, mtime, size, digest):
+        self._files[path] = (mtime, size, digest)
+
+    def commit(self):
+        pass
+
+    def close(self):
+        pass
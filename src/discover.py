@@ -0,0 +1,311 @@
+""" Finding the python files of a project directory.
+
+The tree is walked with os.scandir(), and directories that can't hold
+project modules are pruned before they are descended into: version control
+and tool directories (PRUNED_DIRS), virtualenvs and conda environments
+(see _is_venv(), whatever their name), and anything matched by a .gitignore
+file in the tree or by an exclude pattern. Exclude patterns use the .gitignore
+syntax, relative to the project root, and take precedence over .gitignore
+files. Directories such as build/ are left to those: a package may well be
+named build.
+"""
+
+
+import glob
+import os
+import re
+
+
+# Directory names that are never walked
+PRUNED_DIRS = frozenset(
+    [
+        ".git",
+        ".hg",
+        ".svn",
+        ".tox",
+        ".nox",
+        ".eggs",
+        ".mypy_cache",
+        ".pytest_cache",
+        ".ruff_cache",
+        ".import-visualizer",
+        "__pycache__",
+        "node_modules",
+    ]
+)
+
+# File found at the top of every virtualenv (PEP 405)
+VENV_MARKER = "pyvenv.cfg"
+
+# Directory found at the top of every conda environment
+CONDA_MARKER = "conda-meta"
+
+# virtualenv < 20 environments have no VENV_MARKER, but an activate script
+# next to their site-packages
+ACTIVATE_SCRIPT = "bin/activate"
+SITE_PACKAGES = os.path.join("lib", "python*", "site-packages")
+
+GITIGNORE = ".gitignore"
+
+
+def _translate(pattern):
+    """ Regex source for a .gitignore pattern with its anchoring slash and
+    trailing slash already removed.
+    """
+    parts = []
+    i = 0
+    n = len(pattern)
+    while i < n:
+        c = pattern[i]
+        if pattern.startswith("**/", i):
+            parts.append("(?:.*/)?")
+            i += 3
+        elif pattern.startswith("**", i):
+            parts.append(".*")
+            i += 2
+        elif c == "*":
+            parts.append("[^/]*")
+            i += 1
+        elif c == "?":
+            parts.append("[^/]")
+            i += 1
+        elif c == "[":
+            end = pattern.find("]", i + 2)
+            if end == -1:
+                parts.append(re.escape(c))
+                i += 1
+                continue
+            chars = pattern[i + 1 : end].replace("\\", "\\\\")
+            if chars[0] in "!^":
+                chars = "^" + chars[1:]
+            parts.append("[{}]".format(chars))
+            i = end + 1
+        elif c == "\\" and i + 1 < n:
+            parts.append(re.escape(pattern[i + 1]))
+            i += 2
+        else:
+            parts.append(re.escape(c))
+            i += 1
+    return "".join(parts)
+
+
+class IgnoreRules(object):
+    """ The patterns of one .gitignore file (or of exclude options), which
+    apply to paths under base, a directory relative to the project root
+    ("" for the root itself, otherwise ending with a slash).
+    """
+
+    def __init__(self, patterns, base=""):
+        self.base = base
+        # (match, negated, only matches directories), last one first
+        self.rules = []
+        for pattern in patterns:
+            pattern = pattern.rstrip("\n")
+            if pattern.endswith("\\ "):
+                pattern = pattern[:-2].rstrip() + " "
+            else:
+                pattern = pattern.rstrip()
+            if not pattern or pattern.startswith("#"):
+                continue
+            negated = pattern.startswith("!")
+            if negated:
+                pattern = pattern[1:]
+            dir_only = pattern.endswith("/")
+            pattern = pattern.rstrip("/")
+            if not pattern:
+                continue
+            if "/" in pattern:
+                regex = "^" + _translate(pattern.lstrip("/")) + "$"
+            else:
+                regex = "^(?:.*/)?" + _translate(pattern) + "$"
+            self.rules.append((re.compile(regex).match, negated, dir_only))
+        self.rules.reverse()
+
+    @classmethod
+    def from_file(cls, path, base=""):
+        """ Rules read from the .gitignore file at path, or None if it can't
+        be read or holds no patterns.
+        """
+        try:
+            with open(path, encoding="utf-8", errors="replace") as fp:
+                rules = cls(fp, base)
+        except (IOError, OSError):
+            return None
+        return rules if rules.rules else None
+
+    def match(self, relpath, is_dir):
+        """ True if relpath (relative to the project root) is ignored, False
+        if it is explicitly re-included by a negated pattern, None if no
+        pattern matches it.
+        """
+        if not relpath.startswith(self.base):
+            return None
+        relpath = relpath[len(self.base) :]
+        for match, negated, dir_only in self.rules:
+            if (is_dir or not dir_only) and match(relpath):
+                return not negated
+        return None
+
+
+def is_ignored(rules, relpath, is_dir):
+    """ Whether relpath is ignored by the list of IgnoreRules, where later
+    rules take precedence over earlier ones.
+    """
+    for ignore in reversed(rules):
+        ignored = ignore.match(relpath, is_dir)
+        if ignored is not None:
+            return ignored
+    return False
+
+
+def _is_pruned_name(name):
+    return name in PRUNED_DIRS or name.endswith(".egg-info")
+
+
+def _is_venv(path, names):
+    """ Whether the directory at path, holding the entries names, is the top
+    of a virtualenv or conda environment.
+    """
+    if VENV_MARKER in names or CONDA_MARKER in names:
+        return True
+    return (
+        "bin" in names
+        and "lib" in names
+        and os.path.isfile(os.path.join(path, ACTIVATE_SCRIPT))
+        and bool(glob.glob(os.path.join(glob.escape(path), SITE_PACKAGES)))
+    )
+
+
+def is_pruned_dir(path):
+    """ Whether the directory at path is never walked by iter_files() with
+    skip_venvs on, whatever the ignore rules.
+    """
+    if _is_pruned_name(os.path.basename(path.rstrip(os.sep))):
+        return True
+    try:
+        names = os.listdir(path)
+    except OSError:
+        return False
+    return _is_venv(path, names)
+
+
+def may_mark_venv(relpath):
+    """ Whether the file at relpath (with forward slashes) may tell
+    filter_paths() that a directory is a virtualenv.
+    """
+    parts = relpath.split("/")
+    return (
+        parts[-1] == VENV_MARKER
+        or parts[-2:-1] == [CONDA_MARKER]
+        or "/".join(parts[-2:]) == ACTIVATE_SCRIPT
+    )
+
+
+def _venv_dirs(relpaths):
+    """ The directories of relpaths that _is_venv() would tell apart, below
+    the project root.
+    """
+    venvs = set()
+    activated = set()
+    for relpath in relpaths:
+        parts = relpath.split("/")
+        if parts[-1] == VENV_MARKER and len(parts) > 1:
+            venvs.add("/".join(parts[:-1]))
+        elif len(parts) > 2 and parts[-2] == CONDA_MARKER:
+            venvs.add("/".join(parts[:-2]))
+        elif len(parts) > 2 and "/".join(parts[-2:]) == ACTIVATE_SCRIPT:
+            activated.add("/".join(parts[:-2]))
+    if activated:
+        for relpath in relpaths:
+            parts = relpath.split("/")
+            for i in range(1, len(parts) - 3):
+                if (
+                    parts[i] == "lib"
+                    and parts[i + 1].startswith("python")
+                    and parts[i + 2] == "site-packages"
+                ):
+                    top = "/".join(parts[:i])
+                    if top in activated:
+                        venvs.add(top)
+    return venvs
+
+
+def filter_paths(relpaths, exclude=(), skip_venvs=True, suffix=".py"):
+    """ Generate the paths of relpaths (relative to the project root, with
+    forward slashes) ending in suffix that iter_files() would find, for
+    files that aren't on disk such as those of a git revision. Virtualenvs
+    are recognized by the files among relpaths for which may_mark_venv() is
+    true, and no .gitignore is read.
+    """
+    relpaths = list(relpaths)
+    venvs = _venv_dirs(relpaths) if skip_venvs else ()
+    rules = [IgnoreRules(exclude)] if exclude else []
+    for relpath in relpaths:
+        if not relpath.endswith(suffix):
+            continue
+        dirs = relpath.split("/")[:-1]
+        if any(_is_pruned_name(name) for name in dirs):
+            continue
+        if venvs and any("/".join(dirs[: i + 1]) in venvs for i in range(len(dirs))):
+            continue
+        if rules and (
+            any(
+                is_ignored(rules, "/".join(dirs[: i + 1]), True)
+                for i in range(len(dirs))
+            )
+            or is_ignored(rules, relpath, False)
+        ):
+            continue
+        yield relpath
+
+
+def iter_files(root_dir, suffix=".py", exclude=(), gitignore=True, skip_venvs=True):
+    """ Generate the absolute path of every file ending in suffix under
+    root_dir, pruning ignored directories (see the module docstring).
+
+    :param exclude: .gitignore style patterns of paths to leave out
+    :param gitignore: honor the .gitignore files found in the tree
+    :param skip_venvs: prune virtualenvs (PRUNED_DIRS are pruned either way)
+    """
+    root_dir = os.path.abspath(root_dir)
+    excludes = [IgnoreRules(exclude)] if exclude else []
+    # (directory, its path relative to root_dir, .gitignore rules in effect)
+    todo = [(root_dir, "", ())]
+    while todo:
+        top, rel, gitignores = todo.pop()
+        try:
+            with os.scandir(top) as it:
+                entries = list(it)
+        except OSError:
+            continue
+        if skip_venvs and rel and _is_venv(top, set(e.name for e in entries)):
+            continue
+        if gitignore:
+            for entry in entries:
+                if entry.name == GITIGNORE:
+                    rules = IgnoreRules.from_file(entry.path, rel)
+                    if rules is not None:
+                        gitignores += (rules,)
+                    break
+        rules = list(gitignores) + excludes
+
+        subdirs = []
+        for entry in entries:
+            name = entry.name
+            try:
+                is_dir = entry.is_dir(follow_symlinks=False)
+            except OSError:
+                continue
+            if is_dir:
+                if _is_pruned_name(name):
+                    continue
+                if rules and is_ignored(rules, rel + name, True):
+                    continue
+                subdirs.append((entry.path, rel + name + "/", gitignores))
+            elif name.endswith(suffix):
+                if rules and is_ignored(rules, rel + name, False):
+                    continue
+                yield entry.path
+        # walk subdirectories in listing order
+        subdirs.reverse()
+        todo.extend(subdirs)
@@ -0,0 +1,228 @@
+""" Index of the distributions installed in the environment: which
+distribution, at which version, provides each top level import name.
+
+The index is built from the metadata of every distribution in the
+site-packages directories (importlib.metadata). Their RECORD lists the files
+they installed, which gives their top level modules and packages. The names
+in top_level.txt cover the distributions installed without a RECORD, such
+as eggs. Building it reads a few files per distribution, so it is cached on
+disk next to the stdlib index (see libinfo.user_cache_path()). The cache is
+keyed by the mtimes of the site-packages directories, which change whenever
+a distribution is installed or removed.
+
+Namespace packages shared by several distributions (like `google`, with no
+__init__.py of their own) are indexed one level down, so google.protobuf
+and google.auth map to their own distributions.
+"""
+
+
+import csv
+import os
+import site
+import sys
+
+from libinfo import read_cache, user_cache_path, write_cache
+
+try:
+    import importlib.metadata as metadata
+except ImportError:
+    try:
+        import importlib_metadata as metadata
+    except ImportError:
+        metadata = None
+
+
+# Bump when the format of the cached index changes
+INDEX_VERSION = 1
+
+# Directory names that are never the top level of an import name
+_NOT_MODULES = ("__pycache__", "..")
+_METADATA_SUFFIXES = (".dist-info", ".egg-info", ".data")
+_MODULE_SUFFIXES = (".py", ".pyc", ".so", ".pyd")
+
+
+class DistributionIndex(object):
+    """ Maps import names to the (name, version) of the distribution that
+    provides them, by looking up their top level package (or the package
+    below it, for namespace packages) in a dict.
+
+    :param provided: {<top level name:str>: (<distribution:str>,
+    <version:str>)}, where the top level of a namespace package is its
+    dotted subpackage
+    :param namespaces: top level names of namespace packages
+    """
+
+    __slots__ = ("provided", "namespaces")
+
+    def __init__(self, provided, namespaces=()):
+        self.provided = provided
+        self.namespaces = frozenset(namespaces)
+
+    def __len__(self):
+        return len(self.provided)
+
+    def __contains__(self, name):
+        return self.distribution_of(name) is not None
+
+    def distribution_of(self, name):
+        """ (name, version) of the distribution providing the module name,
+        or None if it isn't installed.
+        """
+        top, dot, rest = name.partition(".")
+        if top in self.namespaces:
+            if not dot:
+                return None
+            top += "." + rest.partition(".")[0]
+        return self.provided.get(top)
+
+
+def site_packages_dirs():
+    """ The directories distributions are installed in: the site-packages of
+    the interpreter and of the user, and of the virtualenv if there is one.
+    """
+    dirs = []
+    candidates = list(getattr(site, "getsitepackages", lambda: [])())
+    if site.ENABLE_USER_SITE:
+        candidates.append(site.getusersitepackages())
+    candidates += [
+        path
+        for path in sys.path
+        if os.path.basename(path) in ("site-packages", "dist-packages")
+    ]
+    for path in candidates:
+        path = os.path.abspath(path)
+        if path not in dirs and os.path.isdir(path):
+            dirs.append(path)
+    return dirs
+
+
+def _record_names(record):
+    """ The top level names a distribution installed, from the contents of
+    its RECORD, and the names of the namespace packages among them.
+    """
+    files = set()
+    for row in csv.reader(record.splitlines()):
+        if row:
+            files.add(row[0].replace("\\", "/"))
+    tops = set()
+    namespaces = set()
+    for path in files:
+        parts = path.split("/")
+        top = parts[0]
+        if top in _NOT_MODULES or top.endswith(_METADATA_SUFFIXES):
+            continue
+        if len(parts) == 1:
+            if top.endswith(_MODULE_SUFFIXES):
+                # extension modules are named like name.cpython-311-x86_64.so
+                top = top.partition(".")[0]
+                if top.isidentifier() and not top.startswith("__editable__"):
+                    tops.add(top)
+            continue
+        if not top.isidentifier() or not path.endswith(_MODULE_SUFFIXES):
+            continue
+        if top + "/__init__.py" in files:
+            tops.add(top)
+            continue
+        # no __init__.py: a namespace package, indexed by its contents
+        sub = parts[1].partition(".")[0] if len(parts) == 2 else parts[1]
+        if sub.isidentifier():
+            namespaces.add(top)
+            tops.add(top + "." + sub)
+    return tops, namespaces
+
+
+def _distribution_names(dist):
+    """ (top level names, namespace package names) of a distribution. """
+    record = dist.read_text("RECORD")
+    if record:
+        tops, namespaces = _record_names(record)
+    else:
+        tops, namespaces = set(), set()
+    top_level = dist.read_text("top_level.txt") or ""
+    for line in top_level.splitlines():
+        top = line.strip().replace("\\", "/").split("/")[0]
+        if top.isidentifier() and top not in namespaces:
+            tops.add(top)
+    return tops, namespaces
+
+
+def build_index(dirs):
+    """ Build the DistributionIndex of the distributions in dirs. Where
+    several provide the same name, the first one on dirs wins, like on
+    sys.path.
+    """
+    provided = {}
+    # namespace package: distributions providing part of it
+    namespaces = {}
+    if metadata is None:
+        return DistributionIndex(provided)
+    for dist in metadata.distributions(path=dirs):
+        name = getattr(dist, "name", None) or dist.metadata["Name"]
+        if not name:
+            continue
+        tops, dist_namespaces = _distribution_names(dist)
+        for namespace in dist_namespaces:
+            namespaces.setdefault(namespace, set()).add(name)
+        for top in tops:
+            provided.setdefault(top, (name, dist.version))
+    for namespace, dists in list(namespaces.items()):
+        if len(dists) == 1:
+            # not shared after all, the whole package is the distribution's
+            sub = next(top for top in provided if top.startswith(namespace + "."))
+            provided.setdefault(namespace, provided[sub])
+            del namespaces[namespace]
+        else:
+            provided.pop(namespace, None)
+    return DistributionIndex(provided, namespaces)
+
+
+def _dirs_key(dirs):
+    key = [INDEX_VERSION]
+    for path in dirs:
+        try:
+            key.append([path, os.stat(path).st_mtime])
+        except OSError:
+            pass
+    return key
+
+
+def load_index(dirs=None, use_cache=True):
+    """ The DistributionIndex of the distributions in dirs (by default
+    site_packages_dirs()), read from the on-disk cache if they haven't
+    changed since it was built.
+    """
+    if dirs is None:
+        dirs = site_packages_dirs()
+    key = _dirs_key(dirs)
+    cache_path = user_cache_path("distributions")
+    if use_cache:
+        cached = read_cache(cache_path)
+        if cached is not None and cached.get("key") == key:
+            provided = dict(
+                (top, tuple(dist)) for top, dist in cached["provided"].items()
+            )
+            return DistributionIndex(provided, cached["namespaces"])
+    index = build_index(dirs)
+    if use_cache:
+        write_cache(
+            cache_path,
+            {
+                "key": key,
+                "provided": index.provided,
+                "namespaces": sorted(index.namespaces),
+            },
+        )
+    return index
+
+
+_index = None
+
+
+def distribution_index():
+    """ Return the DistributionIndex of the environment, loading it on first
+    use.
+    """
+    global _index
+    if _index is None:
+        _index = load_index()
+    return _index
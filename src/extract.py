@@ -0,0 +1,723 @@
+""" Extract the raw import records of python source files.
+
+An import record is a (<level:int>, <fromlist:tuple(str)>, <namespace:str>,
+<scope:str>) tuple, e.g. `from ..pkg import a, b` at the top of a module ->
+(2, ("a", "b"), "pkg", MODULE_SCOPE). scope tells whether the import runs
+when the module is imported (MODULE_SCOPE, which includes class bodies),
+only when a function is called (FUNCTION_SCOPE), or only under static type
+checkers (TYPE_CHECKING_SCOPE). Records are produced by one of several
+interchangeable backends (see EXTRACTORS):
+
+    bytecode: compile the source and walk the IMPORT_NAME opcodes
+    ast: parse the source and walk the import statements
+    tokenize: stream tokens and parse just the import statements, stopping
+        as soon as no further `import` can follow
+"""
+
+
+import ast
+import dis
+import io
+import os
+import sys
+import tokenize
+from collections import deque
+from types import CodeType
+
+import stats
+from cache import file_digest, stat_key
+
+
+# actual opcodes
+LOAD_CONST = dis.opmap["LOAD_CONST"]
+IMPORT_NAME = dis.opmap["IMPORT_NAME"]
+EXTENDED_ARG = dis.EXTENDED_ARG
+HAVE_ARGUMENT = dis.HAVE_ARGUMENT
+
+CACHE = dis.opmap.get("CACHE", -1)
+TO_BOOL = dis.opmap.get("TO_BOOL", -1)
+CONST_LOADS = frozenset(
+    op for op in (LOAD_CONST, dis.opmap.get("LOAD_SMALL_INT")) if op is not None
+)
+NAME_LOADS = frozenset(
+    dis.opmap[name]
+    for name in ("LOAD_NAME", "LOAD_GLOBAL", "LOAD_ATTR", "LOAD_METHOD")
+    if name in dis.opmap
+)
+ATTR_LOADS = frozenset(
+    dis.opmap[name] for name in ("LOAD_ATTR", "LOAD_METHOD") if name in dis.opmap
+)
+COND_JUMPS = frozenset(
+    op for name, op in dis.opmap.items() if "_IF_" in name and "JUMP" in name
+)
+FALSE_JUMPS = frozenset(
+    dis.opmap[name]
+    for name in (
+        "POP_JUMP_IF_FALSE",
+        "POP_JUMP_FORWARD_IF_FALSE",
+        "POP_JUMP_BACKWARD_IF_FALSE",
+        "JUMP_IF_FALSE_OR_POP",
+    )
+    if name in dis.opmap
+)
+ABS_JUMPS = frozenset(dis.hasjabs)
+BACKWARD_JUMPS = frozenset(
+    op for name, op in dis.opmap.items() if "BACKWARD" in name
+)
+# 3.11+ packs a flag in the low bit of LOAD_GLOBAL's arg, 3.12+ LOAD_ATTR's
+SHIFTED_NAME_LOADS = frozenset(
+    dis.opmap[name]
+    for name, version in (("LOAD_GLOBAL", (3, 11)), ("LOAD_ATTR", (3, 12)))
+    if sys.version_info >= version
+)
+# Jump args count instructions instead of bytes since 3.10
+INSTRUCTION_SIZE = 2
+JUMP_UNIT = INSTRUCTION_SIZE if sys.version_info >= (3, 10) else 1
+# Code objects of functions (but not class bodies) get their own namespace
+CO_NEWLOCALS = 0x2
+
+# Where an import runs, the last field of import records
+MODULE_SCOPE = "module"
+FUNCTION_SCOPE = "function"
+TYPE_CHECKING_SCOPE = "type_checking"
+
+def _cache_entries(op):
+    """ Number of inline CACHE entries following an instruction (3.11+). """
+    entries = getattr(dis, "_inline_cache_entries", None)
+    if entries is None:
+        return 0
+    if isinstance(entries, dict):
+        return entries.get(dis.opname[op], 0)
+    return entries[op]
+
+
+def _unpack_opargs(code):
+    """ Step through the python bytecode and generate a tuple (int, int, int):
+    (operation_index, operation_byte, argument_byte) for each operation.
+
+    Allocates a tuple per instruction; the scanners use _code_units().
+    """
+    extended_arg = 0
+    for i in range(0, len(code), 2):
+        op = code[i]
+        if op >= HAVE_ARGUMENT:
+            next_code = code[i + 1]
+            arg = next_code | extended_arg
+            extended_arg = (arg << 8) if op == EXTENDED_ARG else 0
+        else:
+            arg = None
+        yield (i, op, arg)
+
+
+def _code_units(code):
+    """ Iterate over the (opcode, arg byte) of every 2 byte unit of python 3
+    bytecode, EXTENDED_ARG prefixes and CACHE entries included.
+
+    The pairs come from zipping two strided memoryviews of code, so nothing
+    is copied, every value is a cached small int, and zip reuses its result
+    tuple when the loop unpacks it: iterating allocates nothing per
+    instruction, however large the code object.
+    """
+    view = memoryview(code)
+    return zip(view[::2], view[1::2])
+
+
+def _const_value(op, arg, consts):
+    """ Value pushed by a constant-loading instruction. """
+    if op == LOAD_CONST:
+        return consts[arg]
+    return arg
+
+
+def _jump_target(op, arg, offset):
+    """ Absolute offset jumped to by the jump instruction at offset. """
+    if op in ABS_JUMPS:
+        return arg * JUMP_UNIT
+    next_offset = offset + INSTRUCTION_SIZE * (1 + _cache_entries(op))
+    if op in BACKWARD_JUMPS:
+        return next_offset - arg * JUMP_UNIT
+    return next_offset + arg * JUMP_UNIT
+
+
+def _import_record(op1, arg1, op2, arg2, name, scope, consts):
+    """ Record of an IMPORT_NAME whose level and fromlist were loaded by the
+    two previous instructions.
+    """
+    level = _const_value(op2, arg2, consts)
+    fromlist = _const_value(op1, arg1, consts) or ()
+    return (0 if level == -1 else level, tuple(fromlist), name, scope)
+
+
+def _nested_scope(nested, scope):
+    """ Scope of the code object nested, defined in code running in scope. """
+    if nested.co_flags & CO_NEWLOCALS and scope != TYPE_CHECKING_SCOPE:
+        return FUNCTION_SCOPE
+    # class bodies run when the class statement does
+    return scope
+
+
+def _scan_code_imports(compiled, scope, imports):
+    """ Append the import records of a code object, and of every code object
+    nested in it, to imports in source order, labelled with the scope they
+    run in. Makes a single pass over each code object's bytecode, without
+    allocating anything per instruction.
+    """
+    if "TYPE_CHECKING" in compiled.co_names:
+        _scan_guarded_code_imports(compiled, scope, imports)
+        return
+    names = compiled.co_names
+    consts = compiled.co_consts
+    # the two previous instructions, for the LOAD_CONST lookback
+    op1 = arg1 = op2 = arg2 = None
+    extended_arg = 0
+    for op, oparg in _code_units(compiled.co_code):
+        if op == EXTENDED_ARG:
+            extended_arg = (extended_arg | oparg) << 8
+            continue
+        if extended_arg:
+            oparg |= extended_arg
+            extended_arg = 0
+        if op == CACHE or op == TO_BOOL:
+            continue
+        if op == IMPORT_NAME and op1 in CONST_LOADS and op2 in CONST_LOADS:
+            imports.append(
+                _import_record(op1, arg1, op2, arg2, names[oparg], scope, consts)
+            )
+        elif op == LOAD_CONST:
+            nested = consts[oparg]
+            if isinstance(nested, CodeType):
+                _scan_code_imports(nested, _nested_scope(nested, scope), imports)
+        op2, arg2, op1, arg1 = op1, arg1, op, oparg
+
+
+def _scan_guarded_code_imports(compiled, scope, imports):
+    """ _scan_code_imports() for code that refers to TYPE_CHECKING, which
+    also tracks instruction offsets to find the `if TYPE_CHECKING:` bodies.
+    """
+    names = compiled.co_names
+    consts = compiled.co_consts
+    op1 = arg1 = op2 = arg2 = None
+    extended_arg = 0
+    offset = -INSTRUCTION_SIZE
+    # `if TYPE_CHECKING:` bodies end at this offset
+    guard_end = -1
+    after_type_checking = False
+    # instruction before the current `a.b.c` chain of name loads; if it's a
+    # conditional jump the chain is part of a compound test like `x or ...`
+    before_chain = None
+    for op, oparg in _code_units(compiled.co_code):
+        offset += INSTRUCTION_SIZE
+        if op == EXTENDED_ARG:
+            extended_arg = (extended_arg | oparg) << 8
+            continue
+        if extended_arg:
+            oparg |= extended_arg
+            extended_arg = 0
+        if op == CACHE or op == TO_BOOL:
+            continue
+
+        if after_type_checking and op in FALSE_JUMPS:
+            guard_end = max(guard_end, _jump_target(op, oparg, offset))
+        if op in NAME_LOADS:
+            if op not in ATTR_LOADS:
+                before_chain = op1
+            after_type_checking = (
+                before_chain not in COND_JUMPS
+                and _loaded_name(op, oparg, names) == "TYPE_CHECKING"
+            )
+        else:
+            after_type_checking = False
+
+        if op == IMPORT_NAME and op1 in CONST_LOADS and op2 in CONST_LOADS:
+            if offset < guard_end:
+                import_scope = TYPE_CHECKING_SCOPE
+            else:
+                import_scope = scope
+            imports.append(
+                _import_record(
+                    op1, arg1, op2, arg2, names[oparg], import_scope, consts
+                )
+            )
+        elif op == LOAD_CONST:
+            nested = consts[oparg]
+            if isinstance(nested, CodeType):
+                if offset < guard_end:
+                    nested_scope = TYPE_CHECKING_SCOPE
+                else:
+                    nested_scope = _nested_scope(nested, scope)
+                _scan_code_imports(nested, nested_scope, imports)
+        op2, arg2, op1, arg1 = op1, arg1, op, oparg
+
+
+def _loaded_name(op, arg, names):
+    if op in SHIFTED_NAME_LOADS:
+        arg >>= 1
+    return names[arg]
+
+
+def scan_imports(source, filename="<unknown>"):
+    """ Compile python source and return its raw import records, including
+    those in functions and class bodies, in the order they appear in the
+    code. level is 0 for absolute imports.
+    """
+    newline = b"\n" if isinstance(source, bytes) else "\n"
+    with stats.timer("compile"):
+        compiled = compile(source + newline, filename, "exec")
+    imports = []
+    with stats.timer("walk bytecode"):
+        _scan_code_imports(compiled, MODULE_SCOPE, imports)
+    return imports
+
+
+def scan_imports_ast(source, filename="<unknown>"):
+    """ Same as scan_imports(), from the syntax tree instead of bytecode.
+    Saves generating code, but the whole tree is still built.
+    """
+    tree = ast.parse(source, filename)
+    imports = []
+    _ast_imports(ast.iter_child_nodes(tree), MODULE_SCOPE, imports)
+    return imports
+
+
+def _is_type_checking(test):
+    """ Whether an if statement's test is `TYPE_CHECKING` or
+    `<something>.TYPE_CHECKING`, or an `and` whose first operand is one: its
+    body can't run either unless under a type checker.
+    """
+    if isinstance(test, ast.BoolOp) and isinstance(test.op, ast.And):
+        test = test.values[0]
+    if isinstance(test, ast.Name):
+        return test.id == "TYPE_CHECKING"
+    return isinstance(test, ast.Attribute) and test.attr == "TYPE_CHECKING"
+
+
+def _ast_imports(nodes, scope, imports):
+    for child in nodes:
+        if isinstance(child, ast.Import):
+            for alias in child.names:
+                imports.append((0, (), alias.name, scope))
+        elif isinstance(child, ast.ImportFrom):
+            names = tuple(alias.name for alias in child.names)
+            imports.append((child.level or 0, names, child.module or "", scope))
+        elif isinstance(child, ast.expr):
+            # expressions can't contain import statements
+            continue
+        elif isinstance(child, ast.If) and _is_type_checking(child.test):
+            _ast_imports(child.body, TYPE_CHECKING_SCOPE, imports)
+            _ast_imports(child.orelse, scope, imports)
+        elif (
+            isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef))
+            and scope != TYPE_CHECKING_SCOPE
+        ):
+            _ast_imports(ast.iter_child_nodes(child), FUNCTION_SCOPE, imports)
+        else:
+            _ast_imports(ast.iter_child_nodes(child), scope, imports)
+
+
+# Statements that end their header with a colon and open a block
+_COMPOUND_KEYWORDS = frozenset(
+    [
+        "if",
+        "elif",
+        "else",
+        "for",
+        "while",
+        "try",
+        "except",
+        "finally",
+        "with",
+        "def",
+        "class",
+        "async",
+        "match",
+        "case",
+    ]
+)
+_FUNCTION_KEYWORDS = frozenset(["def", "async"])
+_SKIP_TOKENS = frozenset([tokenize.COMMENT, tokenize.NL, tokenize.ENCODING])
+
+
+def _first_and_operand(test):
+    """ The tokens of the first operand of a test that is an `and` (not
+    inside an `or` or a conditional expression), or all of test otherwise.
+    """
+    depth = 0
+    first = test
+    for i, tok in enumerate(test):
+        if tok in ("(", "[", "{"):
+            depth += 1
+        elif tok in (")", "]", "}"):
+            depth -= 1
+        elif depth == 0 and tok in ("or", "if"):
+            return test
+        elif depth == 0 and tok == "and" and first is test:
+            first = test[:i]
+    return first
+
+
+def _block_scope(header, test, scope):
+    """ Scope of the block opened by a compound statement, from its first
+    keyword and (for if/elif) the tokens of its test.
+    """
+    if scope == TYPE_CHECKING_SCOPE:
+        return scope
+    if header in _FUNCTION_KEYWORDS:
+        return FUNCTION_SCOPE
+    if header in ("if", "elif") and test:
+        guard = _first_and_operand(test)
+        # only a plain `TYPE_CHECKING` or `a.b.TYPE_CHECKING`, or an `and`
+        # starting with one, like in _is_type_checking()
+        if guard and guard[-1] == "TYPE_CHECKING":
+            if all(tok == "." for tok in guard[1::2]):
+                return TYPE_CHECKING_SCOPE
+    return scope
+
+
+def _syntax_checked(tokens, filename):
+    """ Generate tokens, raising the tokenize.TokenError of an unclosed
+    bracket or string as the SyntaxError the other backends raise.
+    """
+    try:
+        for tok in tokens:
+            yield tok
+    except tokenize.TokenError as err:
+        msg, (lineno, offset) = err.args
+        raise SyntaxError(msg, (filename, lineno, offset, None))
+
+
+def scan_imports_tokenize(source, filename="<unknown>"):
+    """ Same as scan_imports(), by streaming the source through the tokenizer
+    and only parsing import statements, without building any tree or code.
+
+    Scanning stops after the last line that contains the text "import", which
+    is safe since every import statement contains that keyword. For generated
+    modules with a few imports at the top followed by megabytes of data, that
+    means most of the file is never tokenized.
+    """
+    if isinstance(source, bytes):
+        last = source.rfind(b"import")
+        newline = b"\n"
+        readline = io.BytesIO(source).readline
+        tokens = tokenize.tokenize(readline)
+    else:
+        last = source.rfind("import")
+        newline = "\n"
+        tokens = tokenize.generate_tokens(io.StringIO(source).readline)
+    if last < 0:
+        return []
+    last_line = source.count(newline, 0, last) + 1
+
+    imports = []
+    # scope of each open indented block
+    blocks = []
+    # scope of a statement following a block header on the same line
+    inline_scope = None
+    # first keyword and test tokens of the current compound statement header
+    header = None
+    test = []
+    # scope of the block the last header opened, until its INDENT
+    pending_block = None
+    # tokens of the import statement being collected, or None
+    stmt = None
+    stmt_scope = MODULE_SCOPE
+    stmt_start = True
+    depth = 0
+    lambdas = 0
+
+    for tok in _syntax_checked(tokens, filename):
+        tok_type, tok_str = tok[0], tok[1]
+        if tok_type in _SKIP_TOKENS:
+            continue
+        if stmt_start and tok[2][0] > last_line:
+            break
+
+        if tok_type == tokenize.INDENT:
+            blocks.append(pending_block or (blocks[-1] if blocks else MODULE_SCOPE))
+            pending_block = None
+            continue
+        if tok_type == tokenize.DEDENT:
+            blocks.pop()
+            continue
+        if tok_type in (tokenize.NEWLINE, tokenize.ENDMARKER):
+            if stmt is not None:
+                _parse_import(stmt, stmt_scope, imports)
+                stmt = None
+            stmt_start = True
+            inline_scope = header = None
+            depth = lambdas = 0
+            continue
+
+        if stmt_start:
+            stmt_start = False
+            if tok_type == tokenize.NAME and tok_str in ("import", "from"):
+                stmt = [tok_str]
+                stmt_scope = inline_scope or (blocks[-1] if blocks else MODULE_SCOPE)
+                continue
+            if tok_type == tokenize.NAME and tok_str in _COMPOUND_KEYWORDS:
+                header = tok_str
+                test = []
+                continue
+
+        if tok_type == tokenize.OP:
+            if tok_str in "([{":
+                depth += 1
+            elif tok_str in ")]}":
+                depth -= 1
+            elif depth == 0 and tok_str == ";":
+                if stmt is not None:
+                    _parse_import(stmt, stmt_scope, imports)
+                    stmt = None
+                stmt_start = True
+                continue
+            elif depth == 0 and tok_str == ":" and header is not None:
+                if lambdas:
+                    lambdas -= 1
+                    continue
+                # end of a block header: a block follows on the next lines,
+                # or a statement follows on this one
+                scope = inline_scope or (blocks[-1] if blocks else MODULE_SCOPE)
+                pending_block = inline_scope = _block_scope(header, test, scope)
+                header = None
+                stmt_start = True
+                continue
+        elif tok_type == tokenize.NAME and tok_str == "lambda" and depth == 0:
+            lambdas += 1
+
+        if stmt is not None:
+            stmt.append(tok_str)
+        elif header is not None:
+            test.append(tok_str)
+
+    return imports
+
+
+def _parse_import(tokens, scope, imports):
+    """ Parse the tokens of one `import ...` or `from ... import ...`
+    statement (without newlines or comments) into import records.
+    """
+    if tokens[0] == "import":
+        # import a.b.c as d, e
+        name = []
+        alias = False
+        for tok in tokens[1:] + [","]:
+            if tok == ",":
+                imports.append((0, (), "".join(name), scope))
+                name = []
+                alias = False
+            elif tok == "as":
+                alias = True
+            elif not alias:
+                name.append(tok)
+        return
+
+    # from ..a.b import (c as d, e)
+    level = 0
+    i = 1
+    while tokens[i] in (".", "..."):
+        level += len(tokens[i])
+        i += 1
+    module = []
+    while tokens[i] != "import":
+        module.append(tokens[i])
+        i += 1
+    names = []
+    expect_name = True
+    for tok in tokens[i + 1 :]:
+        if tok in ("(", ")"):
+            continue
+        if tok == ",":
+            expect_name = True
+        elif tok == "as":
+            expect_name = False
+        elif expect_name:
+            names.append(tok)
+            expect_name = False
+    imports.append((level, tuple(names), "".join(module), scope))
+
+
+EXTRACTORS = {
+    "ast": scan_imports_ast,
+    "bytecode": scan_imports,
+    "tokenize": scan_imports_tokenize,
+}
+DEFAULT_EXTRACTOR = "bytecode"
+
+
+def get_imports(path, cache=None, extractor=DEFAULT_EXTRACTOR):
+    """ Return the raw import records for the file at path, using the scan
+    cache to avoid rescanning unchanged files.
+
+    :param extractor: name of the backend in EXTRACTORS; caches must not be
+    shared between backends
+    """
+    if not stats.ENABLED:
+        return _get_imports(path, cache, extractor)
+    started = stats.clock()
+    imports = _get_imports(path, cache, extractor)
+    seconds = stats.clock() - started
+    stats.add_time(stats.SCAN_TIMER, seconds)
+    stats.file_scanned(path, seconds)
+    return imports
+
+
+def _get_imports(path, cache, extractor):
+    scan = EXTRACTORS[extractor]
+    stats.count("files")
+    if cache is None:
+        with open(path, "rb") as fp:
+            data = fp.read()
+        stats.count("bytes read", len(data))
+        stats.count("files scanned")
+        return scan(data, path)
+
+    mtime, size = stat_key(path)
+    imports = cache.get_by_stat(path, mtime, size)
+    if imports is not None:
+        stats.count("cache hits (stat)")
+        return imports
+
+    with open(path, "rb") as fp:
+        data = fp.read()
+    stats.count("bytes read", len(data))
+    digest = file_digest(data)
+    imports = cache.get_by_digest(digest)
+    if imports is not None:
+        stats.count("cache hits (content)")
+        cache.touch(path, mtime, size, digest)
+        return imports
+
+    stats.count("files scanned")
+    imports = scan(data, path)
+    cache.put(path, mtime, size, digest, imports)
+    return imports
+
+
+def _scan_file(args):
+    """ Worker for get_imports_parallel() without a cache: read and scan a
+    file.
+    """
+    path, extractor = args
+    with open(path, "rb") as fp:
+        data = fp.read()
+    return len(data), EXTRACTORS[extractor](data, path)
+
+
+def _scan_sources(args):
+    """ Worker for scan_sources(): scan a chunk of sources. """
+    sources, extractor = args
+    scan = EXTRACTORS[extractor]
+    return [scan(data, path) for path, data in sources]
+
+
+def scan_sources(sources, jobs=1, extractor=DEFAULT_EXTRACTOR, chunksize=16):
+    """ Scan the contents of files that aren't read from disk, such as git
+    blobs. sources is an iterable of (path, data); the import records of
+    each are generated in the same order. With jobs > 1 (or None for one per
+    CPU) the scans run in a process pool. Only a few chunks per process are
+    taken from sources ahead of the scans, so sources can be a stream.
+    """
+    if jobs == 1:
+        scan = EXTRACTORS[extractor]
+        if not stats.ENABLED:
+            for path, data in sources:
+                yield scan(data, path)
+            return
+        for path, data in sources:
+            started = stats.clock()
+            imports = scan(data, path)
+            stats.file_scanned(path, stats.clock() - started)
+            stats.count("bytes read", len(data))
+            stats.count("files scanned")
+            yield imports
+        return
+
+    from concurrent.futures import ProcessPoolExecutor
+    from itertools import islice
+
+    jobs = jobs or os.cpu_count() or 1
+    sources = iter(sources)
+    pending = deque()
+    with ProcessPoolExecutor(jobs) as executor:
+        while True:
+            chunk = list(islice(sources, chunksize))
+            if chunk and stats.ENABLED:
+                stats.count("bytes read", sum(len(data) for _, data in chunk))
+                stats.count("files scanned", len(chunk))
+            if chunk:
+                pending.append(executor.submit(_scan_sources, (chunk, extractor)))
+            if pending and (not chunk or len(pending) >= jobs * 2):
+                for imports in pending.popleft().result():
+                    yield imports
+            elif not chunk:
+                return
+
+
+def get_imports_parallel(paths, cache=None, jobs=None, extractor=DEFAULT_EXTRACTOR):
+    """ Like get_imports(), for many files at once, spreading the scans that
+    miss the cache across a pool of `jobs` processes. Files that miss the
+    stat lookup are read here, so that their contents can be looked up in
+    the cache before they are handed to the pool.
+
+    Returns: {<path:str>: <import records:list>}
+    """
+    imports = {}
+    todo = list(paths)
+    stats.count("files", len(todo))
+    if cache is None:
+        _scan_files(todo, jobs, extractor, imports)
+        return imports
+
+    misses = []
+    for path in todo:
+        cached = cache.get_by_stat(path, *stat_key(path))
+        if cached is None:
+            misses.append(path)
+        else:
+            imports[path] = cached
+    stats.count("cache hits (stat)", len(imports))
+
+    # (path, mtime, size, digest) of the files handed to the scanner, in order
+    scanning = deque()
+
+    def sources():
+        for path in misses:
+            # stat first, like _get_imports()
+            mtime, size = stat_key(path)
+            with open(path, "rb") as fp:
+                data = fp.read()
+            digest = file_digest(data)
+            cached = cache.get_by_digest(digest)
+            if cached is not None:
+                stats.count("bytes read", len(data))
+                stats.count("cache hits (content)")
+                cache.touch(path, mtime, size, digest)
+                imports[path] = cached
+                continue
+            scanning.append((path, mtime, size, digest))
+            yield path, data
+
+    for recs in scan_sources(sources(), jobs, extractor):
+        path, mtime, size, digest = scanning.popleft()
+        imports[path] = recs
+        cache.put(path, mtime, size, digest, recs)
+    return imports
+
+
+def _scan_files(paths, jobs, extractor, imports):
+    """ Read and scan files in a pool of `jobs` processes, adding their
+    import records to the imports dict.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    stats.count("files scanned", len(paths))
+    if not paths:
+        return
+    jobs = jobs or os.cpu_count() or 1
+    chunksize = max(1, len(paths) // (jobs * 4))
+    with ProcessPoolExecutor(jobs) as executor:
+        results = executor.map(
+            _scan_file, [(path, extractor) for path in paths], chunksize=chunksize
+        )
+        for path, (size, recs) in zip(paths, results):
+            stats.count("bytes read", size)
+            imports[path] = recs
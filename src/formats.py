@@ -0,0 +1,24 @@
+""" Output formats and the styles their writers share. Kept apart from
+render.py, so that vis.py can offer the formats and draw pdf graphs
+without importing the writers (and json, xml...) on every run.
+"""
+
+
+from extract import FUNCTION_SCOPE, TYPE_CHECKING_SCOPE
+
+
+FORMAT_PDF = "pdf"
+FORMAT_DOT = "dot"
+FORMAT_JSON = "json"
+FORMAT_GRAPHML = "graphml"
+FORMAT_HTML = "html"
+FORMAT_JSONL = "jsonl"
+# pdf is rendered by graphviz from vis.mod_dict_to_dag(), the rest by render.py
+FORMATS = (FORMAT_PDF, FORMAT_DOT, FORMAT_JSON, FORMAT_GRAPHML, FORMAT_HTML)
+DEFAULT_FORMAT = FORMAT_PDF
+# Formats written edge by edge, see render.write_edge_stream()
+STREAM_FORMATS = (FORMAT_JSONL, FORMAT_DOT)
+
+SCOPE_EDGE_STYLES = {FUNCTION_SCOPE: "dashed", TYPE_CHECKING_SCOPE: "dotted"}
+VENDOR_COLOR = "blue"
+CYCLE_COLOR = "red"
@@ -0,0 +1,199 @@
+""" Read a project's python files from a git revision, without a checkout.
+
+The files under a directory at a revision are listed with a single
+`git ls-tree`, and their contents are streamed out of the object store by one
+long-lived `git cat-file --batch` process. Scans are cached by blob id (see
+BLOB_DIGEST), which only changes with the file's contents, so analyzing a new
+commit only reads and scans the blobs that changed since the last one.
+"""
+
+
+import os
+import subprocess
+import threading
+
+import stats
+from discover import may_mark_venv
+from extract import DEFAULT_EXTRACTOR, scan_sources
+
+
+# Scan cache digest of a blob, kept apart from the content digests of files
+BLOB_DIGEST = "blob:{}"
+
+# ls-tree modes of regular files (symlinks and submodules are skipped)
+FILE_MODES = (b"100644", b"100755")
+
+
+class GitError(RuntimeError):
+    """ A git command failed, or the repository lacks an object. """
+
+
+def _git(repo_dir, *args):
+    try:
+        return subprocess.check_output(
+            ["git", "-C", repo_dir] + list(args), stderr=subprocess.PIPE
+        )
+    except OSError as e:
+        raise GitError("can't run git: {}".format(e))
+    except subprocess.CalledProcessError as e:
+        raise GitError(e.stderr.decode("utf-8", "replace").strip())
+
+
+def resolve_rev(repo_dir, rev):
+    """ The commit id rev (a branch, tag, sha...) points to. """
+    commit = "{}^{{commit}}".format(rev)
+    try:
+        out = _git(repo_dir, "rev-parse", "--verify", "--quiet", commit)
+    except GitError:
+        raise GitError("unknown revision {}".format(rev))
+    return out.decode("ascii").strip()
+
+
+def list_blobs(repo_dir, rev, subdir=None, suffix=".py"):
+    """ Generate (path relative to repo_dir, blob id) for every file ending
+    in suffix under repo_dir (the repository or a directory in it), or only
+    under its subdirectory subdir, at rev.
+    """
+    args = ["ls-tree", "-r", "-z", rev]
+    if subdir:
+        args += ["--", subdir.rstrip("/") + "/"]
+    suffix = suffix.encode("utf-8")
+    for entry in _git(repo_dir, *args).split(b"\0"):
+        if not entry or not entry.endswith(suffix):
+            continue
+        info, _, path = entry.partition(b"\t")
+        mode, kind, blob = info.split(b" ")
+        if kind == b"blob" and mode in FILE_MODES:
+            yield os.fsdecode(path), blob.decode("ascii")
+
+
+def git_dir(repo_dir):
+    """ Absolute path of the git directory of the repository holding
+    repo_dir, shared by all of its worktrees.
+    """
+    path = os.fsdecode(_git(repo_dir, "rev-parse", "--git-common-dir").strip())
+    return os.path.normpath(os.path.join(repo_dir, path))
+
+
+class BlobReader(object):
+    """ A `git cat-file --batch` process reading blobs out of a repository.
+    """
+
+    def __init__(self, repo_dir):
+        self._proc = subprocess.Popen(
+            ["git", "-C", repo_dir, "cat-file", "--batch"],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+        )
+
+    def _write(self, blobs):
+        stdin = self._proc.stdin
+        for blob in blobs:
+            stdin.write(blob.encode("ascii") + b"\n")
+        stdin.flush()
+
+    def read_many(self, blobs):
+        """ Generate the contents of every blob id in the list blobs, in
+        order. The ids are written from a thread while contents are read, so
+        neither side of the pipe fills up; the generator must be exhausted
+        before the next read.
+        """
+        writer = threading.Thread(target=self._write, args=(blobs,))
+        writer.daemon = True
+        writer.start()
+        stdout = self._proc.stdout
+        for blob in blobs:
+            header = stdout.readline().split()
+            if len(header) != 3:
+                raise GitError("{} is missing from the repository".format(blob))
+            data = stdout.read(int(header[2]))
+            # every object is followed by a newline
+            stdout.read(1)
+            yield data
+        writer.join()
+
+    def read(self, blob):
+        """ The contents of one blob. """
+        return next(self.read_many([blob]))
+
+    def close(self):
+        if self._proc.poll() is None:
+            self._proc.stdin.close()
+            self._proc.wait()
+        self._proc.stdout.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class GitSource(object):
+    """ The .py files under root_dir (a repository or a directory in one) at
+    the git revision rev, read from the object store. root_dir doesn't need
+    to exist, e.g. in a clone made with --no-checkout: git runs in its
+    nearest existing parent.
+
+    blobs maps the path each file would have in a checkout to its blob id.
+    venv_markers lists the paths of the files that may mark a virtualenv
+    (see discover.may_mark_venv()), so that those committed to the
+    repository can be left out.
+    git_dir is the repository's git directory, where state such as the scan
+    cache can be kept without touching the working tree.
+    """
+
+    def __init__(self, root_dir, rev):
+        self.root_dir = os.path.abspath(root_dir)
+        repo_dir = self.root_dir
+        while not os.path.isdir(repo_dir) and os.path.dirname(repo_dir) != repo_dir:
+            repo_dir = os.path.dirname(repo_dir)
+        self.repo_dir = repo_dir
+        self.rev = resolve_rev(repo_dir, rev)
+        self.git_dir = git_dir(repo_dir)
+        subdir = os.path.relpath(self.root_dir, repo_dir)
+        self.blobs = {}
+        self.venv_markers = []
+        for path, blob in list_blobs(
+            repo_dir, self.rev, None if subdir == os.curdir else subdir, suffix=""
+        ):
+            if path.endswith(".py"):
+                self.blobs[os.path.join(repo_dir, path)] = blob
+            elif may_mark_venv(path):
+                self.venv_markers.append(os.path.join(repo_dir, path))
+        self._reader = None
+
+    def get_imports(self, paths, cache=None, jobs=1, extractor=DEFAULT_EXTRACTOR):
+        """ Like extract.get_imports_parallel(), for files of this revision:
+        only the blobs not in the scan cache are read and scanned.
+
+        Returns: {<path:str>: <import records:list>}
+        """
+        imports = {}
+        todo = []
+        for path in paths:
+            if cache is not None:
+                cached = cache.get_by_digest(BLOB_DIGEST.format(self.blobs[path]))
+                if cached is not None:
+                    imports[path] = cached
+                    continue
+            todo.append(path)
+        stats.count("files", len(imports) + len(todo))
+        stats.count("cache hits (content)", len(imports))
+
+        if todo:
+            if self._reader is None:
+                self._reader = BlobReader(self.repo_dir)
+            blobs = [self.blobs[path] for path in todo]
+            sources = zip(todo, self._reader.read_many(blobs))
+            scanned = scan_sources(sources, jobs, extractor)
+            for path, blob, recs in zip(todo, blobs, scanned):
+                imports[path] = recs
+                if cache is not None:
+                    cache.put(None, None, None, BLOB_DIGEST.format(blob), recs)
+        return imports
+
+    def close(self):
+        if self._reader is not None:
+            self._reader.close()
+            self._reader = None
@@ -0,0 +1,489 @@
+""" Compact integer-indexed module graph.
+
+Module names are interned and numbered, and edges are stored in CSR form:
+the edges out of node i are targets[offsets[i]:offsets[i + 1]], in flat
+array('I') buffers, with a parallel array('B') of import scopes. That is a
+few bytes per edge instead of a dict entry and list per edge, which matters
+once a codebase has millions of imports.
+
+The dict based API (Module.direct_imports and Module.import_scopes) is kept
+as read-only mapping views over a ModuleGraph, see attach_views().
+"""
+
+
+import sys
+from array import array
+from collections.abc import Mapping
+
+from extract import FUNCTION_SCOPE, MODULE_SCOPE, TYPE_CHECKING_SCOPE
+
+
+# Scopes are stored as their index in this tuple, which is also their order
+# from most to least costly at import time
+SCOPES = (MODULE_SCOPE, FUNCTION_SCOPE, TYPE_CHECKING_SCOPE)
+SCOPE_IDS = {scope: i for i, scope in enumerate(SCOPES)}
+
+# Stands for the `[]` that direct_imports lists hold for a plain
+# `import x`, in the stored names tuples
+_PLAIN = ""
+
+
+class Node(object):
+    """ Metadata of a graph node. internal is True for the project's own
+    modules, False for the modules they import from elsewhere. count is the
+    number of modules the node stands for, see collapse().
+    """
+
+    __slots__ = ("file", "internal", "import_time", "count")
+
+    def __init__(self, file=None, internal=False, import_time=None, count=1):
+        self.file = file
+        self.internal = internal
+        self.import_time = import_time
+        self.count = count
+
+
+class GraphBuilder(object):
+    """ Accumulates nodes and edges, in any order, into a ModuleGraph. """
+
+    def __init__(self):
+        self.names = []
+        self.ids = {}
+        self.nodes = []
+        self._src = array("I")
+        self._dst = array("I")
+        self._scopes = array("B")
+        self._edge_names = []
+        self._names_tuples = {}
+        # only allocated once an edge weighs more than 1
+        self._weights = None
+
+    def add_node(self, name, file=None, internal=False):
+        """ Return the id of the named node, adding it if needed. """
+        node_id = self.ids.get(name)
+        if node_id is None:
+            node_id = self.ids[name] = len(self.names)
+            self.names.append(sys.intern(name))
+            self.nodes.append(Node(file, internal))
+        elif internal:
+            node = self.nodes[node_id]
+            node.file = file
+            node.internal = True
+        return node_id
+
+    def add_edge(self, src, dst, names=(), scope=MODULE_SCOPE, weight=1):
+        """ Add an edge between two node ids. names is the list of names
+        imported, as found in direct_imports, and weight the number of
+        imports the edge stands for.
+        """
+        if weight != 1 and self._weights is None:
+            self._weights = array("I", [1]) * len(self._src)
+        if self._weights is not None:
+            self._weights.append(weight)
+        self._src.append(src)
+        self._dst.append(dst)
+        self._scopes.append(SCOPE_IDS[scope])
+        key = tuple(_PLAIN if name == [] else name for name in names)
+        # most edges import the same few lists of names, share them
+        self._edge_names.append(self._names_tuples.setdefault(key, key))
+
+    def add_module(self, name, direct_imports, import_scopes=None, file=None):
+        """ Add a project module and its edges from its direct_imports
+        mapping, and optionally import_scopes.
+        """
+        src = self.add_node(name, file, internal=True)
+        for dep, names in direct_imports.items():
+            scope = import_scopes.get(dep) if import_scopes else None
+            self.add_edge(src, self.add_node(dep), names, scope or MODULE_SCOPE)
+        return src
+
+    def build(self):
+        """ Sort the edges by source, stably, into a ModuleGraph. """
+        num_nodes = len(self.names)
+        offsets = array("I", [0]) * (num_nodes + 1)
+        for src in self._src:
+            offsets[src + 1] += 1
+        for i in range(num_nodes):
+            offsets[i + 1] += offsets[i]
+        num_edges = len(self._src)
+        targets = array("I", [0]) * num_edges
+        scopes = array("B", [0]) * num_edges
+        edge_names = [()] * num_edges
+        weights = None if self._weights is None else array("I", self._weights)
+        fill = array("I", offsets[:-1])
+        for e in range(num_edges):
+            src = self._src[e]
+            pos = fill[src]
+            fill[src] = pos + 1
+            targets[pos] = self._dst[e]
+            scopes[pos] = self._scopes[e]
+            edge_names[pos] = self._edge_names[e]
+            if weights is not None:
+                weights[pos] = self._weights[e]
+        return ModuleGraph(
+            self.names,
+            self.ids,
+            self.nodes,
+            offsets,
+            targets,
+            scopes,
+            edge_names,
+            weights,
+        )
+
+
+class ModuleGraph(object):
+    """ Immutable CSR module graph, see the module docstring. """
+
+    __slots__ = (
+        "names",
+        "ids",
+        "nodes",
+        "offsets",
+        "targets",
+        "scopes",
+        "edge_names",
+        "weights",
+        "_succ",
+        "_reverse",
+    )
+
+    def __init__(
+        self, names, ids, nodes, offsets, targets, scopes, edge_names, weights=None
+    ):
+        self.names = names
+        self.ids = ids
+        self.nodes = nodes
+        self.offsets = offsets
+        self.targets = targets
+        self.scopes = scopes
+        self.edge_names = edge_names
+        # edge multiplicities, None when they are all 1
+        self.weights = weights
+        self._succ = None
+        self._reverse = None
+
+    @classmethod
+    def from_mod_dict(cls, mod_dict):
+        """ Build a graph from a module dictionary whose modules have
+        direct_imports (and optionally import_scopes) mappings.
+        """
+        builder = GraphBuilder()
+        # the project's modules get the first ids
+        for name, module in sorted(mod_dict.items()):
+            builder.add_node(name, module.__file__, internal=True)
+        for name, module in sorted(mod_dict.items()):
+            builder.add_module(
+                name,
+                module.direct_imports,
+                getattr(module, "import_scopes", None),
+                module.__file__,
+            )
+        graph = builder.build()
+        for name, module in mod_dict.items():
+            graph.nodes[graph.ids[name]].import_time = getattr(
+                module, "import_time", None
+            )
+        return graph
+
+    def __len__(self):
+        return len(self.names)
+
+    @property
+    def num_edges(self):
+        return len(self.targets)
+
+    def out_edges(self, node):
+        """ Range of the ids of the edges out of node. """
+        return range(self.offsets[node], self.offsets[node + 1])
+
+    def successors(self, node):
+        return self.targets[self.offsets[node] : self.offsets[node + 1]]
+
+    @property
+    def succ(self):
+        """ Adjacency lists, as used by the functions in analysis.py. """
+        if self._succ is None:
+            self._succ = _Successors(self)
+        return self._succ
+
+    @property
+    def reverse(self):
+        """ The transpose of the graph, built on first use: the index of the
+        modules importing each module.
+        """
+        if self._reverse is None:
+            self._reverse = self.transpose()
+        return self._reverse
+
+    def transpose(self):
+        """ Return a new graph with every edge reversed, keeping its scope,
+        names and weight. Node ids are unchanged.
+        """
+        num_nodes = len(self.names)
+        num_edges = len(self.targets)
+        offsets = array("I", [0]) * (num_nodes + 1)
+        for dst in self.targets:
+            offsets[dst + 1] += 1
+        for i in range(num_nodes):
+            offsets[i + 1] += offsets[i]
+        targets = array("I", [0]) * num_edges
+        scopes = array("B", [0]) * num_edges
+        edge_names = [()] * num_edges
+        weights = None if self.weights is None else array("I", [0]) * num_edges
+        fill = array("I", offsets[:-1])
+        for src, dst, e in self.edges():
+            pos = fill[dst]
+            fill[dst] = pos + 1
+            targets[pos] = src
+            scopes[pos] = self.scopes[e]
+            edge_names[pos] = self.edge_names[e]
+            if weights is not None:
+                weights[pos] = self.weights[e]
+        return ModuleGraph(
+            self.names,
+            self.ids,
+            self.nodes,
+            offsets,
+            targets,
+            scopes,
+            edge_names,
+            weights,
+        )
+
+    def edges(self):
+        """ Generate (source id, target id, edge id) for every edge. """
+        offsets, targets = self.offsets, self.targets
+        for src in range(len(self.names)):
+            for e in range(offsets[src], offsets[src + 1]):
+                yield src, targets[e], e
+
+    def edge_scope(self, e):
+        return SCOPES[self.scopes[e]]
+
+    def edge_weight(self, e):
+        return 1 if self.weights is None else self.weights[e]
+
+    def filter_edges(self, keep):
+        """ Return a new graph with only the edges for which keep(edge id) is
+        true. Node ids are unchanged.
+        """
+        num_nodes = len(self.names)
+        offsets = array("I", [0]) * (num_nodes + 1)
+        targets = array("I")
+        scopes = array("B")
+        edge_names = []
+        weights = None if self.weights is None else array("I")
+        for src in range(num_nodes):
+            for e in self.out_edges(src):
+                if keep(e):
+                    targets.append(self.targets[e])
+                    scopes.append(self.scopes[e])
+                    edge_names.append(self.edge_names[e])
+                    if weights is not None:
+                        weights.append(self.weights[e])
+            offsets[src + 1] = len(targets)
+        return ModuleGraph(
+            self.names,
+            self.ids,
+            self.nodes,
+            offsets,
+            targets,
+            scopes,
+            edge_names,
+            weights,
+        )
+
+    def module_level(self):
+        """ The graph of only the imports that run at import time. """
+        module_scope = SCOPE_IDS[MODULE_SCOPE]
+        return self.filter_edges(lambda e: self.scopes[e] == module_scope)
+
+
+def package_prefix(name, depth):
+    """ The first depth components of a dotted name. """
+    return ".".join(name.split(".", depth)[:depth])
+
+
+def collapse(graph, depth):
+    """ Merge the modules of a graph into one node per package prefix of
+    depth components ("a.b.c" into "a.b" at depth 2).
+
+    A package node's count is the number of modules in it, and is internal
+    if any of them is. Edges between the same two packages are merged into
+    one, weighted by their number and in the most costly of their scopes.
+    Edges within a package are dropped.
+
+    Returns (collapsed graph, group): group[node] is the id in the collapsed
+    graph of each node of graph.
+    """
+    builder = GraphBuilder()
+    group = array("I")
+    for node, name in enumerate(graph.names):
+        meta = graph.nodes[node]
+        prefix = package_prefix(name, depth)
+        new = prefix not in builder.ids
+        group_id = builder.add_node(prefix)
+        group_node = builder.nodes[group_id]
+        if new:
+            group_node.count = 0
+        group_node.count += meta.count
+        group_node.internal = group_node.internal or meta.internal
+        group.append(group_id)
+    merged = {}
+    for src, dst, e in graph.edges():
+        key = (group[src], group[dst])
+        if key[0] == key[1]:
+            continue
+        scope, weight = merged.get(key, (len(SCOPES), 0))
+        merged[key] = (min(scope, graph.scopes[e]), weight + graph.edge_weight(e))
+    for (src, dst), (scope, weight) in sorted(merged.items()):
+        builder.add_edge(src, dst, (), SCOPES[scope], weight)
+    return builder.build(), group
+
+
+def group_subgraphs(graph, group, num_groups):
+    """ For every group of a collapse(), its member nodes and the edges that
+    start or end in it, as ([member ids], [(source id, target id, edge
+    id)]), for expanding the group again.
+    """
+    members = [[] for _ in range(num_groups)]
+    edges = [[] for _ in range(num_groups)]
+    for node in range(len(graph.names)):
+        members[group[node]].append(node)
+    for edge in graph.edges():
+        src, dst, _ = edge
+        edges[group[src]].append(edge)
+        if group[dst] != group[src]:
+            edges[group[dst]].append(edge)
+    return list(zip(members, edges))
+
+
+class _Successors(object):
+    """ Sequence view of a graph's adjacency lists. """
+
+    __slots__ = ("graph",)
+
+    def __init__(self, graph):
+        self.graph = graph
+
+    def __len__(self):
+        return len(self.graph.names)
+
+    def __getitem__(self, node):
+        return self.graph.successors(node)
+
+    def __iter__(self):
+        graph = self.graph
+        for node in range(len(graph.names)):
+            yield graph.successors(node)
+
+
+class _EdgeView(Mapping):
+    """ Read-only mapping over the edges out of one node, keyed by the
+    imported module's name.
+    """
+
+    __slots__ = ("graph", "node")
+
+    def __init__(self, graph, node):
+        self.graph = graph
+        self.node = node
+
+    def _edge(self, name):
+        graph = self.graph
+        dst = graph.ids.get(name)
+        if dst is not None:
+            for e in graph.out_edges(self.node):
+                if graph.targets[e] == dst:
+                    return e
+        raise KeyError(name)
+
+    def __iter__(self):
+        graph = self.graph
+        names, targets = graph.names, graph.targets
+        for e in graph.out_edges(self.node):
+            yield names[targets[e]]
+
+    def __len__(self):
+        return len(self.graph.out_edges(self.node))
+
+    def __repr__(self):
+        return "{}({!r})".format(type(self).__name__, dict(self.items()))
+
+
+class ImportsView(_EdgeView):
+    """ Module.direct_imports backed by a ModuleGraph:
+    {<module name:str>: <list of names imported from the module:list(str)>}
+    """
+
+    __slots__ = ()
+
+    def __getitem__(self, name):
+        names = self.graph.edge_names[self._edge(name)]
+        return [[] if n == _PLAIN else n for n in names]
+
+
+class ScopesView(_EdgeView):
+    """ Module.import_scopes backed by a ModuleGraph. """
+
+    __slots__ = ()
+
+    def __getitem__(self, name):
+        return self.graph.edge_scope(self._edge(name))
+
+
+class ImportersView(Mapping):
+    """ Module.imported_by backed by a ModuleGraph's reverse index: the
+    modules importing a module, mapped to the names they import from it.
+    """
+
+    __slots__ = ("graph", "node")
+
+    def __init__(self, graph, node):
+        self.graph = graph
+        self.node = node
+
+    def _view(self):
+        return ImportsView(self.graph.reverse, self.node)
+
+    def __getitem__(self, name):
+        return self._view()[name]
+
+    def __iter__(self):
+        return iter(self._view())
+
+    def __len__(self):
+        return len(self._view())
+
+    def __repr__(self):
+        return "{}({!r})".format(type(self).__name__, dict(self.items()))
+
+
+def attach_views(mod_dict, graph):
+    """ Point the direct_imports, import_scopes and imported_by of every
+    module in mod_dict at graph.
+    """
+    for name, module in mod_dict.items():
+        node = graph.ids[name]
+        module.direct_imports = ImportsView(graph, node)
+        module.import_scopes = ScopesView(graph, node)
+        module.imported_by = ImportersView(graph, node)
+
+
+def graph_of(mod_dict):
+    """ The ModuleGraph behind a module dictionary's direct_imports views, or
+    a new one built from its direct_imports if they aren't all views of the
+    same graph (e.g. after watch mode patched some modules).
+    """
+    graph = None
+    for module in mod_dict.values():
+        view = module.direct_imports
+        if not isinstance(view, ImportsView) or (
+            graph is not None and view.graph is not graph
+        ):
+            return ModuleGraph.from_mod_dict(mod_dict)
+        graph = view.graph
+    if graph is None or len(mod_dict) != sum(n.internal for n in graph.nodes):
+        return ModuleGraph.from_mod_dict(mod_dict)
+    return graph
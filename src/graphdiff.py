@@ -0,0 +1,176 @@
+""" Differences between two graph.ModuleGraphs, such as two snapshots of the
+same project (see snapshot.py) taken before and after a change.
+
+Modules are matched by name, since node ids of two graphs are unrelated.
+"""
+
+
+from analysis import component_ids, import_cycles, strongly_connected_components
+
+
+class GraphDiff(object):
+    """ Result of diff_graphs().
+
+    added_modules, removed_modules: sorted module names
+    added_edges, removed_edges: sorted [(<importer>, <imported>)] names
+    scope_changes: sorted [(<importer>, <imported>, <old scope>,
+        <new scope>)] for the imports found in both graphs
+    new_cycles, fixed_cycles: [(<sorted module names>, <witness cycle>)] the
+        import cycles (see analysis.import_cycles()) of module level imports
+        that are only in the new or only in the old graph
+    closure_changes: [(<module>, <old closure size>, <new closure size>,
+        <number of modules importing it>)] for the modules whose own imports
+        changed, biggest change first. The closure is everything a module
+        imports at import time, directly or not. Every importer of the
+        module (counted in the last column) sees its closure change too.
+    """
+
+    def __init__(
+        self,
+        added_modules,
+        removed_modules,
+        added_edges,
+        removed_edges,
+        scope_changes,
+        new_cycles,
+        fixed_cycles,
+        closure_changes,
+    ):
+        self.added_modules = added_modules
+        self.removed_modules = removed_modules
+        self.added_edges = added_edges
+        self.removed_edges = removed_edges
+        self.scope_changes = scope_changes
+        self.new_cycles = new_cycles
+        self.fixed_cycles = fixed_cycles
+        self.closure_changes = closure_changes
+
+    def __bool__(self):
+        return bool(
+            self.added_modules
+            or self.removed_modules
+            or self.added_edges
+            or self.removed_edges
+            or self.scope_changes
+        )
+
+
+def _edge_scopes(graph, node_ids, num_nodes):
+    """ {<importer id> * num_nodes + <imported id>: scope} of every edge of
+    graph, with node ids translated through node_ids.
+    """
+    scopes = {}
+    for src, dst, e in graph.edges():
+        scopes[node_ids[src] * num_nodes + node_ids[dst]] = graph.edge_scope(e)
+    return scopes
+
+
+def _cycles_by_members(graph):
+    names = graph.names
+    return {
+        frozenset(names[v] for v in component): (
+            [names[v] for v in component],
+            [names[v] for v in cycle],
+        )
+        for component, cycle in import_cycles(graph.succ)
+    }
+
+
+class _ClosureSizes(object):
+    """ Number of nodes reachable from a node of succ (itself excluded),
+    computed once per strongly connected component, since every node of a
+    component reaches the same nodes.
+    """
+
+    def __init__(self, succ, comp_of=None):
+        self.succ = succ
+        if comp_of is None:
+            comp_of = component_ids(len(succ), strongly_connected_components(succ))
+        self.comp_of = comp_of
+        self.sizes = {}
+
+    def __call__(self, start):
+        comp = self.comp_of[start]
+        size = self.sizes.get(comp)
+        if size is None:
+            succ = self.succ
+            seen = bytearray(len(succ))
+            seen[start] = 1
+            todo = [start]
+            size = 0
+            while todo:
+                for w in succ[todo.pop()]:
+                    if not seen[w]:
+                        seen[w] = 1
+                        size += 1
+                        todo.append(w)
+            self.sizes[comp] = size
+        return size
+
+
+def diff_graphs(old, new):
+    """ Compare two ModuleGraphs. Returns a GraphDiff.
+
+    Runs in time linear in the size of both graphs, plus a search of the
+    closure of every import cycle or module whose imports changed.
+    """
+    # Number the nodes of both graphs in one id space: new's ids, then the
+    # names only old has
+    names = list(new.names)
+    ids = dict(new.ids)
+    old_ids = []
+    for name in old.names:
+        node = ids.get(name)
+        if node is None:
+            node = ids[name] = len(names)
+            names.append(name)
+        old_ids.append(node)
+    num_nodes = len(names)
+
+    old_scopes = _edge_scopes(old, old_ids, num_nodes)
+    new_scopes = _edge_scopes(new, range(len(new)), num_nodes)
+
+    def pairs(keys):
+        return sorted((names[key // num_nodes], names[key % num_nodes]) for key in keys)
+
+    added = [key for key in new_scopes if key not in old_scopes]
+    removed = [key for key in old_scopes if key not in new_scopes]
+    scope_changes = sorted(
+        (names[key // num_nodes], names[key % num_nodes], scope, new_scopes[key])
+        for key, scope in old_scopes.items()
+        if key in new_scopes and new_scopes[key] != scope
+    )
+
+    old_level, new_level = old.module_level(), new.module_level()
+    old_cycles = _cycles_by_members(old_level)
+    new_cycles = _cycles_by_members(new_level)
+
+    old_closure = _ClosureSizes(old_level.succ)
+    new_closure = _ClosureSizes(new_level.succ)
+    # the reverse graph has the same components
+    importers = _ClosureSizes(new_level.reverse.succ, new_closure.comp_of)
+    closure_changes = []
+    changed = set(names[key // num_nodes] for key in added)
+    changed.update(names[key // num_nodes] for key in removed)
+    changed.update(importer for importer, _, _, _ in scope_changes)
+    for name in changed:
+        before = after = affected = 0
+        if name in old.ids:
+            before = old_closure(old.ids[name])
+        if name in new.ids:
+            after = new_closure(new.ids[name])
+            affected = importers(new.ids[name])
+        if before != after:
+            closure_changes.append((name, before, after, affected))
+    closure_changes.sort(key=lambda item: (-abs(item[2] - item[1]), item[0]))
+
+    return GraphDiff(
+        sorted(set(new.names).difference(old.names)),
+        sorted(set(old.names).difference(new.names)),
+        pairs(added),
+        pairs(removed),
+        scope_changes,
+        [new_cycles[key] for key in new_cycles if key not in old_cycles],
+        [old_cycles[key] for key in old_cycles if key not in new_cycles],
+        closure_changes,
+    )
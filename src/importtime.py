@@ -0,0 +1,91 @@
+""" Measure import time by running an entry point under `python -X importtime`.
+
+With -X importtime (Python 3.7+) the interpreter writes one line per imported
+module to stderr:
+
+    import time: self [us] | cumulative | imported package
+    import time:       125 |        125 |   _io
+    import time:      1042 |       3021 | path.to.module_c
+
+where self is the time spent executing the module itself, and cumulative adds
+the time spent in the imports it triggered.
+"""
+
+
+import os
+import re
+import subprocess
+import sys
+
+
+IMPORTTIME_RE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|\s*(\S+)\s*$")
+
+
+def parse_importtime(lines):
+    """ Parse -X importtime output.
+
+    Returns: {<module name:str>: (<self us:int>, <cumulative us:int>)}
+    """
+    times = {}
+    for line in lines:
+        match = IMPORTTIME_RE.match(line)
+        if match:
+            self_us, cumulative_us, name = match.groups()
+            times[name] = (int(self_us), int(cumulative_us))
+    return times
+
+
+def profile_entry(script, root_dir=None, python=sys.executable, timeout=None):
+    """ Run script in a subprocess with -X importtime and return the parsed
+    import times. The script actually runs, so its output is discarded.
+
+    :param root_dir: the project's root dir, put on the PYTHONPATH if it
+    differs from the script's dir
+    """
+    env = dict(os.environ)
+    if root_dir:
+        pythonpath = [os.path.abspath(root_dir)]
+        if env.get("PYTHONPATH"):
+            pythonpath.append(env["PYTHONPATH"])
+        env["PYTHONPATH"] = os.pathsep.join(pythonpath)
+    proc = subprocess.Popen(
+        [python, "-X", "importtime", os.path.abspath(script)],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        env=env,
+        universal_newlines=True,
+    )
+    try:
+        _, stderr = proc.communicate(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+        _, stderr = proc.communicate()
+    if proc.returncode:
+        sys.stderr.write(
+            "{} exited with status {}, import times may be incomplete\n".format(
+                script, proc.returncode
+            )
+        )
+    return parse_importtime(stderr.splitlines())
+
+
+def attach_import_times(mod_dict, times):
+    """ Set the import_time attribute of every module in mod_dict that was
+    imported to its (self us, cumulative us) tuple.
+    """
+    for name, module in mod_dict.items():
+        module.import_time = times.get(name)
+
+
+def heat_attrs(cumulative_us, max_us):
+    """ graphviz node attributes for a module whose cumulative import time is
+    cumulative_us: shaded from white (instant) to red (the slowest module),
+    larger for slower modules, and labelled with the time.
+    """
+    heat = float(cumulative_us) / max_us if max_us else 0.0
+    return {
+        "style": "filled",
+        "fillcolor": "0.000 {:.3f} 1.000".format(heat),
+        "fontsize": "{:.0f}".format(14 + 16 * heat),
+        "xlabel": "{:.1f} ms".format(cumulative_us / 1000.0),
+    }
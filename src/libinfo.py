@@ -14,8 +14,13 @@ These are used to give more useful error messages when there is
 no stub for a module.
 """
 
+import hashlib
+import json
 import os
-import distutils.sysconfig as sysconfig
+import sys
+import sysconfig
+
+import stats
 
 
 third_party_modules = {
@@ -558,16 +563,135 @@ python3_std_lib_modules = common_std_lib_modules | {
 }  # type: Final
 
 
+# Kinds of module returned by ModuleClassifier.classify()
+FIRST_PARTY = "first_party"
+STDLIB = "stdlib"
+THIRD_PARTY = "third_party"
+UNKNOWN = "unknown"
+
+# Trie key marking the end of a dotted name ("" is never a name component)
+_END = ""
+
+
+class ModuleIndex(object):
+    """ A collection of dotted module names that answers whether a name, or
+    any of its parent packages, is in the collection.
+
+    Undotted names go in a frozenset, so the common case is a single set
+    lookup on the name's top level; dotted names go in a trie of components.
+    """
+
+    __slots__ = ("roots", "trie")
+
+    def __init__(self, names):
+        roots = set()
+        trie = {}
+        for name in names:
+            if "." not in name:
+                roots.add(name)
+                continue
+            node = trie
+            for part in name.split("."):
+                node = node.setdefault(part, {})
+            node[_END] = True
+        self.roots = frozenset(roots)
+        self.trie = trie
+
+    def __contains__(self, name):
+        dot = name.find(".")
+        if (name if dot < 0 else name[:dot]) in self.roots:
+            return True
+        if dot < 0:
+            return False
+        node = self.trie
+        for part in name.split("."):
+            node = node.get(part)
+            if node is None:
+                return False
+            if _END in node:
+                return True
+        return False
+
+
+_indexes = {}
+
+
+def _get_index(key, names):
+    """ Build the ModuleIndex for a collection of names once per key. """
+    index = _indexes.get(key)
+    if index is None:
+        index = _indexes[key] = ModuleIndex(names())
+    return index
+
+
+def _std_lib_index(py_version):
+    if py_version == 2:
+        return _get_index("py2", lambda: python2_std_lib_modules)
+    # The interpreter's own stdlib is only meaningful for its own version
+    if py_version == sys.version_info[0]:
+        return _get_index(
+            "py3+", lambda: python3_std_lib_modules | std_lib_modules()
+        )
+    return _get_index("py3", lambda: python3_std_lib_modules)
+
+
+def _third_party_index():
+    return _get_index("third_party", lambda: third_party_modules)
+
+
+class ModuleClassifier(object):
+    """ Classify dotted module names as FIRST_PARTY (a module of the project
+    being analyzed), STDLIB, THIRD_PARTY (a known third party library) or
+    UNKNOWN.
+
+    :param first_party: container of the project's module names, e.g. the
+    module dictionary; membership is exact and checked on every call, so the
+    container may change between calls
+    """
+
+    def __init__(self, first_party=(), py_version=sys.version_info[0]):
+        self.first_party = first_party
+        self.std_lib = _std_lib_index(py_version)
+        self.third_party = _third_party_index()
+        self._memo = {}
+
+    def classify(self, name):
+        if name in self.first_party:
+            return FIRST_PARTY
+        kind = self._memo.get(name)
+        if kind is None:
+            with stats.timer("classify"):
+                if name in self.std_lib:
+                    kind = STDLIB
+                elif name in self.third_party:
+                    kind = THIRD_PARTY
+                else:
+                    kind = UNKNOWN
+            self._memo[name] = kind
+        return kind
+
+
+_classifiers = {}
+
+
+def default_classifier(py_version):
+    """ Shared ModuleClassifier with no first party modules. """
+    classifier = _classifiers.get(py_version)
+    if classifier is None:
+        classifier = _classifiers[py_version] = ModuleClassifier((), py_version)
+    return classifier
+
+
 def is_third_party_module(id):
-    return is_in_module_collection(third_party_modules, id)
+    return id in _third_party_index()
 
 
 def is_py2_std_lib_module(id):
-    return is_in_module_collection(python2_std_lib_modules, id)
+    return id in _get_index("py2", lambda: python2_std_lib_modules)
 
 
 def is_py3_std_lib_module(id):
-    return is_in_module_collection(python3_std_lib_modules, id)
+    return id in _get_index("py3", lambda: python3_std_lib_modules)
 
 
 def is_in_module_collection(collection, id):
@@ -580,28 +704,101 @@ def is_in_module_collection(collection, id):
 
 def get_std_lib_modules():
     """ Create a set of this version of python's standard library module names
-    by walking the standard library directory.
+    by walking the standard library directory. Packages are included by
+    their own name as well as by their submodules' names.
     """
-    std_lib = sysconfig.get_python_lib(standard_lib=True)
+    std_lib = sysconfig.get_paths()["stdlib"]
     std_modules = []
     for top, dirs, files in os.walk(std_lib):
+        # third party packages can live inside the stdlib dir
+        dirs[:] = [d for d in dirs if d not in ("site-packages", "dist-packages")]
         for nm in files:
-            if nm != "__init__.py" and nm[-3:] == ".py":
+            if nm[-3:] == ".py":
                 mod_path = os.path.join(top, nm)
                 mod_name = mod_path[len(std_lib) + 1 : -3].replace("/", ".")
+                if nm == "__init__.py":
+                    mod_name = mod_name[: -len(".__init__")]
                 std_modules.append(mod_name)
     return set(std_modules)
 
 
-STD_LIB_MODULES = get_std_lib_modules()
+def user_cache_path(kind):
+    """ Per-interpreter location of a cached index of modules, such as the
+    stdlib's.
+    """
+    cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.join(
+        os.path.expanduser("~"), ".cache"
+    )
+    key = "{}\0{}".format(sys.executable, sys.version).encode("utf-8")
+    return os.path.join(
+        cache_home,
+        "import-visualizer",
+        "{}-{}.json".format(kind, hashlib.sha1(key).hexdigest()[:16]),
+    )
+
+
+def read_cache(path):
+    """ The JSON data cached at path, or None if it can't be read. """
+    try:
+        with open(path) as fp:
+            return json.load(fp)
+    except (IOError, OSError, ValueError):
+        return None
+
+
+def write_cache(path, data):
+    """ Atomically cache data as JSON at path, if possible. """
+    try:
+        cache_dir = os.path.dirname(path)
+        if not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir)
+        tmp_path = "{}.{}.tmp".format(path, os.getpid())
+        with open(tmp_path, "w") as fp:
+            json.dump(data, fp)
+        os.rename(tmp_path, path)
+    except (IOError, OSError):
+        # A read-only home just means building the index again next time
+        pass
+
+
+def _std_lib_cache_path():
+    """ Per-interpreter location of the cached stdlib module index. """
+    return user_cache_path("stdlib")
+
+
+def _load_std_lib_modules():
+    """ Build the stdlib module index, preferring the interpreter's own list
+    (3.10+), then a cached walk of the stdlib directory, then a fresh walk
+    which is cached for next time.
+    """
+    names = getattr(sys, "stdlib_module_names", None)
+    if names is not None:
+        return frozenset(names)
+
+    cache_path = _std_lib_cache_path()
+    cached = read_cache(cache_path)
+    if cached is not None:
+        return frozenset(cached)
+
+    modules = get_std_lib_modules()
+    write_cache(cache_path, sorted(modules))
+    return frozenset(modules)
+
+
+_std_lib_modules = None
+
+
+def std_lib_modules():
+    """ Return the stdlib module index, building it on first use. """
+    global _std_lib_modules
+    if _std_lib_modules is None:
+        _std_lib_modules = _load_std_lib_modules()
+    return _std_lib_modules
 
 
 def is_std_lib_module(mname, py_version):
-    """ Return true if the module's name is in either the list dynamically
-    generated by get_std_lib_modules() or the hardcoded list retreived by
-    either is_py2_std_lib_module() or is_py3_std_lib_module().
+    """ Return true if the module's name, or one of its parent packages, is in
+    either the index returned by std_lib_modules() or the hardcoded list for
+    py_version.
     """
-    is_in_hardcoded_list = (
-        is_py2_std_lib_module if py_version == 2 else is_py3_std_lib_module
-    )
-    return is_in_hardcoded_list(mname) or mname in STD_LIB_MODULES
+    return default_classifier(py_version).classify(mname) == STDLIB
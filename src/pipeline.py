@@ -0,0 +1,178 @@
+""" Read files on a pool of threads ahead of scanning them.
+
+On network file systems a scan spends most of its time waiting for open()
+and read(), with the CPU idle. Here the I/O is split off into a stage of
+its own: reader threads stat and read the files, and hand their contents to
+the scanning stage through a queue. Reads are issued concurrently, so their
+latencies overlap with each other and with the scanning.
+
+The read-ahead is bounded by a memory cap: readers stop starting reads while
+the contents waiting in the queue add up to more than the cap.
+"""
+
+
+import queue
+import threading
+from collections import deque
+
+import stats
+from cache import file_digest, stat_key
+from extract import DEFAULT_EXTRACTOR, scan_sources
+
+
+# Default number of reader threads for --io-threads
+DEFAULT_IO_THREADS = 16
+
+# Default cap on the contents read ahead of the scanner, in bytes
+DEFAULT_IO_BUFFER = 64 * 1024 * 1024
+
+
+def _read(path):
+    with open(path, "rb") as fp:
+        return fp.read()
+
+
+class Prefetcher(object):
+    """ Read files ahead of their consumer on `threads` threads. Iterating
+    generates the (path, contents) of every file in paths, in the order
+    the reads complete, with at most about max_bytes of contents read but
+    not yet consumed. An error reading a file is raised from the iteration.
+
+    :param read: function reading a path, by default to its bytes
+    :param weight: function giving the number of bytes of what read returns
+    """
+
+    def __init__(
+        self,
+        paths,
+        threads=DEFAULT_IO_THREADS,
+        max_bytes=DEFAULT_IO_BUFFER,
+        read=_read,
+        weight=len,
+    ):
+        self.paths = list(paths)
+        self.threads = max(1, min(threads, len(self.paths)))
+        self.max_bytes = max_bytes
+        self.read = read
+        self.weight = weight
+        self._next = iter(self.paths)
+        self._done = queue.Queue()
+        self._space = threading.Condition()
+        self._buffered = 0
+        self._closed = False
+
+    def _reader(self):
+        while True:
+            with self._space:
+                while self._buffered >= self.max_bytes and not self._closed:
+                    self._space.wait()
+                if self._closed:
+                    return
+                path = next(self._next, None)
+            if path is None:
+                return
+            try:
+                data = self.read(path)
+            except Exception as e:
+                self._done.put((path, None, e))
+                continue
+            with self._space:
+                self._buffered += self.weight(data)
+            self._done.put((path, data, None))
+
+    def __iter__(self):
+        if not self.paths:
+            return
+        for _ in range(self.threads):
+            reader = threading.Thread(target=self._reader)
+            reader.daemon = True
+            reader.start()
+        try:
+            for _ in range(len(self.paths)):
+                path, data, error = self._done.get()
+                if error is not None:
+                    raise error
+                with self._space:
+                    was_full = self._buffered >= self.max_bytes
+                    self._buffered -= self.weight(data)
+                    if was_full and self._buffered < self.max_bytes:
+                        self._space.notify_all()
+                yield path, data
+        finally:
+            with self._space:
+                self._closed = True
+                self._space.notify_all()
+
+
+def _read_with_stat(path):
+    """ Read a file and its scan cache key. The stat comes first, like in
+    extract.get_imports(): if the file changes in between, it is rescanned
+    on the next run.
+    """
+    key = stat_key(path)
+    return key, _read(path)
+
+
+def _contents_weight(read):
+    return len(read[1])
+
+
+def _no_weight(read):
+    return 0
+
+
+def get_imports_prefetched(
+    paths,
+    cache=None,
+    jobs=1,
+    extractor=DEFAULT_EXTRACTOR,
+    threads=DEFAULT_IO_THREADS,
+    max_bytes=DEFAULT_IO_BUFFER,
+):
+    """ Like extract.get_imports_parallel(), with the files read by a
+    Prefetcher. The stats for the scan cache run on the reader threads too,
+    but the cache itself is only used from the calling thread. Scans run in
+    the calling thread, or in a pool of `jobs` processes if jobs > 1 (None
+    for one per CPU).
+
+    Returns: {<path:str>: <import records:list>}
+    """
+    imports = {}
+    todo = list(paths)
+    stats.count("files", len(todo))
+    if cache is not None:
+        keys = Prefetcher(todo, threads, max_bytes, stat_key, _no_weight)
+        todo = []
+        for path, key in keys:
+            cached = cache.get_by_stat(path, *key)
+            if cached is None:
+                todo.append(path)
+            else:
+                imports[path] = cached
+        stats.count("cache hits (stat)", len(imports))
+
+    # (path, stat key, digest) of the files handed to the scanner, in order
+    scanning = deque()
+
+    def sources():
+        reads = Prefetcher(todo, threads, max_bytes, _read_with_stat, _contents_weight)
+        for path, (key, data) in reads:
+            digest = None
+            if cache is not None:
+                digest = file_digest(data)
+                cached = cache.get_by_digest(digest)
+                if cached is not None:
+                    stats.count("bytes read", len(data))
+                    stats.count("cache hits (content)")
+                    cache.touch(path, key[0], key[1], digest)
+                    imports[path] = cached
+                    continue
+            scanning.append((path, key, digest))
+            yield path, data
+
+    for recs in scan_sources(sources(), jobs, extractor):
+        path, (mtime, size), digest = scanning.popleft()
+        imports[path] = recs
+        if cache is not None:
+            cache.put(path, mtime, size, digest, recs)
+    return imports
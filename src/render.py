@@ -0,0 +1,927 @@
+""" Write a graph.ModuleGraph in various formats without going through
+graphviz, which can't lay out graphs of more than a few thousand nodes in
+reasonable time.
+
+Every writer streams its output, node by node and edge by edge, so memory
+use doesn't grow with the size of the output:
+
+    dot      DOT source, for graphviz or any other DOT tool
+    json     node-link JSON, as read by networkx.node_link_graph() and d3
+    graphml  GraphML, for Gephi, Cytoscape, yEd...
+    html     a self-contained page that lays out and draws the graph itself
+
+write_edge_stream() writes edges as they are found instead, as DOT or as
+JSON lines (jsonl), for vis.py --stream.
+"""
+
+
+import contextlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+from xml.sax.saxutils import escape, quoteattr
+
+from analysis import cycle_edges
+from formats import (
+    CYCLE_COLOR,
+    FORMAT_DOT,
+    FORMAT_GRAPHML,
+    FORMAT_HTML,
+    FORMAT_JSON,
+    FORMAT_JSONL,
+    SCOPE_EDGE_STYLES,
+    VENDOR_COLOR,
+)
+from graph import collapse, group_subgraphs
+from importtime import heat_attrs
+
+
+def _max_time(import_times):
+    if not import_times:
+        return 0
+    return max(cumulative for _, cumulative in import_times.values())
+
+
+def _imported_names(names):
+    """ The names of an edge's names tuple (see graph.GraphBuilder), without
+    the markers of plain `import x` statements.
+    """
+    return [name for name in names if name]
+
+
+def module_cycle_edges(graph):
+    """ The (source id, target id) pairs of the module level imports of
+    graph that are part of an import cycle.
+    """
+    return cycle_edges(graph.module_level().succ)
+
+
+def _node_label(name, count):
+    return name if count == 1 else "{} ({})".format(name, count)
+
+
+def distribution_groups(graph, distributions):
+    """ The modules of graph from elsewhere than the project, grouped by
+    the distribution providing them, found in distributions (a
+    distinfo.DistributionIndex, or None for no groups).
+
+    :rtype: {(<distribution:str>, <version:str>): [<node id:int>]}
+    """
+    groups = {}
+    if distributions is None:
+        return groups
+    nodes = graph.nodes
+    for node, name in enumerate(graph.names):
+        if not nodes[node].internal:
+            dist = distributions.distribution_of(name)
+            if dist is not None:
+                groups.setdefault(dist, []).append(node)
+    return groups
+
+
+def _dot_id(text):
+    return '"{}"'.format(text.replace("\\", "\\\\").replace('"', '\\"'))
+
+
+def _dot_attrs(attrs):
+    if not attrs:
+        return ""
+    return " [{}]".format(
+        ", ".join(
+            "{}={}".format(key, _dot_id(value)) for key, value in sorted(attrs.items())
+        )
+    )
+
+
+def write_dot(graph, fp, graph_name, import_times=None, distributions=None):
+    """ DOT source with the same styling as vis.mod_dict_to_dag(). Given a
+    distinfo.DistributionIndex, modules from elsewhere than the project are
+    clustered by the distribution providing them.
+    """
+    max_us = _max_time(import_times)
+    in_cycle = module_cycle_edges(graph)
+    names, nodes = graph.names, graph.nodes
+    groups = distribution_groups(graph, distributions)
+    grouped = set(node for members in groups.values() for node in members)
+
+    def node_line(node):
+        name = names[node]
+        attrs = {}
+        if not nodes[node].internal:
+            attrs["color"] = VENDOR_COLOR
+        if nodes[node].count != 1:
+            attrs["label"] = _node_label(name, nodes[node].count)
+        if import_times and name in import_times:
+            attrs.update(heat_attrs(import_times[name][1], max_us))
+        return "\t{}{}\n".format(_dot_id(name), _dot_attrs(attrs))
+
+    fp.write("digraph {} {{\n".format(_dot_id(graph_name)))
+    for node in range(len(names)):
+        if node not in grouped:
+            fp.write(node_line(node))
+    for (dist, version), members in sorted(groups.items()):
+        fp.write("\tsubgraph {} {{\n".format(_dot_id("cluster_" + dist)))
+        fp.write("\t\tlabel={}\n".format(_dot_id("{} {}".format(dist, version))))
+        for node in members:
+            fp.write("\t" + node_line(node))
+        fp.write("\t}\n")
+    for src, dst, e in graph.edges():
+        attrs = {}
+        if not nodes[dst].internal:
+            attrs["color"] = VENDOR_COLOR
+        elif (src, dst) in in_cycle:
+            attrs["color"] = CYCLE_COLOR
+        scope = graph.edge_scope(e)
+        if scope in SCOPE_EDGE_STYLES:
+            attrs["style"] = SCOPE_EDGE_STYLES[scope]
+        weight = graph.edge_weight(e)
+        if weight != 1:
+            attrs["label"] = str(weight)
+        fp.write(
+            "\t{} -> {}{}\n".format(
+                _dot_id(names[src]), _dot_id(names[dst]), _dot_attrs(attrs)
+            )
+        )
+    fp.write("}\n")
+
+
+def _node_link_node(graph, node, import_times, distributions=None):
+    name = graph.names[node]
+    data = {
+        "id": name,
+        "internal": graph.nodes[node].internal,
+        "count": graph.nodes[node].count,
+    }
+    if import_times and name in import_times:
+        data["import_time"] = list(import_times[name])
+    if distributions is not None and not graph.nodes[node].internal:
+        dist = distributions.distribution_of(name)
+        if dist is not None:
+            data["distribution"], data["version"] = dist
+    return data
+
+
+def _node_link_link(graph, src, dst, e):
+    return {
+        "source": graph.names[src],
+        "target": graph.names[dst],
+        "scope": graph.edge_scope(e),
+        "multiplicity": graph.edge_weight(e),
+        "names": _imported_names(graph.edge_names[e]),
+    }
+
+
+def write_json(
+    graph, fp, graph_name, import_times=None, subgraphs=None, distributions=None
+):
+    """ node-link JSON: {"directed": true, "multigraph": false, "graph":
+    {"name": ...}, "nodes": [{"id": <module name>, "internal": <bool>,
+    "count": <number of modules>, "import_time": [<self us>, <cumulative
+    us>], "distribution": <name>, "version": <version>}], "links":
+    [{"source": <module name>, "target": <module name>, "scope": <scope>,
+    "multiplicity": <number of imports>, "names": [<names imported>]}]}
+
+    subgraphs maps node ids of a collapsed graph to the paths of their
+    subgraph files (see write_subgraph_json()), given as the node's
+    "subgraph". Given a distinfo.DistributionIndex, modules from installed
+    distributions get their "distribution" and "version".
+    """
+    fp.write('{"directed": true, "multigraph": false, "graph": ')
+    fp.write(json.dumps({"name": graph_name}))
+    fp.write(', "nodes": [')
+    for node in range(len(graph.names)):
+        data = _node_link_node(graph, node, import_times, distributions)
+        if subgraphs and node in subgraphs:
+            data["subgraph"] = subgraphs[node]
+        fp.write(("" if node == 0 else ",\n") + json.dumps(data, sort_keys=True))
+    fp.write('],\n"links": [')
+    for i, (src, dst, e) in enumerate(graph.edges()):
+        data = _node_link_link(graph, src, dst, e)
+        fp.write(("" if i == 0 else ",\n") + json.dumps(data, sort_keys=True))
+    fp.write("]}\n")
+
+
+def write_subgraph_json(graph, fp, package, members, edges, import_times=None):
+    """ node-link JSON of the modules of a collapsed package node (see
+    graph.group_subgraphs()) and of the imports from and to them, for
+    expanding it: {"package": <package node name>, "nodes": [...], "links":
+    [...]}, nodes and links as in write_json(), nodes with a "member" flag.
+    """
+    member_set = set(members)
+    ends = set(members)
+    for src, dst, _ in edges:
+        ends.add(src)
+        ends.add(dst)
+    nodes = []
+    for node in sorted(ends):
+        data = _node_link_node(graph, node, import_times)
+        data["member"] = node in member_set
+        nodes.append(data)
+    links = [_node_link_link(graph, src, dst, e) for src, dst, e in edges]
+    json.dump(
+        {"package": package, "nodes": nodes, "links": links}, fp, sort_keys=True
+    )
+
+
+_GRAPHML_HEAD = """<?xml version="1.0" encoding="UTF-8"?>
+<graphml xmlns="http://graphml.graphdrawing.org/xmlns">
+  <key id="internal" for="node" attr.name="internal" attr.type="boolean"/>
+  <key id="count" for="node" attr.name="count" attr.type="int"/>
+  <key id="self_us" for="node" attr.name="self_us" attr.type="long"/>
+  <key id="cumulative_us" for="node" attr.name="cumulative_us" attr.type="long"/>
+  <key id="distribution" for="node" attr.name="distribution" attr.type="string"/>
+  <key id="version" for="node" attr.name="version" attr.type="string"/>
+  <key id="scope" for="edge" attr.name="scope" attr.type="string"/>
+  <key id="multiplicity" for="edge" attr.name="multiplicity" attr.type="int"/>
+  <key id="names" for="edge" attr.name="names" attr.type="string"/>
+"""
+
+
+def write_graphml(graph, fp, graph_name, import_times=None, distributions=None):
+    """ GraphML, with the names imported along an edge comma separated, and
+    the distribution and version of modules from installed distributions
+    given a distinfo.DistributionIndex.
+    """
+    names, nodes = graph.names, graph.nodes
+    fp.write(_GRAPHML_HEAD)
+    fp.write(
+        '  <graph id={} edgedefault="directed">\n'.format(quoteattr(graph_name))
+    )
+    for node, name in enumerate(names):
+        fp.write("    <node id={}>".format(quoteattr(name)))
+        fp.write(
+            '<data key="internal">{}</data>'.format(
+                "true" if nodes[node].internal else "false"
+            )
+        )
+        fp.write('<data key="count">{}</data>'.format(nodes[node].count))
+        if import_times and name in import_times:
+            self_us, cumulative_us = import_times[name]
+            fp.write('<data key="self_us">{}</data>'.format(self_us))
+            fp.write('<data key="cumulative_us">{}</data>'.format(cumulative_us))
+        if distributions is not None and not nodes[node].internal:
+            dist = distributions.distribution_of(name)
+            if dist is not None:
+                fp.write('<data key="distribution">{}</data>'.format(escape(dist[0])))
+                fp.write('<data key="version">{}</data>'.format(escape(dist[1])))
+        fp.write("</node>\n")
+    for src, dst, e in graph.edges():
+        fp.write(
+            "    <edge source={} target={}>".format(
+                quoteattr(names[src]), quoteattr(names[dst])
+            )
+        )
+        fp.write('<data key="scope">{}</data>'.format(graph.edge_scope(e)))
+        fp.write('<data key="multiplicity">{}</data>'.format(graph.edge_weight(e)))
+        imported = _imported_names(graph.edge_names[e])
+        if imported:
+            fp.write(
+                '<data key="names">{}</data>'.format(escape(",".join(imported)))
+            )
+        fp.write("</edge>\n")
+    fp.write("  </graph>\n</graphml>\n")
+
+
+def _json_chunks(values, chunk_size=4096):
+    """ JSON array of values, generated in chunks. """
+    yield "["
+    for start in range(0, len(values), chunk_size):
+        chunk = json.dumps(list(values[start : start + chunk_size]))[1:-1]
+        yield ("," if start else "") + chunk
+    yield "]"
+
+
+def _script_safe(text):
+    # a JSON string can't end the <script> element it is embedded in
+    return text.replace("</", "<\\/")
+
+
+def _html_times(names, import_times):
+    return [
+        import_times[name][1] if import_times and name in import_times else 0
+        for name in names
+    ]
+
+
+def _html_subgraph(graph, members, edges, import_times):
+    """ Compact form of a subgraph, see write_subgraph_json(): nodes are
+    numbered locally, members first.
+    """
+    local = {}
+    for node in members:
+        local[node] = len(local)
+    flat = []
+    for src, dst, e in edges:
+        for node in (src, dst):
+            if node not in local:
+                local[node] = len(local)
+        flat.extend((local[src], local[dst], graph.scopes[e]))
+    nodes = sorted(local, key=local.get)
+    names = [graph.names[node] for node in nodes]
+    return {
+        "nodes": names,
+        "internal": [1 if graph.nodes[node].internal else 0 for node in nodes],
+        "time": _html_times(names, import_times),
+        "members": len(members),
+        "edges": flat,
+    }
+
+
+def write_html(graph, fp, graph_name, import_times=None, depth=0, subgraphs=()):
+    """ A single HTML page with the graph embedded as compact JSON, laid out
+    in the browser by a grid-accelerated force simulation and drawn on a
+    canvas, so it stays interactive far past what graphviz can lay out.
+
+    For a graph collapsed at depth, subgraphs generates (package node name,
+    compact subgraph) pairs. They are embedded as JSON script blocks, which
+    the browser only parses when their package is expanded.
+    """
+    names, nodes = graph.names, graph.nodes
+    fp.write(_HTML_HEAD.replace("__TITLE__", escape(graph_name)))
+    fp.write("var GRAPH = {\n")
+    fp.write('"name": {},\n'.format(_script_safe(json.dumps(graph_name))))
+    fp.write('"depth": {},\n'.format(depth))
+    fp.write('"nodes": ')
+    for chunk in _json_chunks(names):
+        fp.write(_script_safe(chunk))
+    fp.write(',\n"internal": ')
+    for chunk in _json_chunks([1 if node.internal else 0 for node in nodes]):
+        fp.write(chunk)
+    fp.write(',\n"count": ')
+    for chunk in _json_chunks([node.count for node in nodes]):
+        fp.write(chunk)
+    fp.write(',\n"time": ')
+    for chunk in _json_chunks(_html_times(names, import_times)):
+        fp.write(chunk)
+    # flat [source, target, scope, multiplicity, ...] quadruples
+    fp.write(',\n"edges": [')
+    first = True
+    for src, dst, e in graph.edges():
+        fp.write(
+            "{}{},{},{},{}".format(
+                "" if first else ",", src, dst, graph.scopes[e], graph.edge_weight(e)
+            )
+        )
+        first = False
+    fp.write("]\n};\n</script>\n")
+    for package, data in subgraphs:
+        fp.write(
+            '<script type="application/json" id={}>'.format(quoteattr("sub:" + package))
+        )
+        fp.write(_script_safe(json.dumps(data)))
+        fp.write("</script>\n")
+    fp.write(_HTML_TAIL)
+
+
+WRITERS = {
+    FORMAT_DOT: write_dot,
+    FORMAT_JSON: write_json,
+    FORMAT_GRAPHML: write_graphml,
+    FORMAT_HTML: write_html,
+}
+
+
+def write_edge_stream(edges, fp, fmt, graph_name):
+    """ Write edges, (importer, imported, scope, [names imported], imported
+    module is internal) tuples, as they are generated, in fmt, one of
+    formats.STREAM_FORMATS. jsonl has one {"source": ..., "target": ...,
+    "scope": ..., "names": [...], "internal": <bool>} object per line. dot is styled
+    like write_dot(), but for the import cycles, which take the whole graph
+    to find. Returns the number of edges written.
+    """
+    count = 0
+    if fmt == FORMAT_JSONL:
+        for src, dst, scope, names, internal in edges:
+            data = {
+                "source": src,
+                "target": dst,
+                "scope": scope,
+                "names": names,
+                "internal": internal,
+            }
+            fp.write(json.dumps(data, sort_keys=True) + "\n")
+            count += 1
+        return count
+
+    fp.write("digraph {} {{\n".format(_dot_id(graph_name)))
+    # vendor modules already declared with their color
+    vendors = set()
+    for src, dst, scope, names, internal in edges:
+        attrs = {}
+        if not internal:
+            attrs["color"] = VENDOR_COLOR
+            if dst not in vendors:
+                vendors.add(dst)
+                fp.write("\t{}{}\n".format(_dot_id(dst), _dot_attrs(attrs)))
+        if scope in SCOPE_EDGE_STYLES:
+            attrs["style"] = SCOPE_EDGE_STYLES[scope]
+        fp.write("\t{} -> {}{}\n".format(_dot_id(src), _dot_id(dst), _dot_attrs(attrs)))
+        count += 1
+    fp.write("}\n")
+    return count
+
+
+def _expandable(graph, collapsed, group_id, members):
+    """ Whether expanding a package node would show anything new. """
+    return len(members) > 1 or graph.names[members[0]] != collapsed.names[group_id]
+
+
+@contextlib.contextmanager
+def _output(path):
+    """ Open path for writing, or use stdout for "-". """
+    if path == "-":
+        yield sys.stdout
+    else:
+        with open(path, "w") as fp:
+            yield fp
+
+
+def render_graph(
+    graph,
+    path,
+    fmt,
+    graph_name,
+    import_times=None,
+    collapse_depth=None,
+    distributions=None,
+):
+    """ Write graph to path ("-" for stdout) in format fmt, one of WRITERS.
+
+    With collapse_depth, modules are merged into package nodes (see
+    graph.collapse()). The subgraph of each package is embedded in html
+    output, and written next to json output, in <path>.d/<package>.json,
+    to be loaded when the package is expanded. That directory is replaced
+    as a whole, so no package of an earlier run is left in it.
+
+    Given a distinfo.DistributionIndex, modules from installed
+    distributions are clustered by distribution in dot output, and tagged
+    with it in json and graphml output.
+    """
+    extra = {}
+    if distributions is not None and fmt != FORMAT_HTML:
+        extra["distributions"] = distributions
+    if not collapse_depth:
+        with _output(path) as fp:
+            WRITERS[fmt](graph, fp, graph_name, import_times, **extra)
+        return
+    collapsed, group = collapse(graph, collapse_depth)
+    expandable = [
+        (group_id, members, edges)
+        for group_id, (members, edges) in enumerate(
+            group_subgraphs(graph, group, len(collapsed))
+        )
+        if _expandable(graph, collapsed, group_id, members)
+    ]
+
+    if fmt == FORMAT_JSON:
+        subgraphs = {}
+        if path != "-":
+            sidecar_dir = path + ".d"
+            # written aside, then swapped in for the previous run's
+            new_dir = tempfile.mkdtemp(
+                prefix=os.path.basename(sidecar_dir) + ".",
+                dir=os.path.dirname(os.path.abspath(path)),
+            )
+            try:
+                for group_id, members, edges in expandable:
+                    package = collapsed.names[group_id]
+                    file_name = os.path.join(new_dir, package + ".json")
+                    with open(file_name, "w") as fp:
+                        write_subgraph_json(
+                            graph, fp, package, members, edges, import_times
+                        )
+                    subgraphs[group_id] = os.path.join(
+                        os.path.basename(sidecar_dir), package + ".json"
+                    )
+                if os.path.isdir(sidecar_dir):
+                    shutil.rmtree(sidecar_dir)
+                os.rename(new_dir, sidecar_dir)
+            except BaseException:
+                shutil.rmtree(new_dir, ignore_errors=True)
+                raise
+        with _output(path) as fp:
+            write_json(collapsed, fp, graph_name, import_times, subgraphs, **extra)
+    elif fmt == FORMAT_HTML:
+        subgraphs = (
+            (
+                collapsed.names[group_id],
+                _html_subgraph(graph, members, edges, import_times),
+            )
+            for group_id, members, edges in expandable
+        )
+        with _output(path) as fp:
+            write_html(
+                collapsed, fp, graph_name, import_times, collapse_depth, subgraphs
+            )
+    else:
+        with _output(path) as fp:
+            WRITERS[fmt](collapsed, fp, graph_name, import_times, **extra)
+
+
+_HTML_HEAD = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>__TITLE__</title>
+<style>
+  html, body { margin: 0; height: 100%; overflow: hidden; font: 13px sans-serif; }
+  #graph { display: block; width: 100%; height: 100%; background: #fff; }
+  #bar { position: absolute; top: 8px; left: 8px; background: rgba(255,255,255,.9);
+         padding: 6px; border: 1px solid #ccc; }
+  #tip { position: absolute; pointer-events: none; background: #ffe;
+         border: 1px solid #999; padding: 2px 4px; display: none; }
+</style>
+</head>
+<body>
+<canvas id="graph"></canvas>
+<div id="bar">
+  <input id="search" placeholder="find module" size="30">
+  <span id="info"></span>
+</div>
+<div id="tip"></div>
+<script>
+"""
+
+_HTML_TAIL = """<script>
+(function () {
+  "use strict";
+  var canvas = document.getElementById("graph");
+  var ctx = canvas.getContext("2d");
+  var tip = document.getElementById("tip");
+  var search = document.getElementById("search");
+  var K = 40;  // preferred edge length
+  var i, j, k;
+
+  // Visible nodes. Expanded package nodes are hidden and their children
+  // appended, so node ids never change.
+  var names = [], internal = [], count = [], time = [], hidden = [];
+  var x = [], y = [], dx = [], dy = [], degree = [];
+  var visible = new Map();
+  var n = 0, edges = [], m = 0, maxTime = 0;
+
+  function addNode(name, isInternal, nodeCount, nodeTime, px, py) {
+    names.push(name);
+    internal.push(isInternal);
+    count.push(nodeCount);
+    time.push(nodeTime);
+    hidden.push(false);
+    x.push(px);
+    y.push(py);
+    dx.push(0);
+    dy.push(0);
+    degree.push(0);
+    if (nodeTime > maxTime) maxTime = nodeTime;
+    visible.set(name, n);
+    return n++;
+  }
+
+  for (i = 0; i < GRAPH.nodes.length; i++) {
+    // sunflower spiral start, so that nothing overlaps
+    var r = K * Math.sqrt(i + 1), a = i * 2.399963;
+    addNode(GRAPH.nodes[i], GRAPH.internal[i], GRAPH.count[i], GRAPH.time[i],
+            r * Math.cos(a), r * Math.sin(a));
+  }
+
+  // Module level data of the expanded packages, parsed from their
+  // subgraph blocks on first expansion
+  var loaded = new Set(), expanded = new Set();
+  var modules = new Map(), rawEdges = new Map();
+
+  function prefix(name, depth) {
+    return name.split(".").slice(0, depth).join(".");
+  }
+
+  function visibleOf(name) {
+    while (true) {
+      var v = visible.get(name);
+      if (v !== undefined) return v;
+      var dot = name.lastIndexOf(".");
+      if (dot < 0) return undefined;
+      name = name.slice(0, dot);
+    }
+  }
+
+  function load(top) {
+    if (loaded.has(top)) return true;
+    var block = document.getElementById("sub:" + top);
+    if (!block) return false;
+    var data = JSON.parse(block.textContent);
+    for (i = 0; i < data.nodes.length; i++) {
+      modules.set(data.nodes[i], [data.internal[i], data.time[i]]);
+    }
+    for (k = 0; k < data.edges.length; k += 3) {
+      var s = data.nodes[data.edges[k]], t = data.nodes[data.edges[k + 1]];
+      rawEdges.set(s + " " + t, [s, t, data.edges[k + 2]]);
+    }
+    loaded.add(top);
+    return true;
+  }
+
+  function rebuildEdges() {
+    var merged = new Map();
+    function add(s, t, scope, multiplicity) {
+      if (s === undefined || t === undefined || s === t) return;
+      var key = s * 4294967296 + t, edge = merged.get(key);
+      if (edge === undefined) merged.set(key, [s, t, scope, multiplicity]);
+      else {
+        edge[2] = Math.min(edge[2], scope);
+        edge[3] += multiplicity;
+      }
+    }
+    // packages that were never expanded keep their precomputed edges, the
+    // others are rebuilt from module level edges
+    var top = GRAPH.edges;
+    for (k = 0; k < top.length; k += 4) {
+      if (!loaded.has(GRAPH.nodes[top[k]]) && !loaded.has(GRAPH.nodes[top[k + 1]])) {
+        add(top[k], top[k + 1], top[k + 2], top[k + 3]);
+      }
+    }
+    rawEdges.forEach(function (edge) {
+      add(visibleOf(edge[0]), visibleOf(edge[1]), edge[2], 1);
+    });
+    edges = [];
+    merged.forEach(function (edge) { edges.push.apply(edges, edge); });
+    m = edges.length / 4;
+    for (i = 0; i < n; i++) degree[i] = 0;
+    for (k = 0; k < m; k++) {
+      degree[edges[4 * k]]++;
+      degree[edges[4 * k + 1]]++;
+    }
+    document.getElementById("info").textContent =
+      visible.size + " nodes, " + m + " edges" +
+      (GRAPH.depth ? " (double-click a package to expand it)" : "");
+  }
+
+  function expand(v) {
+    var name = names[v];
+    if (!GRAPH.depth || expanded.has(name) || !load(prefix(name, GRAPH.depth))) {
+      return false;
+    }
+    var depth = name.split(".").length + 1, children = new Map();
+    modules.forEach(function (info, module) {
+      if (module !== name && module.indexOf(name + ".") !== 0) return;
+      var child = prefix(module, depth), entry = children.get(child);
+      if (entry === undefined) children.set(child, entry = [0, 0, 0]);
+      entry[0] = entry[0] || info[0];
+      entry[1] += 1;
+      if (child === module) entry[2] = info[1];
+    });
+    if (children.size === 1 && children.has(name)) return false;
+    hidden[v] = true;
+    visible.delete(name);
+    expanded.add(name);
+    var spread = K * Math.sqrt(children.size);
+    children.forEach(function (entry, child) {
+      addNode(child, entry[0], entry[1], entry[2],
+              x[v] + (Math.random() - 0.5) * spread,
+              y[v] + (Math.random() - 0.5) * spread);
+    });
+    rebuildEdges();
+    return true;
+  }
+
+  var temperature = K * Math.sqrt(n) / 4;
+  var cell = 2 * K;
+
+  function step() {
+    // Repulsion between nodes in the same or adjacent grid cells only,
+    // which makes each step linear in the number of nodes
+    var grid = new Map(), key, list;
+    for (i = 0; i < n; i++) {
+      dx[i] = 0;
+      dy[i] = 0;
+      if (hidden[i]) continue;
+      key = Math.floor(x[i] / cell) * 1048576 + Math.floor(y[i] / cell);
+      list = grid.get(key);
+      if (list === undefined) grid.set(key, list = []);
+      list.push(i);
+    }
+    for (i = 0; i < n; i++) {
+      if (hidden[i]) continue;
+      var cx = Math.floor(x[i] / cell), cy = Math.floor(y[i] / cell);
+      for (var ox = -1; ox <= 1; ox++) {
+        for (var oy = -1; oy <= 1; oy++) {
+          list = grid.get((cx + ox) * 1048576 + cy + oy);
+          if (list === undefined) continue;
+          for (var l = 0; l < list.length; l++) {
+            j = list[l];
+            if (j <= i) continue;
+            var ddx = x[i] - x[j], ddy = y[i] - y[j];
+            var d2 = ddx * ddx + ddy * ddy;
+            if (d2 < 0.01) { ddx = Math.random() - 0.5; ddy = Math.random() - 0.5; d2 = 0.5; }
+            if (d2 > cell * cell) continue;
+            var f = K * K / d2;
+            dx[i] += ddx * f; dy[i] += ddy * f;
+            dx[j] -= ddx * f; dy[j] -= ddy * f;
+          }
+        }
+      }
+    }
+    // Attraction along edges
+    for (k = 0; k < m; k++) {
+      var s = edges[4 * k], t = edges[4 * k + 1];
+      var ex = x[t] - x[s], ey = y[t] - y[s];
+      var d = Math.sqrt(ex * ex + ey * ey) || 1;
+      var g = d / K / Math.max(1, Math.min(degree[s], degree[t]));
+      dx[s] += ex * g; dy[s] += ey * g;
+      dx[t] -= ex * g; dy[t] -= ey * g;
+    }
+    // Weak gravity keeps disconnected parts together; moves are capped
+    // by a cooling temperature
+    for (i = 0; i < n; i++) {
+      if (hidden[i]) continue;
+      dx[i] -= x[i] * 0.01;
+      dy[i] -= y[i] * 0.01;
+      var len = Math.sqrt(dx[i] * dx[i] + dy[i] * dy[i]);
+      if (len > temperature) {
+        dx[i] *= temperature / len;
+        dy[i] *= temperature / len;
+      }
+      x[i] += dx[i];
+      y[i] += dy[i];
+    }
+    temperature *= 0.97;
+  }
+
+  var scale = 1, panX = 0, panY = 0, matches = null;
+
+  function fit() {
+    var minX = Infinity, minY = Infinity, maxX = -Infinity, maxY = -Infinity;
+    for (i = 0; i < n; i++) {
+      if (hidden[i]) continue;
+      if (x[i] < minX) minX = x[i];
+      if (x[i] > maxX) maxX = x[i];
+      if (y[i] < minY) minY = y[i];
+      if (y[i] > maxY) maxY = y[i];
+    }
+    if (minX === Infinity) return;
+    scale = Math.min(canvas.width / (maxX - minX + 2 * K),
+                     canvas.height / (maxY - minY + 2 * K));
+    panX = canvas.width / 2 - scale * (minX + maxX) / 2;
+    panY = canvas.height / 2 - scale * (minY + maxY) / 2;
+  }
+
+  function nodeColor(v) {
+    if (time[v] && maxTime) {
+      var heat = Math.round(255 * (1 - time[v] / maxTime));
+      return "rgb(255," + heat + "," + heat + ")";
+    }
+    return internal[v] ? "#888" : "#36c";
+  }
+
+  function radius(v) {
+    return 3 + 2 * Math.log(count[v]) / Math.LN2;
+  }
+
+  function label(v) {
+    return count[v] > 1 ? names[v] + " (" + count[v] + ")" : names[v];
+  }
+
+  function draw() {
+    ctx.setTransform(1, 0, 0, 1, 0, 0);
+    ctx.clearRect(0, 0, canvas.width, canvas.height);
+    ctx.setTransform(scale, 0, 0, scale, panX, panY);
+    // one path per edge style and width, stroked once each
+    var dashes = [[], [4, 4], [1, 3]];
+    for (var style = 0; style < 3; style++) {
+      for (var vendor = 0; vendor < 2; vendor++) {
+        for (var width = 1; width <= 5; width++) {
+          ctx.beginPath();
+          var any = false;
+          for (k = 0; k < m; k++) {
+            if (edges[4 * k + 2] !== style) continue;
+            var t = edges[4 * k + 1];
+            if ((internal[t] ? 0 : 1) !== vendor) continue;
+            var w = Math.min(5, 1 + Math.floor(Math.log(edges[4 * k + 3]) / Math.LN2));
+            if (w !== width) continue;
+            ctx.moveTo(x[edges[4 * k]], y[edges[4 * k]]);
+            ctx.lineTo(x[t], y[t]);
+            any = true;
+          }
+          if (!any) continue;
+          ctx.lineWidth = width / scale;
+          ctx.strokeStyle = vendor ? "#9ac" : "#bbb";
+          ctx.setLineDash(dashes[style].map(function (v) { return v / scale; }));
+          ctx.stroke();
+        }
+      }
+    }
+    ctx.setLineDash([]);
+    var minRadius = 2 / scale;
+    for (i = 0; i < n; i++) {
+      if (hidden[i]) continue;
+      var rad = Math.max(minRadius, radius(i));
+      ctx.fillStyle = matches && matches.has(i) ? "#e80" : nodeColor(i);
+      ctx.fillRect(x[i] - rad, y[i] - rad, 2 * rad, 2 * rad);
+    }
+    // labels once they can be read
+    if (scale > 0.6 || visible.size < 200) {
+      ctx.fillStyle = "#000";
+      ctx.font = 11 / Math.max(scale, 0.6) + "px sans-serif";
+      for (i = 0; i < n; i++) {
+        if (!hidden[i]) ctx.fillText(label(i), x[i] + radius(i) + 1, y[i] + 3);
+      }
+    }
+  }
+
+  function resize() {
+    canvas.width = window.innerWidth;
+    canvas.height = window.innerHeight;
+    fit();
+    draw();
+  }
+
+  var fitted = false, running = false;
+  function frame() {
+    var start = Date.now();
+    // as many steps as fit in a frame, the first ones unseen
+    do {
+      step();
+    } while (temperature > 0.5 && Date.now() - start < 30);
+    if (!fitted) fit();
+    draw();
+    running = temperature > 0.5;
+    if (running) window.requestAnimationFrame(frame);
+  }
+
+  function nodeAt(ev) {
+    var px = (ev.clientX - panX) / scale, py = (ev.clientY - panY) / scale;
+    var best = -1, bestD = Infinity;
+    for (i = 0; i < n; i++) {
+      if (hidden[i]) continue;
+      var reach = Math.max(8 / scale, radius(i));
+      var d2 = (x[i] - px) * (x[i] - px) + (y[i] - py) * (y[i] - py);
+      if (d2 < reach * reach && d2 < bestD) { bestD = d2; best = i; }
+    }
+    return best;
+  }
+
+  var dragging = null;
+  canvas.addEventListener("mousedown", function (ev) {
+    dragging = [ev.clientX, ev.clientY];
+    fitted = true;
+  });
+  window.addEventListener("mouseup", function () { dragging = null; });
+  canvas.addEventListener("mousemove", function (ev) {
+    if (dragging) {
+      panX += ev.clientX - dragging[0];
+      panY += ev.clientY - dragging[1];
+      dragging = [ev.clientX, ev.clientY];
+      draw();
+      return;
+    }
+    var v = nodeAt(ev);
+    if (v < 0) {
+      tip.style.display = "none";
+      return;
+    }
+    var text = label(v);
+    if (time[v]) text += ", " + (time[v] / 1000).toFixed(1) + " ms";
+    tip.textContent = text;
+    tip.style.left = ev.clientX + 12 + "px";
+    tip.style.top = ev.clientY + 12 + "px";
+    tip.style.display = "block";
+  });
+  canvas.addEventListener("dblclick", function (ev) {
+    var v = nodeAt(ev);
+    if (v >= 0 && expand(v)) {
+      temperature = Math.max(temperature, 2 * K);
+      if (!running) {
+        running = true;
+        window.requestAnimationFrame(frame);
+      }
+    }
+  });
+  canvas.addEventListener("wheel", function (ev) {
+    ev.preventDefault();
+    fitted = true;
+    var factor = ev.deltaY < 0 ? 1.2 : 1 / 1.2;
+    panX = ev.clientX - (ev.clientX - panX) * factor;
+    panY = ev.clientY - (ev.clientY - panY) * factor;
+    scale *= factor;
+    draw();
+  }, {passive: false});
+  search.addEventListener("input", function () {
+    var query = search.value.trim();
+    matches = null;
+    if (query) {
+      matches = new Set();
+      for (i = 0; i < n; i++) {
+        if (names[i].indexOf(query) !== -1) matches.add(i);
+      }
+    }
+    draw();
+  });
+  window.addEventListener("resize", resize);
+  canvas.width = window.innerWidth;
+  canvas.height = window.innerHeight;
+  rebuildEdges();
+  running = true;
+  window.requestAnimationFrame(frame);
+})();
+</script>
+</body>
+</html>
+"""
@@ -0,0 +1,207 @@
+""" Find the project modules reachable from a script by following its
+imports.
+
+This replaces modulefinder.ModuleFinder for single script mode. The imports
+of each module come from the extractor backends (see extract.py), so they
+go through the scan cache. Modules are resolved with a worklist rather than
+recursion. Names are looked up in memoized directory listings (see
+DirectoryIndex) instead of a stat() per candidate file. Resolution stops at
+the project boundary: a name not found under the project root, or naming a
+stdlib module, is never scanned.
+"""
+
+
+import os
+import sys
+from collections import deque
+
+from extract import DEFAULT_EXTRACTOR, get_imports
+from libinfo import STDLIB, default_classifier
+
+
+class DirectoryIndex(object):
+    """ Memoized listings of the directories modules are looked up in, so
+    each directory is read once, with a single os.scandir().
+    """
+
+    def __init__(self):
+        # directory: ({module name: file}, {package name: directory})
+        self._listings = {}
+        # (name, search path): found() result
+        self._found = {}
+
+    def listing(self, directory):
+        """ The python modules and the candidate packages (subdirectories
+        named like identifiers) of a directory.
+        """
+        listing = self._listings.get(directory)
+        if listing is None:
+            modules = {}
+            packages = {}
+            try:
+                with os.scandir(directory) as it:
+                    for entry in it:
+                        name = entry.name
+                        if name.endswith(".py"):
+                            if entry.is_file():
+                                modules[name[:-3]] = entry.path
+                        elif name.isidentifier() and entry.is_dir():
+                            packages[name] = entry.path
+            except OSError:
+                pass
+            listing = self._listings[directory] = (modules, packages)
+        return listing
+
+    def _find_in(self, part, dirs):
+        """ Look up one name component in the directories dirs, in order, like
+        the import system: a regular package or a module in an earlier
+        directory wins, and a namespace package (a directory without an
+        __init__.py) is only used if neither is found anywhere.
+        """
+        namespace = None
+        for directory in dirs:
+            modules, packages = self.listing(directory)
+            package_dir = packages.get(part)
+            if package_dir is not None:
+                init = self.listing(package_dir)[0].get("__init__")
+                if init is not None:
+                    return init, package_dir
+            if part in modules:
+                return modules[part], None
+            if package_dir is not None and namespace is None:
+                namespace = (None, package_dir)
+        return namespace
+
+    def find(self, name, search_path):
+        """ Locate the module with the dotted name, searching the tuple of
+        directories search_path for its top level package. Returns (file,
+        package directory), with no file for namespace packages and no
+        package directory for plain modules, or None if it isn't there.
+        """
+        key = (name, search_path)
+        if key in self._found:
+            return self._found[key]
+        parent, _, part = name.rpartition(".")
+        if parent:
+            located = self.find(parent, search_path)
+            if located is None or located[1] is None:
+                found = None
+            else:
+                found = self._find_in(part, (located[1],))
+        else:
+            found = self._find_in(part, search_path)
+        self._found[key] = found
+        return found
+
+
+def _script_name(script, root_dir):
+    """ Module name a script would be imported as from root_dir. """
+    if script.startswith(root_dir + os.sep):
+        path = script[len(root_dir) + 1 : -3]
+    else:
+        path = os.path.basename(script)[:-3]
+    name = path.replace(os.sep, ".")
+    if name.endswith("__init__"):
+        name = name[: -len("__init__")].rstrip(".")
+    return name
+
+
+def absolute_name(target, level, package):
+    """ Absolute name of the module target (which may be "") named by an
+    import of the given level in a module of package ("" at the top level),
+    or None for a relative import beyond the top level package, which fails
+    at runtime too.
+    """
+    if level <= 0:
+        return target
+    parts = package.split(".") if package else []
+    if level - 1 >= len(parts):
+        return None
+    base = ".".join(parts[: len(parts) - (level - 1)])
+    return ".".join(part for part in (base, target) if part)
+
+
+def _imported_names(records, package):
+    """ Generate the fully qualified names a module's import records may
+    refer to, parents first: `from a.b import c` gives a, a.b and a.b.c,
+    where a.b.c may be a submodule or just a name in a.b.
+    """
+    for level, fromlist, target, _ in records:
+        target = absolute_name(target, level, package)
+        if target is None:
+            continue
+        if target:
+            parts = target.split(".")
+            for i in range(1, len(parts) + 1):
+                yield ".".join(parts[:i])
+        for name in fromlist:
+            if name != "*":
+                yield target + "." + name if target else name
+
+
+def find_modules(
+    script,
+    root_dir=None,
+    cache=None,
+    extractor=DEFAULT_EXTRACTOR,
+    use_sys_path=False,
+    index=None,
+):
+    """ Find the modules under root_dir that script imports, directly or
+    not, in any scope.
+
+    Stdlib modules are left out even if a project module shadows them, as
+    are modules outside root_dir. With use_sys_path, the stdlib and third
+    party modules the project imports from sys.path are returned too, but
+    their imports aren't followed: leave them out of anything that scans
+    the modules found, such as vis.add_immediate_deps_to_modules().
+
+    :param index: a DirectoryIndex to share between calls
+    :rtype: {<module name:str>: (<file:str>, <package directory:str or None>)}
+    """
+    script = os.path.abspath(script)
+    root_dir = os.path.abspath(root_dir or os.path.dirname(script))
+    search_path = (root_dir,)
+    if index is None:
+        index = DirectoryIndex()
+    classifier = default_classifier(sys.version_info[0])
+    if use_sys_path:
+        outer_path = tuple(
+            path for path in _sys_path_dirs() if path != root_dir
+        )
+
+    script_name = _script_name(script, root_dir)
+    found = {script_name: (script, None)}
+    todo = deque(found)
+    unresolved = set()
+    while todo:
+        name = todo.popleft()
+        path, package_dir = found[name]
+        if path is None or (
+            name != script_name and not path.startswith(root_dir + os.sep)
+        ):
+            # namespace packages have no code, and outer modules aren't ours
+            continue
+        package = name if package_dir else name.rpartition(".")[0]
+        for imported in _imported_names(get_imports(path, cache, extractor), package):
+            if imported in found or imported in unresolved:
+                continue
+            located = None
+            if use_sys_path or classifier.classify(imported) != STDLIB:
+                located = index.find(imported, search_path)
+            if located is None and use_sys_path:
+                located = index.find(imported, outer_path)
+            if located is None:
+                unresolved.add(imported)
+                continue
+            found[imported] = located
+            todo.append(imported)
+    return found
+
+
+def _sys_path_dirs():
+    """ The directories of sys.path, absolute, without zip files and the
+    like.
+    """
+    dirs = (os.path.abspath(path or os.curdir) for path in sys.path)
+    return [path for path in dirs if os.path.isdir(path)]
@@ -0,0 +1,251 @@
+""" Binary snapshots of a graph.ModuleGraph.
+
+A snapshot is the graph's arrays written out as they are in memory, so that
+loading one is a few reads and array.frombytes() calls rather than a parse:
+
+    MAGIC
+    header size (4 bytes, little endian)
+    header: JSON with the format version, byte order, node and edge counts,
+        the offset and size of every section, and caller metadata
+    sections, each aligned to SECTION_ALIGN bytes:
+        names       node names, UTF-8, newline separated
+        files       node file paths, UTF-8, newline separated, "" for none
+        internal    array('B'), one per node
+        counts      array('I'), one per node
+        offsets     array('I'), one per node + 1
+        targets     array('I'), one per edge
+        scopes      array('B'), one per edge
+        weights     array('I'), one per edge (only if the graph has any)
+        name_table  JSON list of the distinct tuples of imported names
+        names_ids   array('I'), one index into name_table per edge
+        reverse_*   offsets, targets, scopes, weights and names_ids of the
+                    graph's reverse index, if it was built (see
+                    graph.ModuleGraph.reverse)
+
+Arrays are in the byte order of the machine that wrote them; snapshots from
+another byte order are rejected.
+
+load_graph() memory-maps the file and hands out memoryviews of its sections
+in place of arrays, and builds the per-node and per-edge Python objects
+lazily, so loading takes milliseconds whatever the size of the graph.
+"""
+
+
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+from collections.abc import Sequence
+
+from graph import ModuleGraph, Node
+
+
+MAGIC = b"IVGRAPH\0"
+# Bump when the layout changes
+SNAPSHOT_FORMAT = 1
+SECTION_ALIGN = 8
+
+
+class SnapshotError(ValueError):
+    """ The file is not a snapshot this version can read. """
+
+
+def _edge_sections(graph, name_ids, prefix=""):
+    names_ids = array("I")
+    for names_tuple in graph.edge_names:
+        names_ids.append(name_ids.setdefault(names_tuple, len(name_ids)))
+    yield prefix + "offsets", graph.offsets
+    yield prefix + "targets", graph.targets
+    yield prefix + "scopes", graph.scopes
+    if graph.weights is not None:
+        yield prefix + "weights", graph.weights
+    yield prefix + "names_ids", names_ids
+
+
+def _sections(graph):
+    names, nodes = graph.names, graph.nodes
+    yield "names", "\n".join(names).encode("utf-8")
+    yield "files", "\n".join(node.file or "" for node in nodes).encode("utf-8")
+    yield "internal", array("B", [1 if node.internal else 0 for node in nodes])
+    yield "counts", array("I", [node.count for node in nodes])
+    name_ids = {}
+    for section in _edge_sections(graph, name_ids):
+        yield section
+    if graph._reverse is not None:
+        for section in _edge_sections(graph._reverse, name_ids, "reverse_"):
+            yield section
+    # after the edges, which fill name_ids
+    yield "name_table", json.dumps(sorted(name_ids, key=name_ids.get)).encode(
+        "utf-8"
+    )
+
+
+def save_graph(graph, path, meta=None):
+    """ Write a snapshot of graph to path, atomically. meta is a JSON
+    serializable value handed back by load_graph().
+    """
+    sections = []
+    layout = {}
+    position = 0
+    for name, data in _sections(graph):
+        # arrays, or memoryviews of a loaded graph
+        data = data if isinstance(data, bytes) else data.tobytes()
+        layout[name] = [position, len(data)]
+        padding = -len(data) % SECTION_ALIGN
+        sections.append(data + b"\0" * padding)
+        position += len(data) + padding
+    header = json.dumps(
+        {
+            "format": SNAPSHOT_FORMAT,
+            "byteorder": sys.byteorder,
+            "nodes": len(graph.names),
+            "edges": len(graph.targets),
+            "sections": layout,
+            "meta": meta,
+        }
+    ).encode("utf-8")
+    header += b" " * (-(len(MAGIC) + 4 + len(header)) % SECTION_ALIGN)
+
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as fp:
+        fp.write(MAGIC)
+        fp.write(struct.pack("<I", len(header)))
+        fp.write(header)
+        for data in sections:
+            fp.write(data)
+    os.replace(tmp_path, path)
+
+
+def read_header(fp):
+    """ Read and check a snapshot's header, returning it as a dict. """
+    if fp.read(len(MAGIC)) != MAGIC:
+        raise SnapshotError("not a graph snapshot")
+    (size,) = struct.unpack("<I", fp.read(4))
+    header = json.loads(fp.read(size).decode("utf-8"))
+    if header.get("format") != SNAPSHOT_FORMAT:
+        raise SnapshotError(
+            "unsupported snapshot format {}".format(header.get("format"))
+        )
+    if header["byteorder"] != sys.byteorder:
+        raise SnapshotError(
+            "snapshot written on a {} endian machine".format(header["byteorder"])
+        )
+    return header
+
+
+class _EdgeNames(Sequence):
+    """ ModuleGraph.edge_names of a loaded graph: names tuples looked up in
+    the name table by the stored per-edge index.
+    """
+
+    __slots__ = ("table", "ids")
+
+    def __init__(self, table, ids):
+        self.table = table
+        self.ids = ids
+
+    def __getitem__(self, e):
+        if isinstance(e, slice):
+            return [self.table[i] for i in self.ids[e]]
+        return self.table[self.ids[e]]
+
+    def __len__(self):
+        return len(self.ids)
+
+
+class _Nodes(Sequence):
+    """ ModuleGraph.nodes of a loaded graph, each Node made on first use. """
+
+    __slots__ = ("files", "internal", "counts", "_nodes")
+
+    def __init__(self, files, internal, counts):
+        self.files = files
+        self.internal = internal
+        self.counts = counts
+        self._nodes = {}
+
+    def __getitem__(self, node):
+        if isinstance(node, slice):
+            return [self[i] for i in range(*node.indices(len(self)))]
+        if node < 0:
+            node += len(self)
+        meta = self._nodes.get(node)
+        if meta is None:
+            meta = self._nodes[node] = Node(
+                self.files[node] or None,
+                bool(self.internal[node]),
+                None,
+                self.counts[node],
+            )
+        return meta
+
+    def __len__(self):
+        return len(self.counts)
+
+
+def _read(path, use_mmap):
+    """ (header, contents after the header as a memoryview) of the snapshot
+    at path.
+    """
+    with open(path, "rb") as fp:
+        header = read_header(fp)
+        start = fp.tell()
+        if not use_mmap:
+            return header, memoryview(fp.read())
+        size = os.fstat(fp.fileno()).st_size
+        if size == start:
+            return header, memoryview(b"")
+        # the mapping outlives the file object, and lives as long as
+        # memoryviews of it do
+        mapped = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+    return header, memoryview(mapped)[start:]
+
+
+def load_graph(path, use_mmap=True):
+    """ Load a snapshot written by save_graph(). Returns (graph, meta).
+
+    With use_mmap, the graph's arrays are read-only memoryviews of the
+    mapped file, otherwise copies of it.
+    """
+    header, data = _read(path, use_mmap)
+
+    def section(name, typecode="B"):
+        start, size = header["sections"][name]
+        view = data[start : start + size]
+        if typecode == "B":
+            return view if use_mmap else array("B", view.tobytes())
+        if use_mmap:
+            return view.cast(typecode)
+        values = array(typecode)
+        values.frombytes(view)
+        return values
+
+    def lines(name):
+        text = section(name).tobytes().decode("utf-8")
+        return text.split("\n") if header["nodes"] else []
+
+    names = [sys.intern(name) for name in lines("names")]
+    nodes = _Nodes(lines("files"), section("internal"), section("counts", "I"))
+    name_table = [tuple(t) for t in json.loads(section("name_table").tobytes())]
+    ids = {name: i for i, name in enumerate(names)}
+
+    def edges(prefix=""):
+        return ModuleGraph(
+            names,
+            ids,
+            nodes,
+            section(prefix + "offsets", "I"),
+            section(prefix + "targets", "I"),
+            section(prefix + "scopes"),
+            _EdgeNames(name_table, section(prefix + "names_ids", "I")),
+            section(prefix + "weights", "I")
+            if prefix + "weights" in header["sections"]
+            else None,
+        )
+
+    graph = edges()
+    if "reverse_offsets" in header["sections"]:
+        graph._reverse = edges("reverse_")
+    return graph, header["meta"]
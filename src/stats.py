@@ -0,0 +1,193 @@
+""" Opt-in timers and counters, to see where the time of a slow run goes.
+
+Instrumentation is off unless enable() is called, which vis.py does for
+--stats, --stats-json FILE, or the STATS_ENV environment variable. While off,
+timer() returns a shared no-op context manager and count() returns at once,
+so instrumented code pays a function call and nothing else. Hot loops check
+ENABLED before doing anything at all.
+
+Timers add up the wall time (on a monotonic clock) and number of calls of
+each named stage. Timers nest (e.g. "classify" runs within "resolve
+imports"), so they don't add up to the wall time. Counters add up numbers
+like bytes read or cache hits. The scan time of each file is kept for the
+slowest DEFAULT_TOP files.
+"""
+
+
+import heapq
+import json
+import sys
+import time
+
+# 1 or - to print stats to stderr, anything else is a file to save them to
+STATS_ENV = "IMPORT_VISUALIZER_STATS"
+
+# Number of slowest files reported
+DEFAULT_TOP = 10
+
+# Timer of reading and scanning files, which files/s is measured against
+SCAN_TIMER = "read and scan"
+
+clock = time.perf_counter
+
+ENABLED = False
+_current = None
+
+
+class Stats(object):
+    """ The timers, counters and slowest files of a run. """
+
+    def __init__(self, top=DEFAULT_TOP):
+        self.started = clock()
+        self.top = top
+        # name: [calls, seconds]
+        self.timers = {}
+        self.counters = {}
+        # heap of the (seconds, path) of the slowest files
+        self.slowest = []
+
+    def add_time(self, name, seconds):
+        timer = self.timers.get(name)
+        if timer is None:
+            self.timers[name] = [1, seconds]
+        else:
+            timer[0] += 1
+            timer[1] += seconds
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def file_scanned(self, path, seconds):
+        if len(self.slowest) < self.top:
+            heapq.heappush(self.slowest, (seconds, path))
+        elif seconds > self.slowest[0][0]:
+            heapq.heapreplace(self.slowest, (seconds, path))
+
+    def files_per_second(self):
+        """ Files handled per second of SCAN_TIMER, or None. """
+        calls, seconds = self.timers.get(SCAN_TIMER, (0, 0))
+        files = self.counters.get("files", 0)
+        return files / seconds if seconds and files else None
+
+    def as_dict(self):
+        return {
+            "wall": clock() - self.started,
+            "timers": dict(
+                (name, {"calls": calls, "seconds": seconds})
+                for name, (calls, seconds) in self.timers.items()
+            ),
+            "counters": self.counters,
+            "files_per_second": self.files_per_second(),
+            "slowest_files": [
+                {"path": path, "seconds": seconds}
+                for seconds, path in sorted(self.slowest, reverse=True)
+            ],
+        }
+
+    def format(self):
+        """ The stats as lines of text. """
+        lines = ["Stats ({:.1f} ms wall):".format((clock() - self.started) * 1000)]
+        for name, (calls, seconds) in sorted(
+            self.timers.items(), key=lambda item: -item[1][1]
+        ):
+            lines.append(
+                "    {:<40} {:>10.1f} ms {:>8} call(s)".format(
+                    name, seconds * 1000, calls
+                )
+            )
+        for name, value in sorted(self.counters.items()):
+            lines.append("    {:<40} {:>10}".format(name, value))
+        rate = self.files_per_second()
+        if rate is not None:
+            lines.append("    {:<40} {:>10.0f}".format("files/s", rate))
+        if self.slowest:
+            lines.append("  Slowest files:")
+            for seconds, path in sorted(self.slowest, reverse=True):
+                lines.append("    {:>10.2f} ms  {}".format(seconds * 1000, path))
+        return "\n".join(lines)
+
+
+class _Timer(object):
+    __slots__ = ("stats", "name", "started")
+
+    def __init__(self, stats, name):
+        self.stats = stats
+        self.name = name
+
+    def __enter__(self):
+        self.started = clock()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stats.add_time(self.name, clock() - self.started)
+
+
+class _NoTimer(object):
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+_NO_TIMER = _NoTimer()
+
+
+def enable(top=DEFAULT_TOP):
+    """ Start collecting stats, dropping any collected so far. """
+    global ENABLED, _current
+    _current = Stats(top)
+    ENABLED = True
+    return _current
+
+
+def disable():
+    """ Stop collecting stats, and return those collected, if any. """
+    global ENABLED, _current
+    stats, _current = _current, None
+    ENABLED = False
+    return stats
+
+
+def current():
+    """ The Stats being collected, or None. """
+    return _current
+
+
+def timer(name):
+    """ Context manager adding the time spent in it to the timer name. """
+    if _current is None:
+        return _NO_TIMER
+    return _Timer(_current, name)
+
+
+def add_time(name, seconds):
+    if _current is not None:
+        _current.add_time(name, seconds)
+
+
+def count(name, n=1):
+    if _current is not None:
+        _current.count(name, n)
+
+
+def file_scanned(path, seconds):
+    """ Record the time it took to read and scan a file. """
+    if _current is not None:
+        _current.file_scanned(path, seconds)
+
+
+def report(json_path=None, fp=None):
+    """ Write the stats collected so far as JSON to json_path, or as text to
+    fp (stderr by default). Does nothing if stats are off.
+    """
+    if _current is None:
+        return
+    if json_path:
+        with open(json_path, "w") as out:
+            json.dump(_current.as_dict(), out, indent=2, sort_keys=True)
+            out.write("\n")
+    else:
+        (fp or sys.stderr).write(_current.format() + "\n")
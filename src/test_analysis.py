@@ -0,0 +1,85 @@
+import os
+import tempfile
+import unittest
+
+from analysis import (
+    WEIGHT_BYTECODE,
+    WEIGHT_IMPORTTIME,
+    critical_path,
+    cycle_edges,
+    import_cycles,
+    node_weights,
+    strongly_connected_components,
+)
+
+
+class TestAnalysis(unittest.TestCase):
+    def test_sccs_in_reverse_topological_order(self):
+        # 0 -> 1 <-> 2 -> 3
+        succ = [[1], [2], [1, 3], []]
+        sccs = strongly_connected_components(succ)
+        self.assertEqual([sorted(c) for c in sccs], [[3], [1, 2], [0]])
+
+    def test_deep_graph_has_no_recursion_limit(self):
+        n = 100000
+        succ = [[i + 1] for i in range(n - 1)] + [[0]]
+        self.assertEqual(len(strongly_connected_components(succ)), 1)
+
+    def test_critical_path(self):
+        #   0 -> 1 -> 3 -> 4
+        #   0 -> 2 -> 3
+        #   0 -> 5 <-> 6 (cycle)
+        succ = [[1, 2, 5], [3], [3], [4], [], [6], [5]]
+        weights = [1, 10, 1, 5, 7, 2, 3]
+        report = critical_path(succ, weights, 0)
+        self.assertEqual(
+            report.path, [([0], 1), ([1], 10), ([3], 5), ([4], 7)]
+        )
+        self.assertEqual(report.total, 23)
+        self.assertEqual(report.reachable_weight, sum(weights))
+        # 3 is imported by both 1 and 2, so deferring either removes only
+        # that module; deferring 0 -> 5 removes the whole cycle
+        self.assertEqual(
+            report.deferrable,
+            [(0, 1, 10, 1), (3, 4, 7, 1), (0, 5, 5, 2), (0, 2, 1, 1)],
+        )
+
+    def test_import_time_weights(self):
+        # vendor modules aren't in mod_dict but were measured all the same
+        names = ["app", "requests", "unmeasured"]
+        import_times = {"app": (50, 400), "requests": (300, 350)}
+        self.assertEqual(
+            node_weights(names, {}, WEIGHT_IMPORTTIME, import_times), [50, 300, 0]
+        )
+
+    def test_missing_files_weigh_nothing(self):
+        # a graph loaded from a snapshot made in another checkout
+        class Module(object):
+            def __init__(self, path):
+                self.__file__ = path
+
+        with tempfile.NamedTemporaryFile("w", suffix=".py", delete=False) as fp:
+            fp.write("x = 1\n")
+        self.addCleanup(os.remove, fp.name)
+        mod_dict = {"here": Module(fp.name), "gone": Module(fp.name + ".gone")}
+        self.assertEqual(node_weights(["here", "gone"], mod_dict), [6, 0])
+        weights = node_weights(["here", "gone"], mod_dict, WEIGHT_BYTECODE)
+        self.assertGreater(weights[0], 0)
+        self.assertEqual(weights[1], 0)
+
+    def test_import_cycles(self):
+        # 0 -> 1 -> 2 -> 3 -> 0 with a shortcut 1 -> 3, 4 <-> 5, 6 -> 6
+        succ = [[1], [2, 3], [3], [0, 4], [5], [4], [6], [0]]
+        cycles = import_cycles(succ)
+        self.assertEqual(
+            cycles,
+            [([0, 1, 2, 3], [0, 1, 3, 0]), ([4, 5], [4, 5, 4]), ([6], [6, 6])],
+        )
+        self.assertEqual(
+            cycle_edges(succ),
+            {(0, 1), (1, 2), (1, 3), (2, 3), (3, 0), (4, 5), (5, 4), (6, 6)},
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,149 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from discover import IgnoreRules, filter_paths, is_pruned_dir, iter_files
+
+
+class TestIgnoreRules(unittest.TestCase):
+    def test_patterns(self):
+        rules = IgnoreRules(
+            ["# comment", "", "*.pyc", "/top.py", "docs/*.py", "**/gen/", "!keep.pyc"]
+        )
+        cases = [
+            ("a/b.pyc", False, True),
+            ("a/keep.pyc", False, False),
+            ("top.py", False, True),
+            ("a/top.py", False, None),
+            ("docs/x.py", False, True),
+            ("docs/sub/x.py", False, None),
+            ("a/b/gen", True, True),
+            ("a/b/gen", False, None),
+            ("main.py", False, None),
+        ]
+        for relpath, is_dir, expected in cases:
+            self.assertEqual(rules.match(relpath, is_dir), expected, relpath)
+
+    def test_base(self):
+        rules = IgnoreRules(["/local.py", "*.tmp.py"], "sub/")
+        self.assertTrue(rules.match("sub/local.py", False))
+        self.assertIsNone(rules.match("local.py", False))
+        self.assertTrue(rules.match("sub/deep/x.tmp.py", False))
+        self.assertIsNone(rules.match("x.tmp.py", False))
+
+
+class TestIterFiles(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        files = {
+            "main.py": "",
+            "virtualization/vm.py": "",
+            "pkg/__init__.py": "",
+            "pkg/generated_pb2.py": "",
+            "pkg/.gitignore": "*_pb2.py\n!keep_pb2.py\n",
+            "pkg/keep_pb2.py": "",
+            "pkg/tests/test_x.py": "",
+            ".gitignore": "scratch/\n",
+            "scratch/a.py": "",
+            ".git/hooks/h.py": "",
+            "node_modules/x/y.py": "",
+            "build/__init__.py": "",
+            "env/pyvenv.cfg": "",
+            "env/lib/site.py": "",
+            "conda/conda-meta/history": "",
+            "conda/lib/python3.11/os.py": "",
+            "oldenv/bin/activate": "",
+            "oldenv/lib/python2.7/site-packages/six.py": "",
+            # an activate script alone doesn't make a virtualenv
+            "tools/bin/activate": "",
+            "tools/lib/helper.py": "",
+            "notes.txt": "",
+        }
+        for path, text in files.items():
+            path = os.path.join(self.root, path)
+            if not os.path.isdir(os.path.dirname(path)):
+                os.makedirs(os.path.dirname(path))
+            with open(path, "w") as fp:
+                fp.write(text)
+
+    def found(self, **kwargs):
+        return sorted(
+            os.path.relpath(path, self.root) for path in iter_files(self.root, **kwargs)
+        )
+
+    def test_pruning_and_gitignore(self):
+        self.assertEqual(
+            self.found(),
+            [
+                "build/__init__.py",
+                "main.py",
+                "pkg/__init__.py",
+                "pkg/keep_pb2.py",
+                "pkg/tests/test_x.py",
+                "tools/lib/helper.py",
+                "virtualization/vm.py",
+            ],
+        )
+
+    def test_is_pruned_dir(self):
+        for name, pruned in [
+            (".git", True),
+            ("env", True),
+            ("conda", True),
+            ("oldenv", True),
+            ("tools", False),
+            ("pkg", False),
+        ]:
+            self.assertEqual(is_pruned_dir(os.path.join(self.root, name)), pruned, name)
+
+    def test_exclude(self):
+        self.assertEqual(
+            self.found(exclude=["tests/", "virtualization", "tools"]),
+            ["build/__init__.py", "main.py", "pkg/__init__.py", "pkg/keep_pb2.py"],
+        )
+        # excludes take precedence over .gitignore files
+        self.assertNotIn("pkg/keep_pb2.py", self.found(exclude=["*_pb2.py"]))
+
+    def test_nothing_skipped(self):
+        found = self.found(gitignore=False, skip_venvs=False)
+        self.assertIn("pkg/generated_pb2.py", found)
+        self.assertIn("env/lib/site.py", found)
+        self.assertIn("conda/lib/python3.11/os.py", found)
+        self.assertIn("oldenv/lib/python2.7/site-packages/six.py", found)
+        # skip_venvs doesn't reach version control and tool directories
+        self.assertNotIn(".git/hooks/h.py", found)
+
+    def test_filter_paths(self):
+        relpaths = [
+            "build/x.py",
+            "conda/conda-meta/history",
+            "conda/lib/python3.11/os.py",
+            "env/lib/x.py",
+            "env/pyvenv.cfg",
+            "main.py",
+            "oldenv/bin/activate",
+            "oldenv/lib/python2.7/site-packages/six.py",
+            "pkg/tests/test_x.py",
+            "pkg/a.py",
+            "pyvenv.cfg",
+            "tools/bin/activate",
+            "tools/lib/helper.py",
+            "venv/lib/x.py",
+        ]
+        self.assertEqual(
+            list(filter_paths(relpaths, ["tests"])),
+            [
+                "build/x.py",
+                "main.py",
+                "pkg/a.py",
+                "tools/lib/helper.py",
+                "venv/lib/x.py",
+            ],
+        )
+        self.assertIn("env/lib/x.py", list(filter_paths(relpaths, skip_venvs=False)))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,121 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import distinfo
+
+
+def _add_dist(site_dir, name, version, files=(), top_level=None, egg=False):
+    """ Fake an installed distribution: its metadata, and a RECORD of files
+    (which aren't created) or a top_level.txt.
+    """
+    if egg:
+        info_dir = os.path.join(site_dir, "{}-{}.egg-info".format(name, version))
+        metadata_name = "PKG-INFO"
+    else:
+        info_dir = os.path.join(site_dir, "{}-{}.dist-info".format(name, version))
+        metadata_name = "METADATA"
+    os.makedirs(info_dir)
+    with open(os.path.join(info_dir, metadata_name), "w") as fp:
+        fp.write("Metadata-Version: 2.1\nName: {}\nVersion: {}\n".format(name, version))
+    if files:
+        info = os.path.basename(info_dir)
+        with open(os.path.join(info_dir, "RECORD"), "w") as fp:
+            for path in list(files) + [info + "/METADATA", info + "/RECORD"]:
+                fp.write("{},,\n".format(path))
+    if top_level is not None:
+        with open(os.path.join(info_dir, "top_level.txt"), "w") as fp:
+            fp.write(top_level)
+
+
+class TestDistributionIndex(unittest.TestCase):
+    def setUp(self):
+        self.site_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.site_dir)
+        _add_dist(
+            self.site_dir,
+            "Requests",
+            "2.31.0",
+            ["requests/__init__.py", "requests/adapters.py"],
+        )
+        _add_dist(
+            self.site_dir,
+            "simplejson",
+            "3.19",
+            ["simplejson/__init__.py", "simplejson/_speedups.cpython-311.so"],
+        )
+        _add_dist(
+            self.site_dir,
+            "six",
+            "1.16",
+            ["six.py", "__pycache__/six.cpython-311.pyc", "../../bin/tool"],
+        )
+        _add_dist(
+            self.site_dir,
+            "protobuf",
+            "4.25",
+            ["google/protobuf/__init__.py", "google/protobuf/message.py"],
+        )
+        _add_dist(
+            self.site_dir,
+            "google-auth",
+            "2.0",
+            ["google/auth/__init__.py", "google/oauth2/id_token.py"],
+        )
+        _add_dist(self.site_dir, "zope.interface", "6.0", ["zope/interface/api.py"])
+        _add_dist(self.site_dir, "legacy", "0.1", top_level="legacy\n", egg=True)
+
+    def test_build_index(self):
+        index = distinfo.build_index([self.site_dir])
+        cases = [
+            ("requests", ("Requests", "2.31.0")),
+            ("requests.adapters", ("Requests", "2.31.0")),
+            ("simplejson._speedups", ("simplejson", "3.19")),
+            ("six.moves", ("six", "1.16")),
+            ("google.protobuf.message", ("protobuf", "4.25")),
+            ("google.auth", ("google-auth", "2.0")),
+            ("google.oauth2", ("google-auth", "2.0")),
+            ("google", None),
+            ("google.cloud", None),
+            # a namespace package of a single distribution
+            ("zope", ("zope.interface", "6.0")),
+            ("legacy", ("legacy", "0.1")),
+            ("bin", None),
+            ("missing", None),
+        ]
+        for name, expected in cases:
+            self.assertEqual(index.distribution_of(name), expected, name)
+        self.assertIn("requests", index)
+        self.assertNotIn("google", index)
+
+    def test_cached_by_mtime(self):
+        cache_home = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, cache_home)
+        environ = os.environ.get("XDG_CACHE_HOME")
+        os.environ["XDG_CACHE_HOME"] = cache_home
+        orig_build = distinfo.build_index
+        try:
+            index = distinfo.load_index([self.site_dir])
+            distinfo.build_index = None
+            cached = distinfo.load_index([self.site_dir])
+            self.assertEqual(cached.provided, index.provided)
+            self.assertEqual(cached.namespaces, index.namespaces)
+
+            # installing a distribution changes the directory's mtime
+            distinfo.build_index = orig_build
+            _add_dist(self.site_dir, "attrs", "23.1", ["attr/__init__.py"])
+            mtime = os.stat(self.site_dir).st_mtime
+            os.utime(self.site_dir, (mtime + 10, mtime + 10))
+            index = distinfo.load_index([self.site_dir])
+            self.assertEqual(index.distribution_of("attr"), ("attrs", "23.1"))
+        finally:
+            distinfo.build_index = orig_build
+            if environ is None:
+                del os.environ["XDG_CACHE_HOME"]
+            else:
+                os.environ["XDG_CACHE_HOME"] = environ
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,128 @@
+import unittest
+
+import extract
+from extract import FUNCTION_SCOPE as F, MODULE_SCOPE as M, TYPE_CHECKING_SCOPE as T
+
+
+SOURCE = '''
+""" Docstring mentioning import and from. """
+from __future__ import print_function
+import os, sys as system
+import a.b.c as abc
+from . import sibling
+from ..parent.mod import (
+    x as y,  # comment
+    z,
+)
+from ... import *
+
+try:
+    import json
+except ImportError:
+    json = None
+else:
+    import pkg.sub
+if True: import inline; from inline2 import q
+
+
+def func():
+    import inside_func
+
+
+class Klass:
+    import inside_class
+
+    def method(self): import inside_method
+
+f = lambda: 0
+x: int = 1
+data = b"lots of data"
+'''
+
+EXPECTED = [
+    (0, ("print_function",), "__future__", M),
+    (0, (), "os", M),
+    (0, (), "sys", M),
+    (0, (), "a.b.c", M),
+    (1, ("sibling",), "", M),
+    (2, ("x", "z"), "parent.mod", M),
+    (3, ("*",), "", M),
+    (0, (), "json", M),
+    (0, (), "pkg.sub", M),
+    (0, (), "inline", M),
+    (0, ("q",), "inline2", M),
+    (0, (), "inside_func", F),
+    (0, (), "inside_class", M),
+    (0, (), "inside_method", F),
+]
+
+SCOPES_SOURCE = '''
+from typing import TYPE_CHECKING
+if TYPE_CHECKING:
+    from b import B
+    def g(): import g1
+else:
+    import c
+if typing.TYPE_CHECKING: import d
+if sys.platform == "win32" or not TYPE_CHECKING:
+    import e
+if TYPE_CHECKING and (sys.version_info < (3, 8) or X):
+    import h
+elif TYPE_CHECKING and X or Y:
+    import i
+def f():
+    if TYPE_CHECKING:
+        import f1
+    async def inner(): import f2
+'''
+
+SCOPES_EXPECTED = [
+    (0, ("TYPE_CHECKING",), "typing", M),
+    (0, ("B",), "b", T),
+    (0, (), "g1", T),
+    (0, (), "c", M),
+    (0, (), "d", T),
+    (0, (), "e", M),
+    (0, (), "h", T),
+    (0, (), "i", M),
+    (0, (), "f1", T),
+    (0, (), "f2", F),
+]
+
+
+class TestExtractors(unittest.TestCase):
+    def test_backends_agree(self):
+        for name, scan in sorted(extract.EXTRACTORS.items()):
+            self.assertEqual(scan(SOURCE), EXPECTED, name)
+            self.assertEqual(scan(SOURCE.encode("utf-8")), EXPECTED, name)
+
+    def test_scopes(self):
+        for name, scan in sorted(extract.EXTRACTORS.items()):
+            self.assertEqual(scan(SCOPES_SOURCE), SCOPES_EXPECTED, name)
+
+    def test_extended_args(self):
+        # more than 256 names and constants, so the imports' args need
+        # EXTENDED_ARG prefixes
+        source = "".join("v{0} = {0}\n".format(i) for i in range(300))
+        source += "from pkg import name\nif TYPE_CHECKING:\n    import late\n"
+        expected = [(0, ("name",), "pkg", M), (0, (), "late", T)]
+        for name, scan in sorted(extract.EXTRACTORS.items()):
+            self.assertEqual(scan(source), expected, name)
+
+    def test_tokenize_stops_after_last_import(self):
+        # everything after the last import is never tokenized, so even
+        # broken code there doesn't matter
+        source = "import os\nx = 1\n" + "y = (\n" * 3
+        self.assertEqual(extract.scan_imports_tokenize(source), [(0, (), "os", M)])
+        self.assertEqual(extract.scan_imports_tokenize("x = 1\n"), [])
+
+    def test_unclosed_bracket_is_a_syntax_error(self):
+        # a file being edited, e.g. with --watch
+        source = "def f(:\n    import module_a\n"
+        for name, scan in sorted(extract.EXTRACTORS.items()):
+            with self.assertRaises(SyntaxError, msg=name):
+                scan(source, "mid_edit.py")
+
+
+if __name__ == "__main__":
+    unittest.main()
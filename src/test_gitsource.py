@@ -0,0 +1,112 @@
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+
+import vis
+from cache import MemoryScanCache
+from gitsource import BLOB_DIGEST, GitError, GitSource
+
+
+def git(repo, *args):
+    subprocess.check_call(
+        [
+            "git",
+            "-C",
+            repo,
+            "-c",
+            "user.name=test",
+            "-c",
+            "user.email=test@example.com",
+        ]
+        + list(args),
+        stdout=subprocess.DEVNULL,
+    )
+
+
+@unittest.skipUnless(shutil.which("git"), "needs git")
+class TestGitSource(unittest.TestCase):
+    def setUp(self):
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        self.repo = os.path.join(tmp_dir, "repo")
+        shutil.copytree("project", os.path.join(self.repo, "project"))
+        git(self.repo, "init", "-q")
+        git(self.repo, "add", ".")
+        git(self.repo, "commit", "-q", "-m", "first")
+
+    def imports_at(self, rev, root="project", cache=None):
+        source = GitSource(os.path.join(self.repo, root), rev)
+        self.addCleanup(source.close)
+        mod_dict = vis.get_modules_at_rev(source)
+        vis.add_immediate_deps_to_modules(mod_dict, cache, source=source)
+        return {name: dict(mod.direct_imports) for name, mod in mod_dict.items()}
+
+    def test_matches_working_tree(self):
+        mod_dict = vis.get_modules_in_dir(os.path.join(self.repo, "project"))
+        vis.add_immediate_deps_to_modules(mod_dict)
+        expected = {name: dict(mod.direct_imports) for name, mod in mod_dict.items()}
+        self.assertEqual(self.imports_at("HEAD"), expected)
+
+    def test_reads_only_changed_blobs(self):
+        cache = MemoryScanCache()
+        first = self.imports_at("HEAD", cache=cache)
+        with open(os.path.join(self.repo, "project", "hello.py"), "a") as fp:
+            fp.write("\nimport module_b\n")
+        git(self.repo, "commit", "-q", "-a", "-m", "second")
+        # the working tree is not read
+        os.remove(os.path.join(self.repo, "project", "main.py"))
+
+        source = GitSource(os.path.join(self.repo, "project"), "HEAD")
+        self.addCleanup(source.close)
+        misses = [
+            path
+            for path, blob in source.blobs.items()
+            if cache.get_by_digest(BLOB_DIGEST.format(blob)) is None
+        ]
+        self.assertEqual(misses, [os.path.join(self.repo, "project", "hello.py")])
+
+        second = self.imports_at("HEAD", cache=cache)
+        self.assertIn("main", second)
+        self.assertIn("module_b", second["hello"])
+        self.assertNotIn("module_b", first["hello"])
+        self.assertEqual(self.imports_at("HEAD~1"), first)
+
+    def test_skips_committed_virtualenvs(self):
+        env = os.path.join(self.repo, "project", "env")
+        os.makedirs(os.path.join(env, "lib"))
+        for name in ("pyvenv.cfg", os.path.join("lib", "site.py")):
+            with open(os.path.join(env, name), "w"):
+                pass
+        git(self.repo, "add", ".")
+        git(self.repo, "commit", "-q", "-m", "venv")
+        self.assertNotIn("env.lib.site", self.imports_at("HEAD"))
+
+    def test_leaves_working_tree_alone(self):
+        vis_py = os.path.join(os.path.dirname(os.path.abspath(__file__)), "vis.py")
+        output = os.path.join(self.repo, "..", "out.json")
+        args = [sys.executable, vis_py, "--rev", "HEAD", "-f", "json", "-o", output]
+        subprocess.check_call(
+            args + ["project"], cwd=self.repo, stdout=subprocess.DEVNULL
+        )
+        in_tree = os.path.join(self.repo, "project", ".import-visualizer")
+        self.assertFalse(os.path.exists(in_tree))
+        in_git_dir = os.path.join(self.repo, ".git", ".import-visualizer")
+        self.assertTrue(os.path.isdir(in_git_dir))
+
+        # nothing at that revision is an error, and creates nothing either
+        returncode = subprocess.call(
+            args + ["gone"], cwd=self.repo, stderr=subprocess.DEVNULL
+        )
+        self.assertNotEqual(returncode, 0)
+        self.assertFalse(os.path.exists(os.path.join(self.repo, "gone")))
+
+    def test_unknown_rev(self):
+        with self.assertRaises(GitError):
+            GitSource(self.repo, "no-such-branch")
+
+
+if __name__ == "__main__":
+    unittest.main()
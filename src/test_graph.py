@@ -0,0 +1,99 @@
+import unittest
+
+from graph import (
+    GraphBuilder,
+    ImportsView,
+    ModuleGraph,
+    attach_views,
+    collapse,
+    graph_of,
+    group_subgraphs,
+)
+
+
+class FakeModule(object):
+    def __init__(self, name, direct_imports, import_scopes=None):
+        self.__name__ = name
+        self.__file__ = name + ".py"
+        self.direct_imports = direct_imports
+        self.import_scopes = import_scopes or {}
+
+
+class TestModuleGraph(unittest.TestCase):
+    def setUp(self):
+        self.mods = {
+            "b": FakeModule("b", {"os.path": [[]], "a": ["x", "y"]}),
+            "a": FakeModule(
+                "a", {"requests": [[]], "b": [[]]}, {"b": "function"}
+            ),
+        }
+
+    def test_csr(self):
+        builder = GraphBuilder()
+        a, b, c = (builder.add_node(name) for name in "abc")
+        builder.add_edge(c, a)
+        builder.add_edge(a, b)
+        builder.add_edge(c, b, ["x"])
+        graph = builder.build()
+        self.assertEqual(list(graph.offsets), [0, 1, 1, 3])
+        self.assertEqual([list(t) for t in graph.succ], [[b], [], [a, b]])
+        self.assertEqual(graph.edge_names[2], ("x",))
+
+    def test_views(self):
+        expected = {name: dict(mod.direct_imports) for name, mod in self.mods.items()}
+        graph = ModuleGraph.from_mod_dict(self.mods)
+        self.assertEqual(graph.names[:2], ["a", "b"])
+        self.assertEqual(graph.num_edges, 4)
+        attach_views(self.mods, graph)
+        for name, mod in self.mods.items():
+            self.assertIsInstance(mod.direct_imports, ImportsView)
+            self.assertEqual(mod.direct_imports, expected[name])
+        self.assertEqual(
+            self.mods["a"].import_scopes, {"requests": "module", "b": "function"}
+        )
+        self.assertIs(graph_of(self.mods), graph)
+
+        module_level = graph.module_level()
+        self.assertEqual(module_level.num_edges, 3)
+        attach_views(self.mods, module_level)
+        self.assertEqual(list(self.mods["a"].direct_imports), ["requests"])
+
+        # a plain dict anywhere means the graph has to be rebuilt
+        self.mods["b"].direct_imports = {"a": [[]]}
+        rebuilt = graph_of(self.mods)
+        self.assertIsNot(rebuilt, module_level)
+        self.assertEqual(rebuilt.num_edges, 2)
+
+    def test_collapse(self):
+        builder = GraphBuilder()
+        ids = {}
+        for name in ("a.x", "a.y.z", "b", "b.w", "c.q"):
+            ids[name] = builder.add_node(name, internal=name != "c.q")
+        builder.add_edge(ids["a.x"], ids["b"])
+        builder.add_edge(ids["a.y.z"], ids["b.w"], scope="function")
+        builder.add_edge(ids["a.y.z"], ids["a.x"])
+        builder.add_edge(ids["b"], ids["c.q"], scope="type_checking")
+        graph = builder.build()
+
+        collapsed, group = collapse(graph, 1)
+        self.assertEqual(collapsed.names, ["a", "b", "c"])
+        self.assertEqual([node.count for node in collapsed.nodes], [2, 2, 1])
+        self.assertEqual(
+            [node.internal for node in collapsed.nodes], [True, True, False]
+        )
+        edges = [
+            (src, dst, collapsed.edge_scope(e), collapsed.edge_weight(e))
+            for src, dst, e in collapsed.edges()
+        ]
+        self.assertEqual(edges, [(0, 1, "module", 2), (1, 2, "type_checking", 1)])
+
+        subgraphs = group_subgraphs(graph, group, len(collapsed))
+        members, edges = subgraphs[1]
+        self.assertEqual(members, [ids["b"], ids["b.w"]])
+        self.assertEqual(len(edges), 3)
+
+        self.assertEqual(collapse(graph, 2)[0].names, ["a.x", "a.y", "b", "b.w", "c.q"])
+
+
+if __name__ == "__main__":
+    unittest.main()
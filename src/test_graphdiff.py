@@ -0,0 +1,52 @@
+import unittest
+
+from graph import GraphBuilder
+from graphdiff import diff_graphs
+
+
+def build(edges, extra_nodes=()):
+    """ A graph of (importer, imported[, scope]) edges between named nodes. """
+    builder = GraphBuilder()
+    ids = {}
+    for edge in edges:
+        for name in edge[:2]:
+            if name not in ids:
+                ids[name] = builder.add_node(name)
+    for name in extra_nodes:
+        ids[name] = builder.add_node(name)
+    for edge in edges:
+        scope = edge[2] if len(edge) > 2 else "module"
+        builder.add_edge(ids[edge[0]], ids[edge[1]], scope=scope)
+    return builder.build()
+
+
+class TestDiffGraphs(unittest.TestCase):
+    def test_no_changes(self):
+        old = build([("a", "b"), ("b", "c")])
+        new = build([("b", "c"), ("a", "b")])
+        self.assertFalse(diff_graphs(old, new))
+
+    def test_diff(self):
+        old = build(
+            [("main", "a"), ("a", "b"), ("b", "c"), ("c", "b"), ("a", "d", "function")],
+            ["gone"],
+        )
+        # c no longer imports b, b now imports a, and a imports d at the top
+        new = build([("main", "a"), ("a", "b"), ("b", "c"), ("b", "a"), ("a", "d")])
+        diff = diff_graphs(old, new)
+        self.assertEqual(diff.added_modules, [])
+        self.assertEqual(diff.removed_modules, ["gone"])
+        self.assertEqual(diff.added_edges, [("b", "a")])
+        self.assertEqual(diff.removed_edges, [("c", "b")])
+        self.assertEqual(diff.scope_changes, [("a", "d", "function", "module")])
+        self.assertEqual(diff.new_cycles, [(["a", "b"], ["a", "b", "a"])])
+        self.assertEqual(diff.fixed_cycles, [(["b", "c"], ["b", "c", "b"])])
+        # a now pulls in d; b now pulls in a and d; c no longer imports b
+        self.assertEqual(
+            diff.closure_changes,
+            [("b", 1, 3, 2), ("a", 2, 3, 2), ("c", 1, 0, 3)],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
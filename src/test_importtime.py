@@ -0,0 +1,31 @@
+import os
+import unittest
+
+import vis
+from importtime import parse_importtime, profile_entry
+
+
+class TestImportTime(unittest.TestCase):
+    def test_parse(self):
+        lines = [
+            "import time: self [us] | cumulative | imported package",
+            "import time:       125 |        125 |   _io",
+            "import time:      1042 |       3021 | path.to.module_c",
+            "some other output",
+        ]
+        self.assertEqual(
+            parse_importtime(lines),
+            {"_io": (125, 125), "path.to.module_c": (1042, 3021)},
+        )
+
+    def test_profile_entry(self):
+        times = profile_entry(os.path.join("project", "main.py"), "project")
+        modules = vis.get_modules_in_dir("project")
+        vis.attach_import_times(modules, times)
+        self.assertIsNotNone(modules["path.to.module_c"].import_time)
+        # module_d is never imported by main.py
+        self.assertIsNone(modules["module_d"].import_time)
+
+
+if __name__ == "__main__":
+    unittest.main()
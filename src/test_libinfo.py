@@ -0,0 +1,76 @@
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+import libinfo
+
+
+class TestStdLibIndex(unittest.TestCase):
+    def setUp(self):
+        self.cache_home = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.cache_home)
+        self._environ = os.environ.get("XDG_CACHE_HOME")
+        os.environ["XDG_CACHE_HOME"] = self.cache_home
+        self._names = getattr(sys, "stdlib_module_names", None)
+        if self._names is not None:
+            del sys.stdlib_module_names
+        self.addCleanup(self.restore)
+
+    def restore(self):
+        if self._names is not None:
+            sys.stdlib_module_names = self._names
+        if self._environ is None:
+            del os.environ["XDG_CACHE_HOME"]
+        else:
+            os.environ["XDG_CACHE_HOME"] = self._environ
+
+    def test_walk_is_cached_per_interpreter(self):
+        modules = libinfo._load_std_lib_modules()
+        self.assertIn("json", modules)
+        self.assertIn("json.decoder", modules)
+        self.assertTrue(os.path.exists(libinfo._std_lib_cache_path()))
+        orig_walk = libinfo.get_std_lib_modules
+        try:
+            libinfo.get_std_lib_modules = None
+            self.assertEqual(libinfo._load_std_lib_modules(), modules)
+        finally:
+            libinfo.get_std_lib_modules = orig_walk
+
+
+class TestModuleClassifier(unittest.TestCase):
+    def test_index_matches_prefix_lookup(self):
+        collection = {"os", "xml.dom", "zope.interface", "a.b.c"}
+        index = libinfo.ModuleIndex(collection)
+        for name in [
+            "os",
+            "os.path",
+            "xml",
+            "xml.dom",
+            "xml.dom.minidom",
+            "xml.domx",
+            "zope",
+            "a.b",
+            "a.b.c.d",
+            "osx",
+        ]:
+            self.assertEqual(
+                name in index,
+                libinfo.is_in_module_collection(collection, name),
+                name,
+            )
+
+    def test_classify(self):
+        classifier = libinfo.ModuleClassifier({"project", "json"})
+        self.assertEqual(classifier.classify("project"), libinfo.FIRST_PARTY)
+        # a project module shadowing the stdlib is still first party
+        self.assertEqual(classifier.classify("json"), libinfo.FIRST_PARTY)
+        self.assertEqual(classifier.classify("json.decoder"), libinfo.STDLIB)
+        self.assertEqual(classifier.classify("os.path"), libinfo.STDLIB)
+        self.assertEqual(classifier.classify("yaml.loader"), libinfo.THIRD_PARTY)
+        self.assertEqual(classifier.classify("project.sub"), libinfo.UNKNOWN)
+
+
+if __name__ == "__main__":
+    unittest.main()
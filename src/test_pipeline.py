@@ -0,0 +1,54 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from cache import MemoryScanCache
+from extract import get_imports
+from pipeline import Prefetcher, get_imports_prefetched
+
+
+class TestPipeline(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        self.paths = []
+        for i in range(40):
+            path = os.path.join(self.root, "m{}.py".format(i))
+            with open(path, "w") as fp:
+                fp.write("import os\nfrom . import m{}\n# {}\n".format(i + 1, "x" * i))
+            self.paths.append(path)
+
+    def test_prefetcher(self):
+        prefetcher = Prefetcher(self.paths, threads=4, max_bytes=200)
+        buffered = []
+        found = {}
+        for path, data in prefetcher:
+            buffered.append(prefetcher._buffered)
+            found[path] = data
+            time.sleep(0.001)
+        self.assertEqual(sorted(found), sorted(self.paths))
+        with open(self.paths[3], "rb") as fp:
+            self.assertEqual(found[self.paths[3]], fp.read())
+        # the cap can only be overshot by the reads already started
+        self.assertLessEqual(max(buffered), 200 + 4 * 80)
+
+    def test_read_error(self):
+        paths = self.paths + [os.path.join(self.root, "missing.py")]
+        with self.assertRaises(IOError):
+            for _ in Prefetcher(paths, threads=4):
+                pass
+
+    def test_get_imports_prefetched(self):
+        expected = dict((path, get_imports(path)) for path in self.paths)
+        cache = MemoryScanCache()
+        for jobs in (1, 2):
+            self.assertEqual(
+                get_imports_prefetched(self.paths, cache, jobs, threads=4), expected
+            )
+        self.assertEqual(get_imports_prefetched(self.paths, threads=3), expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,103 @@
+import io
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from xml.dom import minidom
+
+import vis
+from distinfo import DistributionIndex
+from graph import GraphBuilder
+from render import render_graph, write_dot, write_graphml, write_html, write_json
+
+
+class TestRender(unittest.TestCase):
+    def setUp(self):
+        self.modules = vis.get_modules_in_dir("project")
+        self.graph = vis.add_immediate_deps_to_modules(self.modules)
+
+    def write(self, writer):
+        fp = io.StringIO()
+        writer(self.graph, fp, "project", {"module_a": (10, 30)})
+        return fp.getvalue()
+
+    def test_json(self):
+        data = json.loads(self.write(write_json))
+        self.assertEqual(len(data["nodes"]), len(self.graph))
+        links = {(link["source"], link["target"]) for link in data["links"]}
+        expected = {
+            (name, dep)
+            for name, module in self.modules.items()
+            for dep in module.direct_imports
+        }
+        self.assertEqual(links, expected)
+        (module_a,) = [node for node in data["nodes"] if node["id"] == "module_a"]
+        self.assertEqual(module_a["import_time"], [10, 30])
+
+    def test_dot_and_graphml(self):
+        dot = self.write(write_dot)
+        self.assertIn('"main" -> "path.to.module_c"', dot)
+        self.assertIn('xlabel="0.0 ms"', dot)
+        document = minidom.parseString(self.write(write_graphml))
+        edges = document.getElementsByTagName("edge")
+        self.assertEqual(len(edges), self.graph.num_edges)
+
+    def test_html(self):
+        page = self.write(write_html)
+        self.assertIn("<canvas", page)
+        data = page[page.index("var GRAPH = ") + 12 : page.index("};") + 1]
+        self.assertEqual(json.loads(data)["nodes"], self.graph.names)
+
+    def test_collapsed_json(self):
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        path = os.path.join(tmp_dir, "project.json")
+        render_graph(self.graph, path, "json", "project", collapse_depth=1)
+        with open(path) as fp:
+            data = json.load(fp)
+        nodes = {node["id"]: node for node in data["nodes"]}
+        self.assertEqual(nodes["path"]["count"], 3)
+        self.assertEqual(nodes["path"]["subgraph"], "project.json.d/path.json")
+        self.assertNotIn("subgraph", nodes["main"])
+        with open(os.path.join(tmp_dir, nodes["path"]["subgraph"])) as fp:
+            subgraph = json.load(fp)
+        members = [node["id"] for node in subgraph["nodes"] if node["member"]]
+        self.assertEqual(members, ["path", "path.to", "path.to.module_c"])
+
+        # packages of an earlier run don't outlive it
+        stale = os.path.join(path + ".d", "gone.json")
+        open(stale, "w").close()
+        render_graph(self.graph, path, "json", "project", collapse_depth=1)
+        self.assertEqual(os.listdir(path + ".d"), ["path.json"])
+        self.assertEqual(
+            sorted(os.listdir(tmp_dir)), ["project.json", "project.json.d"]
+        )
+
+    def test_distributions(self):
+        builder = GraphBuilder()
+        builder.add_module("app", {"requests.adapters": [], "six": [], "lib": []})
+        # a project module named like an installed distribution stays apart
+        builder.add_module("six", {})
+        graph = builder.build()
+        distributions = DistributionIndex(
+            {"requests": ("requests", "2.31.0"), "six": ("six", "1.16")}
+        )
+        fp = io.StringIO()
+        write_dot(graph, fp, "app", distributions=distributions)
+        dot = fp.getvalue()
+        cluster = dot[dot.index('subgraph "cluster_requests"') :]
+        self.assertIn('label="requests 2.31.0"', cluster)
+        self.assertIn('"requests.adapters"', cluster[: cluster.index("}")])
+        self.assertEqual(dot.count("subgraph"), 1)
+        fp = io.StringIO()
+        write_json(graph, fp, "app", distributions=distributions)
+        nodes = {node["id"]: node for node in json.loads(fp.getvalue())["nodes"]}
+        self.assertEqual(nodes["requests.adapters"]["distribution"], "requests")
+        self.assertEqual(nodes["requests.adapters"]["version"], "2.31.0")
+        self.assertNotIn("distribution", nodes["six"])
+        self.assertNotIn("distribution", nodes["lib"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,101 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import vis
+from resolver import DirectoryIndex, absolute_name, find_modules
+
+
+class TestResolver(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        files = {
+            "main.py": "import os\nimport app.core\nfrom app import views\n",
+            "app/__init__.py": "",
+            "app/core.py": "from . import models\nfrom .util import helper\n",
+            "app/models.py": "def load():\n    import plugins.extra\n",
+            "app/util.py": "def helper():\n    pass\n",
+            "app/views.py": "import json\nfrom ..outside import x\n",
+            "plugins/extra.py": "import requests\n",
+            # shadows the stdlib module main imports
+            "os.py": "import unused\n",
+            "unused.py": "",
+            # only reachable through an import beyond the top level package
+            "outside.py": "",
+        }
+        for path, text in files.items():
+            path = os.path.join(self.root, path)
+            if not os.path.isdir(os.path.dirname(path)):
+                os.makedirs(os.path.dirname(path))
+            with open(path, "w") as fp:
+                fp.write(text)
+
+    def test_find_modules(self):
+        found = find_modules(os.path.join(self.root, "main.py"))
+        self.assertEqual(
+            sorted(found),
+            [
+                "app",
+                "app.core",
+                "app.models",
+                "app.util",
+                "app.views",
+                "main",
+                "plugins",
+                "plugins.extra",
+            ],
+        )
+        self.assertEqual(
+            found["app"],
+            (
+                os.path.join(self.root, "app", "__init__.py"),
+                os.path.join(self.root, "app"),
+            ),
+        )
+        # a namespace package, with nothing to scan
+        self.assertEqual(found["plugins"], (None, os.path.join(self.root, "plugins")))
+
+    def test_use_sys_path(self):
+        found = find_modules(os.path.join(self.root, "main.py"), use_sys_path=True)
+        # the project's os.py shadows the stdlib one, and is scanned
+        self.assertIn("unused", found)
+        self.assertIn("json", found)
+        self.assertNotEqual(os.path.dirname(found["json"][0]), self.root)
+
+    def test_absolute_name(self):
+        cases = [
+            ("json", 0, "pkg.sub", "json"),
+            ("", 1, "pkg.sub", "pkg.sub"),
+            ("a", 2, "pkg.sub", "pkg.a"),
+            ("", 2, "pkg.sub", "pkg"),
+            ("a", 3, "pkg.sub", None),
+            ("a", 1, "", None),
+        ]
+        for target, level, package, expected in cases:
+            self.assertEqual(absolute_name(target, level, package), expected)
+
+    def test_directory_index(self):
+        index = DirectoryIndex()
+        search_path = (self.root,)
+        self.assertEqual(
+            index.find("app.util", search_path),
+            (os.path.join(self.root, "app", "util.py"), None),
+        )
+        self.assertIsNone(index.find("app.util.helper", search_path))
+        self.assertIsNone(index.find("missing", search_path))
+
+    def test_get_modules_from_file(self):
+        modules = vis.get_modules_from_file(os.path.join("project", "main.py"))
+        self.assertEqual(
+            sorted(modules),
+            ["main", "module_a", "module_b", "path", "path.to", "path.to.module_c"],
+        )
+        self.assertEqual(
+            modules["path"].__path__, [os.path.abspath(os.path.join("project", "path"))]
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
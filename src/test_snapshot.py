@@ -0,0 +1,64 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from graph import GraphBuilder, collapse
+from snapshot import SnapshotError, load_graph, save_graph
+
+
+class TestSnapshot(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir)
+        self.path = os.path.join(self.tmp_dir, "graph.snapshot")
+
+    def assertSameGraph(self, loaded, graph):
+        self.assertEqual(loaded.names, graph.names)
+        self.assertEqual(loaded.ids, graph.ids)
+        for a, b in zip(loaded.nodes, graph.nodes):
+            self.assertEqual(
+                (a.file, a.internal, a.count), (b.file, b.internal, b.count)
+            )
+        self.assertEqual(list(loaded.edges()), list(graph.edges()))
+        self.assertEqual(loaded.scopes, graph.scopes)
+        self.assertEqual(list(loaded.edge_names), list(graph.edge_names))
+        self.assertEqual(loaded.weights, graph.weights)
+
+    def test_round_trip(self):
+        builder = GraphBuilder()
+        a = builder.add_node("pkg.a", "/src/pkg/a.py", internal=True)
+        b = builder.add_node("pkg.b", "/src/pkg/b.py", internal=True)
+        c = builder.add_node("réquests")
+        builder.add_edge(a, b, ["x", []])
+        builder.add_edge(a, c, scope="function")
+        builder.add_edge(b, c, [[]], scope="type_checking")
+        graph = builder.build()
+        graph.reverse
+
+        save_graph(graph, self.path, {"fingerprint": "abc"})
+        for use_mmap in (True, False):
+            loaded, meta = load_graph(self.path, use_mmap)
+            self.assertEqual(meta, {"fingerprint": "abc"})
+            self.assertSameGraph(loaded, graph)
+            self.assertSameGraph(loaded.reverse, graph.reverse)
+
+        # a loaded graph saves like any other
+        copy_path = self.path + ".copy"
+        save_graph(loaded, copy_path)
+        self.assertSameGraph(load_graph(copy_path)[0], graph)
+
+        collapsed, _ = collapse(graph, 1)
+        save_graph(collapsed, self.path)
+        loaded, meta = load_graph(self.path)
+        self.assertIsNone(meta)
+        self.assertSameGraph(loaded, collapsed)
+
+    def test_not_a_snapshot(self):
+        with open(self.path, "wb") as fp:
+            fp.write(b"digraph {}")
+        self.assertRaises(SnapshotError, load_graph, self.path)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,69 @@
+import io
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+import stats
+from cache import MemoryScanCache
+from vis import add_immediate_deps_to_modules, get_modules_in_dir
+
+
+class TestStats(unittest.TestCase):
+    def setUp(self):
+        self.addCleanup(stats.disable)
+
+    def test_disabled(self):
+        self.assertFalse(stats.ENABLED)
+        with stats.timer("scan"):
+            stats.count("files")
+            stats.file_scanned("a.py", 1.0)
+        self.assertIsNone(stats.current())
+        out = io.StringIO()
+        stats.report(fp=out)
+        self.assertEqual(out.getvalue(), "")
+
+    def test_timers_and_counters(self):
+        collected = stats.enable(top=2)
+        for _ in range(3):
+            with stats.timer("scan"):
+                stats.count("files")
+        stats.count("bytes read", 100)
+        for path, seconds in [("a.py", 0.3), ("b.py", 0.1), ("c.py", 0.2)]:
+            stats.file_scanned(path, seconds)
+        self.assertEqual(collected.timers["scan"][0], 3)
+        self.assertEqual(collected.counters, {"files": 3, "bytes read": 100})
+        summary = collected.as_dict()
+        self.assertEqual(
+            [slow["path"] for slow in summary["slowest_files"]], ["a.py", "c.py"]
+        )
+        self.assertIn("bytes read", collected.format())
+
+    def test_project_run(self):
+        collected = stats.enable(top=5)
+        cache = MemoryScanCache()
+        for _ in range(2):
+            add_immediate_deps_to_modules(get_modules_in_dir("project"), cache)
+        counters = collected.counters
+        self.assertEqual(counters["files"], 16)
+        # two of the files are empty, the second is a hit by contents
+        self.assertEqual(counters["files scanned"], 7)
+        self.assertEqual(counters["cache hits (content)"], 1)
+        self.assertEqual(counters["cache hits (stat)"], 8)
+        self.assertGreater(counters["bytes read"], 0)
+        for timer in ("discover", stats.SCAN_TIMER, "compile", "resolve imports"):
+            self.assertIn(timer, collected.timers)
+        self.assertGreater(collected.files_per_second(), 0)
+        self.assertEqual(len(collected.slowest), 5)
+
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        path = os.path.join(root, "stats.json")
+        stats.report(path)
+        with open(path) as fp:
+            self.assertEqual(json.load(fp)["counters"], counters)
+
+
+if __name__ == "__main__":
+    unittest.main()
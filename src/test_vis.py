@@ -1,6 +1,12 @@
+import os
+import shutil
+import tempfile
 import unittest
 
 import vis
+import extract
+import stats
+from cache import ScanCache, file_digest
 
 
 class TestVis(unittest.TestCase):
@@ -20,6 +26,176 @@ class TestVis(unittest.TestCase):
         modules = vis.get_modules_in_dir("project")
         self.assertEqual(set(modules.keys()), expected_mod_names)
 
+    def test_parallel_matches_serial(self):
+        serial = vis.get_modules_in_dir("project")
+        vis.add_immediate_deps_to_modules(serial)
+        parallel = vis.get_modules_in_dir("project")
+        vis.add_immediate_deps_to_modules(parallel, jobs=2)
+        for name, module in serial.items():
+            self.assertEqual(
+                list(module.direct_imports.items()),
+                list(parallel[name].direct_imports.items()),
+            )
+
+    def test_import_scopes(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        with open(os.path.join(root, "a.py"), "w") as fp:
+            fp.write("import b\n\ndef f():\n    import c\n")
+        for name in ("b", "c"):
+            open(os.path.join(root, name + ".py"), "w").close()
+        modules = vis.get_modules_in_dir(root)
+        vis.add_immediate_deps_to_modules(modules)
+        self.assertEqual(
+            modules["a"].import_scopes, {"b": "module", "c": "function"}
+        )
+        vis.drop_deferred_imports(modules)
+        self.assertEqual(list(modules["a"].direct_imports), ["b"])
+
+    def test_relative_imports(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        files = {
+            "pkg/__init__.py": "from . import a\nfrom .sub import b\n",
+            "pkg/a.py": "from .sub.b import func\nfrom . import CONST\n",
+            "pkg/sub/__init__.py": "",
+            "pkg/sub/b.py": "from .. import a\nfrom ..a import x\nfrom ... import y\n",
+            # beyond the top level package: an ImportError, not the root's top
+            "pkg/c.py": "from .. import top\nfrom . import a\n",
+            "top.py": "",
+        }
+        for path, source in files.items():
+            path = os.path.join(root, path)
+            if not os.path.isdir(os.path.dirname(path)):
+                os.makedirs(os.path.dirname(path))
+            with open(path, "w") as fp:
+                fp.write(source)
+        modules = vis.get_modules_in_dir(root)
+        vis.add_immediate_deps_to_modules(modules)
+        deps = {name: dict(mod.direct_imports) for name, mod in modules.items()}
+        self.assertEqual(deps["pkg"], {"pkg.a": [[]], "pkg.sub.b": [[]]})
+        self.assertEqual(deps["pkg.a"], {"pkg.sub.b": ["func"], "pkg": ["CONST"]})
+        self.assertEqual(deps["pkg.sub.b"], {"pkg.a": [[], "x"]})
+        self.assertEqual(deps["pkg.c"], {"pkg.a": [[]]})
+
+    def test_relative_imports_next_to_root_init(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        files = {
+            "__init__.py": "from . import b\n",
+            "a.py": "from . import b\nfrom .b import x\n",
+            "b.py": "",
+        }
+        for name, source in files.items():
+            with open(os.path.join(root, name), "w") as fp:
+                fp.write(source)
+        modules = vis.get_modules_in_dir(root)
+        packages = vis.PackageIndex()
+        # whichever module is resolved first, the top level has no package
+        for name in ("__init__", "a"):
+            module = modules[name]
+            imports = vis.get_imports(module.__file__)
+            deps = vis.resolve_imports(modules, module, imports, packages=packages)
+            self.assertEqual(dict(deps), {}, name)
+
+    def test_stream_matches_graph(self):
+        modules = vis.get_modules_in_dir("project")
+        vis.add_immediate_deps_to_modules(modules)
+        expected = sorted(
+            (name, dep, module.import_scopes[dep], dep in modules)
+            for name, module in modules.items()
+            for dep in module.direct_imports
+        )
+        for jobs, io_threads in [(1, 0), (2, 0), (1, 4)]:
+            edges = vis.iter_project_edges("project", jobs=jobs, io_threads=io_threads)
+            found = sorted(
+                (src, dst, scope, internal) for src, dst, scope, _, internal in edges
+            )
+            self.assertEqual(found, expected)
+
+
+class TestRdeps(unittest.TestCase):
+    def setUp(self):
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        self.root = os.path.join(tmp_dir, "project")
+        shutil.copytree("project", self.root)
+
+    def test_rdeps(self):
+        modules = vis.get_modules_in_dir(self.root)
+        graph = vis.add_immediate_deps_to_modules(modules)
+        self.assertEqual(
+            dict(modules["module_a"].imported_by),
+            {"hello": ["func_a"], "path.to.module_c": [[]]},
+        )
+        self.assertEqual(
+            vis.rdeps(graph, "module_a"),
+            [("hello", 1), ("path.to.module_c", 1), ("main", 2)],
+        )
+        self.assertEqual(vis.rdeps(graph, "module_a", depth=1)[-1][1], 1)
+
+    def test_snapshot_is_reused_until_a_file_changes(self):
+        graph = vis.load_project_graph(self.root)
+        orig_extractors = extract.EXTRACTORS
+        try:
+            # nothing may be scanned while the snapshot is up to date
+            extract.EXTRACTORS = {"bytecode": None}
+            again = vis.load_project_graph(self.root)
+        finally:
+            extract.EXTRACTORS = orig_extractors
+        self.assertEqual(list(again.edges()), list(graph.edges()))
+
+        with open(os.path.join(self.root, "module_b.py"), "a") as fp:
+            fp.write("\nimport module_d\n")
+        graph = vis.load_project_graph(self.root)
+        self.assertEqual(vis.rdeps(graph, "module_d", 1), [("module_b", 1)])
+
+
+class TestScanCache(unittest.TestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.cache_dir)
+
+    def deps(self, cache):
+        modules = vis.get_modules_in_dir("project")
+        vis.add_immediate_deps_to_modules(modules, cache)
+        return {name: dict(mod.direct_imports) for name, mod in modules.items()}
+
+    def test_unchanged_files_are_not_recompiled(self):
+        expected = self.deps(ScanCache(self.cache_dir))
+        orig_extractors = extract.EXTRACTORS
+        try:
+            extract.EXTRACTORS = {"bytecode": None}
+            self.assertEqual(self.deps(ScanCache(self.cache_dir)), expected)
+        finally:
+            extract.EXTRACTORS = orig_extractors
+        self.assertEqual(self.deps(None), expected)
+
+    def test_lookup_by_digest(self):
+        cache = ScanCache(self.cache_dir)
+        path = os.path.join("project", "main.py")
+        imports = vis.get_imports(path, cache)
+        # same content at a different path is served from the digest table
+        with open(path, "rb") as fp:
+            digest = file_digest(fp.read())
+        self.assertEqual(cache.get_by_digest(digest), imports)
+        self.assertIsNone(cache.get_by_stat("elsewhere.py", 0, 0))
+
+    def test_parallel_lookup_by_digest(self):
+        root = os.path.join(self.cache_dir, "project")
+        shutil.copytree("project", root)
+        paths = [os.path.join(root, "main.py"), os.path.join(root, "hello.py")]
+        cache = ScanCache(self.cache_dir)
+        expected = extract.get_imports_parallel(paths, cache, jobs=2)
+        # touched, but not changed
+        os.utime(paths[0], (0, 0))
+        self.addCleanup(stats.disable)
+        collected = stats.enable()
+        self.assertEqual(extract.get_imports_parallel(paths, cache, jobs=2), expected)
+        self.assertEqual(collected.counters["cache hits (stat)"], 1)
+        self.assertEqual(collected.counters["cache hits (content)"], 1)
+        self.assertNotIn("files scanned", collected.counters)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,76 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import vis
+from cache import MemoryScanCache
+from watch import InotifyWatcher, PollingWatcher
+
+
+class TestWatch(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        self.write("a.py", "import b\n")
+        self.write("b.py", "X = 1\n")
+        self.mods = vis.get_modules_in_dir(self.root)
+        self.cache = MemoryScanCache()
+        vis.add_immediate_deps_to_modules(self.mods, self.cache)
+        self.watcher = PollingWatcher(
+            lambda: [p for _, p in vis.iter_py_files(self.root)]
+        )
+
+    def write(self, name, source):
+        path = os.path.join(self.root, name)
+        with open(path, "w") as fp:
+            fp.write(source)
+        # make sure the change is visible even with coarse mtimes
+        st = os.stat(path)
+        os.utime(path, (st.st_atime, st.st_mtime + 10))
+        return path
+
+    def update(self):
+        changes = self.watcher.poll()
+        return vis.update_modules(self.mods, self.root, changes, self.cache)
+
+    def test_changed_file_is_rescanned_alone(self):
+        self.write("b.py", "import a\n")
+        self.assertEqual(self.update(), ["b"])
+        self.assertEqual(list(self.mods["b"].direct_imports), ["a"])
+        self.assertEqual(self.update(), [])
+
+    def test_added_and_removed_files(self):
+        self.write("c.py", "import a, b\n")
+        self.assertEqual(self.update(), ["a", "b", "c"])
+        self.assertEqual(list(self.mods["c"].direct_imports), ["a", "b"])
+        os.remove(os.path.join(self.root, "c.py"))
+        self.update()
+        self.assertNotIn("c", self.mods)
+
+    def test_imported_by_follows_updates(self):
+        self.write("c.py", "import b\n")
+        self.update()
+        self.assertEqual(sorted(self.mods["b"].imported_by), ["a", "c"])
+        self.write("a.py", "X = 2\n")
+        self.update()
+        self.assertEqual(sorted(self.mods["b"].imported_by), ["c"])
+        self.assertEqual(sorted(self.mods["a"].imported_by), [])
+
+    def test_new_files_follow_ignore_rules(self):
+        # inotify itself may not be available, only the classification runs
+        watcher = InotifyWatcher.__new__(InotifyWatcher)
+        watcher.list_files = lambda: [
+            p for _, p in vis.iter_py_files(self.root, exclude=["gen/"])
+        ]
+        watcher.known = set(watcher.list_files())
+        os.mkdir(os.path.join(self.root, "gen"))
+        excluded = self.write(os.path.join("gen", "x.py"), "import a\n")
+        added = self.write("c.py", "import a\n")
+        changes = watcher._classify([excluded, added])
+        self.assertEqual(changes.added, set([added]))
+        self.assertNotIn(excluded, watcher.known)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -3,116 +3,152 @@
 
 
 import argparse
-import dis
+import atexit
+import contextlib
+import hashlib
 import os
 import sys
 from collections import defaultdict
-from modulefinder import ModuleFinder, Module as MFModule
+from itertools import islice
+from modulefinder import Module as MFModule
 
 import graphviz
 
-from libinfo import is_std_lib_module
+import stats
+from cache import (
+    CACHE_DIR_NAME,
+    INTERPRETER_KEY,
+    MemoryScanCache,
+    ScanCache,
+    stat_key,
+)
+from discover import filter_paths, is_pruned_dir, iter_files
+from extract import (
+    DEFAULT_EXTRACTOR,
+    EXTRACTORS,
+    FUNCTION_SCOPE,
+    MODULE_SCOPE,
+    TYPE_CHECKING_SCOPE,
+    get_imports,
+    get_imports_parallel,
+)
+from formats import (
+    CYCLE_COLOR,
+    DEFAULT_FORMAT,
+    FORMAT_JSONL,
+    FORMAT_PDF,
+    FORMATS,
+    SCOPE_EDGE_STYLES,
+    STREAM_FORMATS,
+)
+from gitsource import GitError, GitSource
+from graph import GraphBuilder, attach_views, collapse, graph_of
+from importtime import attach_import_times, heat_attrs, profile_entry
+from libinfo import STDLIB, ModuleClassifier
+from pipeline import DEFAULT_IO_BUFFER, get_imports_prefetched
+from resolver import absolute_name, find_modules
+from snapshot import SNAPSHOT_FORMAT, SnapshotError, load_graph, save_graph
 
 
-# actual opcodes
-LOAD_CONST = dis.opmap["LOAD_CONST"]
-IMPORT_NAME = dis.opmap["IMPORT_NAME"]
-STORE_NAME = dis.opmap["STORE_NAME"]
-STORE_GLOBAL = dis.opmap["STORE_GLOBAL"]
-POP_TOP = dis.opmap["POP_TOP"]
-POP_BLOCK = dis.opmap["POP_BLOCK"]
-STORE_OPS = STORE_NAME, STORE_GLOBAL
-EXTENDED_ARG = dis.EXTENDED_ARG
-HAVE_ARGUMENT = dis.HAVE_ARGUMENT
-
-# enum identifiers for scan_opcodes()
-STORE = "store"
-ABS_IMPORT = "absolute_import"
-REL_IMPORT = "relative_import"
-
 # Python 2 or 3 (int)
 PY_VERSION = sys.version_info[0]
 
 # Output file for dag visualization
 DAG_OUT = "dag.dot"
 
+# Snapshot of a project's graph kept in its cache dir, see load_project_graph()
+GRAPH_SNAPSHOT_NAME = "graph-{}.snapshot"
 
-def abs_mod_name(module, root_dir):
-    """ From a Module's absolute path, and the root directory, return a
-    string with how that module would be imported from a script in the root
-    directory.
+# Files scanned together by iter_project_edges()
+STREAM_BATCH = 1024
 
-    Example: abs_mod_name(Module('/path/to/mod.py'), '/path') -> 'to.mod'
-    NOTE: no trailing '/' in root_dir
-    """
-    abs_path = os.path.abspath(module.__file__)
-    rel_path = abs_path[len(root_dir) :]
-    path_parts = rel_path.split("/")[1:]
-    path_parts[-1] = path_parts[-1][:-3]
-    if path_parts[-1] == "__init__":
-        del path_parts[-1]
-    mod_name = ".".join(path_parts)
-    return mod_name
+# Import scopes, from most to least costly at import time
+SCOPE_RANKS = {MODULE_SCOPE: 0, FUNCTION_SCOPE: 1, TYPE_CHECKING_SCOPE: 2}
 
 
-def get_modules_from_file(script, root_dir=None, use_sys_path=False):
-    """ Use ModuleFinder.load_file() to get module imports for the given
-    script.
+def get_modules_from_file(
+    script, root_dir=None, cache=None, extractor=DEFAULT_EXTRACTOR
+):
+    """ Find the modules the given script imports, directly or through other
+    modules, with resolver.find_modules(). Only the project's modules are
+    returned: the third party modules they import show up in the graph once
+    their imports are resolved, like those of a project directory.
 
     :param script: the script we're getting modules from
     :param root_dir: the project's root dir, if different from script's dir
-    :param use_sys_path: use the system PATH when looking for module defs, this
-    may be useful if you want to add stdlib modules
+    :param cache: ScanCache the scans go through
     :rtype: {str(module name): Module}
     """
-    script = os.path.abspath(script)
-    if not root_dir:
-        root_dir = os.path.dirname(script)
-    path = [root_dir]
-    if use_sys_path:
-        path.append(sys.path[:])
-
-    finder = ModuleFinder(path)
-    finder.load_file(script)
-    modules = finder.modules
-
-    if not use_sys_path:
-        # Filter out standard library imports
-        modules = {
-            name: mod
-            for name, mod in modules.items()
-            if not is_std_lib_module(name, PY_VERSION)
-        }
-
-    # All the module names have to be as references from the root directory
-    modules = {abs_mod_name(mod, root_dir): mod for mod in modules.values()}
-
+    with stats.timer("find modules"):
+        found = find_modules(script, root_dir, cache, extractor)
+    modules = {}
+    for name, (path, package_dir) in found.items():
+        # namespace packages have no file to scan
+        if path is not None:
+            package_path = [package_dir] if package_dir else None
+            modules[name] = Module(name, file=path, path=package_path)
     return modules
 
 
-def get_modules_in_dir(root_dir, ignore_venv=True):
-    """ Walk a directory recursively and get the module imports for all .py
-    files in the directory.
+def _mod_name(root_dir, mod_file):
+    """ Module name of the file mod_file, relative to root_dir. """
+    mod_name = mod_file[len(root_dir) + 1 :].replace("/", ".")[:-3]
+    if "__init__" in mod_name:
+        mod_name = mod_name.replace(".__init__", "")
+    return mod_name
+
+
+def iter_py_files(root_dir, ignore_venv=True, exclude=()):
+    """ Walk a directory recursively and generate a (module name, absolute
+    path) tuple for each .py file in it, leaving out virtualenvs (unless
+    ignore_venv is false), files ignored by .gitignore and those matching
+    the exclude patterns (see discover.py).
     """
     root_dir = os.path.abspath(root_dir)
-    mods = {}
+    for mod_file in iter_files(root_dir, ".py", exclude, skip_venvs=ignore_venv):
+        yield _mod_name(root_dir, mod_file), mod_file
 
-    for top, dir, files in os.walk(root_dir):
-        if ignore_venv and ("venv" in top or "virt" in top):
-            continue
-        for nm in files:
-            if nm[-3:] == ".py":
-                mod_file = os.path.abspath(os.path.join(top, nm))
-                mod_path = os.path.dirname(mod_file)
-                mod_name = mod_file[len(root_dir) + 1 :].replace("/", ".")[:-3]
-                if "__init__" in mod_name:
-                    mod_name = mod_name.replace(".__init__", "")
-                if mod_name not in mods:
-                    mod = Module(mod_name, file=mod_file, path=mod_path)
-                    mods[mod_name] = mod
+
+def _modules_of_files(files):
+    mods = {}
+    for mod_name, mod_file in files:
+        if mod_name not in mods:
+            mod_path = os.path.dirname(mod_file)
+            mod = Module(mod_name, file=mod_file, path=mod_path)
+            mods[mod_name] = mod
     return mods
 
 
+def get_modules_in_dir(root_dir, ignore_venv=True, exclude=()):
+    """ Walk a directory recursively and get the module imports for all .py
+    files in the directory.
+    """
+    with stats.timer("discover"):
+        return _modules_of_files(iter_py_files(root_dir, ignore_venv, exclude))
+
+
+def get_modules_at_rev(source, ignore_venv=True, exclude=()):
+    """ Like get_modules_in_dir(), for the files of a gitsource.GitSource.
+    Modules get the paths they would have in a checkout, but nothing is
+    read from the working tree.
+    """
+    root_dir = source.root_dir
+    relpaths = sorted(
+        path[len(root_dir) + 1 :]
+        for paths in (source.blobs, source.venv_markers)
+        for path in paths
+    )
+    files = (
+        (_mod_name(root_dir, path), path)
+        for path in (
+            os.path.join(root_dir, relpath)
+            for relpath in filter_paths(relpaths, exclude, ignore_venv)
+        )
+    )
+    with stats.timer("discover"):
+        return _modules_of_files(files)
+
+
 class Module(MFModule, object):
     """ Extension of modulefinder.ModuleFinder to add custom attrs. """
 
@@ -123,81 +159,115 @@ class Module(MFModule, object):
         # value = list of names imported from that module
         self.direct_imports = {}
 
+        # keys = same as direct_imports
+        # value = where the import runs, see extract.MODULE_SCOPE
+        self.import_scopes = {}
+
+        # keys = the fully qualified names of the modules importing this one
+        # value = list of names they import from it
+        self.imported_by = {}
+
+        # (self us, cumulative us) measured by importtime.profile_entry()
+        self.import_time = None
+
 
-def _unpack_opargs(code):
-    """ Step through the python bytecode and generate a tuple (int, int, int):
-    (operation_index, operation_byte, argument_byte) for each operation.
+class PackageIndex(object):
+    """ Memoized mapping of directories to the name of the package that
+    relative imports in their modules are resolved against. A directory's
+    __init__ and its other modules are memoized apart, as the package of
+    the root directory's __init__ (named "__init__") can't be told from its
+    name.
     """
-    extended_arg = 0
-    if PY_VERSION == 3:
-        for i in range(0, len(code), 2):
-            op = code[i]
-            if op >= HAVE_ARGUMENT:
-                next_code = code[i + 1]
-                arg = next_code | extended_arg
-                extended_arg = (arg << 8) if op == EXTENDED_ARG else 0
-            else:
-                arg = None
-            yield (i, op, arg)
-    elif PY_VERSION == 2:
-        i = 0
-        while i < len(code):
-            op = ord(code[i])
-            if op >= HAVE_ARGUMENT:
-                arg = ord(code[i + 1])
-                i += 3
+
+    def __init__(self):
+        # (directory, is __init__): package
+        self._by_dir = {}
+
+    def package_of(self, module):
+        """ Name of the package a module belongs to ("" at the top level).
+        A package's __init__ belongs to the package itself.
+        """
+        path = module.__file__
+        is_init = os.path.basename(path) == "__init__.py"
+        key = (os.path.dirname(path), is_init)
+        package = self._by_dir.get(key)
+        if package is None:
+            if not is_init:
+                package = module.__name__.rpartition(".")[0]
+            elif module.__name__ == "__init__":
+                # the project root's own __init__.py
+                package = ""
             else:
-                arg = None
-                i += 1
-            yield (i, op, arg)
-    # Python 1?
+                package = module.__name__
+            self._by_dir[key] = package
+        return package
 
 
-def scan_opcodes(compiled):
-    """
-    This function is stolen w/ slight modifications from the standard library
-    modulefinder.
-
-    From a compiled code object, generate reports of relevant operations:
-    storing variables, absolute imports, and relative imports.
-
-    Return types are a bit tricky, type = (str, tuple):
-        (STORE, (<name:str>,))
-            - ex: (STORE, "x")
-            - source that generated this: `x = 1`
-        (ABS_IMPORT, (<names:tuple(str)>, <namespace:str>))
-            - ex: (ABS_IMPORT, ("foo","bar"), "path.to.module")
-            - `from path.to.module import foo, bar`
-        (REL_IMPORT, (<level:int>, <names:tuple(str)>,
-        <namespace:str>))
-            - ex: (REL_IMPORT, (2, ("up",), "")
-            - `from .. import up`
-            - (an import of "up" from the immediate parent directory, level=2)
-            - (level=1 means the module's own directory)
+def resolve_imports(
+    all_mods, module, imports, classifier=None, scopes=None, packages=None
+):
+    """ Turn a module's raw import records (see scan_imports()) into the
+    fully qualified names of the modules it imports. Pass the same
+    ModuleClassifier and PackageIndex for all modules of a project to share
+    their memos.
+
+    If a scopes dict is given, it is filled with the scope each module is
+    imported in (see extract.MODULE_SCOPE), keeping the one that costs the
+    most at import time when a module is imported in several places.
+
+    Returns:
+        {<module name:str>: <list of names imported from the module:list(str)>}
     """
-    code = compiled.co_code
-    names = compiled.co_names
-    consts = compiled.co_consts
-    opargs = [(op, arg) for _, op, arg in _unpack_opargs(code) if op != EXTENDED_ARG]
-    for i, (op, oparg) in enumerate(opargs):
-        if op in STORE_OPS:
-            yield STORE, (names[oparg],)
-            continue
-        if (
-            op == IMPORT_NAME
-            and i >= 2
-            and opargs[i - 1][0] == opargs[i - 2][0] == LOAD_CONST
+    if classifier is None:
+        classifier = ModuleClassifier(all_mods, PY_VERSION)
+    if packages is None:
+        packages = PackageIndex()
+    fq_deps = defaultdict(list)
+
+    def add_dep(dep, name, scope):
+        fq_deps[dep].append(name)
+        if scopes is not None and SCOPE_RANKS[scope] < SCOPE_RANKS.get(
+            scopes.get(dep), len(SCOPE_RANKS)
         ):
-            level = consts[opargs[i - 2][1]]
-            fromlist = consts[opargs[i - 1][1]] or []
-            if level == 0 or level == -1:
-                yield ABS_IMPORT, (fromlist, names[oparg])
-            else:
-                yield REL_IMPORT, (level, fromlist, names[oparg])
-            continue
+            scopes[dep] = scope
+
+    for level, names, top, scope in imports:
+
+        if level == 0 or level == -1:
+            if classifier.classify(top) != STDLIB:
+                if not names:
+                    add_dep(top, [], scope)
+                for name in names:
+                    fq_name = top + "." + name
+                    if fq_name in all_mods:
+                        # just to make sure it's in the dict
+                        add_dep(fq_name, [], scope)
+                    else:
+                        add_dep(top, name, scope)
+
+        else:
+            top = absolute_name(top, level, packages.package_of(module))
+            if top is None:
+                continue
+            for name in names:
+                fq_name = top + "." + name if top else name
+                if fq_name in all_mods:
+                    add_dep(fq_name, [], scope)
+                elif top:
+                    add_dep(top, name, scope)
+
+    return fq_deps
 
 
-def get_fq_immediate_deps(all_mods, module):
+def get_fq_immediate_deps(
+    all_mods,
+    module,
+    cache=None,
+    classifier=None,
+    extractor=DEFAULT_EXTRACTOR,
+    scopes=None,
+    packages=None,
+):
     """
     From a Module, using the module's absolute path, compile the code and then
     search through it for the imports and get a list of the immediately
@@ -208,77 +278,636 @@ def get_fq_immediate_deps(all_mods, module):
     Returns:
         {<module name:str>: <list of names imported from the module:list(str)>}
     """
-    fq_deps = defaultdict(list)
-
-    with open(module.__file__, "r") as fp:
-        path = os.path.dirname(module.__file__)
-        compiled = compile(fp.read() + "\n", path, "exec")
-        for op, args in scan_opcodes(compiled):
-
-            if op == STORE:
-                # TODO
-                pass
-
-            if op == ABS_IMPORT:
-                names, top = args
-                if (
-                    not is_std_lib_module(top.split(".")[0], PY_VERSION)
-                    or top in all_mods
-                ):
-                    if not names:
-                        fq_deps[top].append([])
-                    for name in names:
-                        fq_name = top + "." + name
-                        if fq_name in all_mods:
-                            # just to make sure it's in the dict
-                            fq_deps[fq_name].append([])
-                        else:
-                            fq_deps[top].append(name)
-
-            if op == REL_IMPORT:
-                # TODO
-                pass
-
-    return fq_deps
+    imports = get_imports(module.__file__, cache, extractor)
+    with stats.timer("resolve imports"):
+        return resolve_imports(all_mods, module, imports, classifier, scopes, packages)
 
 
-def add_immediate_deps_to_modules(mod_dict):
+def add_immediate_deps_to_modules(
+    mod_dict,
+    cache=None,
+    jobs=1,
+    extractor=DEFAULT_EXTRACTOR,
+    source=None,
+    io_threads=0,
+    io_buffer=DEFAULT_IO_BUFFER,
+):
     """ Take a module dictionary, and add the names of the modules directly
     imported by each module in the dictionary, and add them to the module's
     direct_imports.
+
+    The imports are stored in a graph.ModuleGraph, which is returned, and
+    every module's direct_imports and import_scopes become read-only views
+    of it.
+
+    If a ScanCache is given, unchanged files are not recompiled. With jobs > 1
+    (or None for one per CPU) files are scanned in a process pool; the result
+    is the same as a serial run. extractor names the backend in
+    extract.EXTRACTORS used to scan files. With a gitsource.GitSource, files
+    are read from its git revision rather than from disk. With io_threads,
+    files are read that many at a time ahead of the scans, holding at most
+    about io_buffer bytes (see pipeline.py).
     """
+    classifier = ModuleClassifier(mod_dict, PY_VERSION)
+    packages = PackageIndex()
+    builder = GraphBuilder()
+    for name, module in sorted(mod_dict.items()):
+        builder.add_node(name, module.__file__, internal=True)
+    paths = sorted(module.__file__ for module in mod_dict.values())
+    # with none of these, files are scanned a file at a time below
+    imports = None
+    if source is not None or io_threads or jobs != 1:
+        with stats.timer(stats.SCAN_TIMER):
+            if source is not None:
+                imports = source.get_imports(paths, cache, jobs, extractor)
+            elif io_threads:
+                imports = get_imports_prefetched(
+                    paths, cache, jobs, extractor, io_threads, io_buffer
+                )
+            else:
+                imports = get_imports_parallel(paths, cache, jobs, extractor)
     for name, module in sorted(mod_dict.items()):
-        fq_deps = get_fq_immediate_deps(mod_dict, module)
-        module.direct_imports = fq_deps
+        scopes = {}
+        if imports is None:
+            fq_deps = get_fq_immediate_deps(
+                mod_dict, module, cache, classifier, extractor, scopes, packages
+            )
+        else:
+            with stats.timer("resolve imports"):
+                fq_deps = resolve_imports(
+                    mod_dict,
+                    module,
+                    imports.pop(module.__file__),
+                    classifier,
+                    scopes,
+                    packages,
+                )
+        builder.add_module(name, fq_deps, scopes, module.__file__)
+    if cache is not None:
+        cache.commit()
+    with stats.timer("build graph"):
+        graph = builder.build()
+        attach_views(mod_dict, graph)
+    return graph
 
 
-def mod_dict_to_dag(mod_dict, graph_name):
+def iter_project_edges(
+    root_dir,
+    cache=None,
+    jobs=1,
+    extractor=DEFAULT_EXTRACTOR,
+    exclude=(),
+    io_threads=0,
+    io_buffer=DEFAULT_IO_BUFFER,
+):
+    """ Generate the imports of the project in root_dir as (importer,
+    imported, scope, [names imported], imported module is internal) tuples,
+    a module at a time, without building a module dictionary or a graph.
+
+    Only the set of module names stays in memory, to resolve imports
+    against and tell the project's modules from the rest. The directory is
+    walked twice: once for the names, then again to scan the files, in
+    batches of STREAM_BATCH with jobs > 1 or io_threads (see
+    add_immediate_deps_to_modules()).
+    """
+    names = set(name for name, _ in iter_py_files(root_dir, exclude=exclude))
+    classifier = ModuleClassifier(names, PY_VERSION)
+    packages = PackageIndex()
+    files = iter_py_files(root_dir, exclude=exclude)
+    while True:
+        batch = list(islice(files, STREAM_BATCH))
+        if not batch:
+            break
+        paths = [path for _, path in batch]
+        imports = None
+        if io_threads or jobs != 1:
+            with stats.timer(stats.SCAN_TIMER):
+                if io_threads:
+                    imports = get_imports_prefetched(
+                        paths, cache, jobs, extractor, io_threads, io_buffer
+                    )
+                else:
+                    imports = get_imports_parallel(paths, cache, jobs, extractor)
+        for name, path in batch:
+            if imports is None:
+                records = get_imports(path, cache, extractor)
+            else:
+                records = imports.pop(path)
+            scopes = {}
+            with stats.timer("resolve imports"):
+                fq_deps = resolve_imports(
+                    names,
+                    Module(name, file=path),
+                    records,
+                    classifier,
+                    scopes,
+                    packages,
+                )
+            for dep, imported in sorted(fq_deps.items()):
+                yield name, dep, scopes[dep], [n for n in imported if n], dep in names
+        if cache is not None:
+            cache.commit()
+
+
+def drop_deferred_imports(mod_dict):
+    """ Remove the direct imports that don't run when a module is imported
+    (those in functions or behind `if TYPE_CHECKING:`) from every module.
+    """
+    attach_views(mod_dict, graph_of(mod_dict).module_level())
+
+
+def mod_dict_to_dag(
+    mod_dict, graph_name, import_times=None, collapse_depth=None, distributions=None
+):
     """ Take a module dictionary, and return a graphviz.Digraph object
-    representing the module import relationships. """
+    representing the module import relationships.
+
+    If import_times ({name: (self us, cumulative us)}, see importtime.py) is
+    given, nodes are shaded and sized by cumulative import time. With
+    collapse_depth, modules are merged into package nodes labelled with
+    their number of modules, and edges with their number of imports (see
+    graph.collapse()). Imports that are part of a cycle are drawn in red.
+    Given a distinfo.DistributionIndex, vendor modules are clustered by the
+    distribution providing them.
+    """
+    from analysis import cycle_edges
+
+    graph = graph_of(mod_dict)
+    if collapse_depth:
+        graph, _ = collapse(graph, collapse_depth)
+    names, nodes = graph.names, graph.nodes
+    in_cycle = cycle_edges(graph.module_level().succ)
     dag = graphviz.Digraph(graph_name, format="pdf")
-    # Vendor modules, AKA third-party modules
-    vendor_mods = set()
-    for name, module in mod_dict.items():
-        for di in module.direct_imports:
-            # Vendor modules and edges get a different color
-            attrs = {}
-            if di not in mod_dict:
-                attrs["color"] = "blue"
-                if di not in vendor_mods:
-                    dag.node(di, **attrs)
-                    vendor_mods.add(di)
-            dag.edge(name, di, **attrs)
+    if import_times:
+        max_us = max(cumulative for _, cumulative in import_times.values())
+    clusters = []
+    cluster_of = {}
+    groups = {}
+    if distributions is not None:
+        from render import distribution_groups
+
+        groups = distribution_groups(graph, distributions)
+    for (dist, version), members in sorted(groups.items()):
+        cluster = graphviz.Digraph("cluster_" + dist)
+        cluster.attr(label="{} {}".format(dist, version))
+        clusters.append(cluster)
+        for node in members:
+            cluster_of[node] = cluster
+    for node, name in enumerate(names):
+        # Vendor modules, AKA third-party modules, get a different color
+        attrs = {}
+        if not nodes[node].internal:
+            attrs["color"] = "blue"
+        if nodes[node].count != 1:
+            attrs["label"] = "{} ({})".format(name, nodes[node].count)
+        if import_times and name in import_times:
+            attrs.update(heat_attrs(import_times[name][1], max_us))
+        if node in cluster_of:
+            cluster_of[node].node(name, **attrs)
+        elif attrs:
+            dag.node(name, **attrs)
+    for cluster in clusters:
+        dag.subgraph(cluster)
+    for src, dst, e in graph.edges():
+        attrs = {}
+        if not nodes[dst].internal:
+            attrs["color"] = "blue"
+        elif (src, dst) in in_cycle:
+            attrs["color"] = CYCLE_COLOR
+        # Deferred imports don't cost anything at import time
+        scope = graph.edge_scope(e)
+        if scope in SCOPE_EDGE_STYLES:
+            attrs["style"] = SCOPE_EDGE_STYLES[scope]
+        if graph.edge_weight(e) != 1:
+            attrs["label"] = str(graph.edge_weight(e))
+        dag.edge(names[src], names[dst], **attrs)
     return dag
 
 
+def print_cycles(mod_dict):
+    """ Print every import cycle of module level imports: the modules in
+    each strongly connected component, and a shortest cycle through it.
+    """
+    from analysis import import_cycles
+
+    graph = graph_of(mod_dict).module_level()
+    names = graph.names
+    cycles = import_cycles(graph.succ)
+    print("\nImport cycles: {}".format(len(cycles)))
+    for component, cycle in cycles:
+        print(
+            "\n    {} module(s): {}".format(
+                len(component), ", ".join(names[v] for v in component)
+            )
+        )
+        print("    cycle: " + " -> ".join(names[v] for v in cycle))
+
+
+def rdeps(graph, name, depth=None):
+    """ The modules that import the module name, directly or through other
+    modules, found by a breadth first search over the graph's reverse index
+    (see graph.ModuleGraph.reverse).
+
+    :param depth: only follow this many imports (1 for direct importers)
+    :rtype: [(<module name:str>, <number of imports away:int>)] nearest first
+    """
+    from analysis import bfs_distances
+
+    found = bfs_distances(graph.reverse.succ, graph.ids[name], depth)
+    return sorted(
+        ((graph.names[v], distance) for v, distance in found),
+        key=lambda item: (item[1], item[0]),
+    )
+
+
+def print_rdeps(graph, name, depth=None):
+    """ Print the modules that import name, by distance. """
+    if name not in graph.ids:
+        sys.exit("Unknown module: {}".format(name))
+    found = rdeps(graph, name, depth)
+    print(
+        "Modules importing {}{}: {}".format(
+            name, "" if depth is None else " (depth <= {})".format(depth), len(found)
+        )
+    )
+    for dep, distance in found:
+        print("    {:<60} {:>3}".format(dep, distance))
+
+
+def project_fingerprint(root_dir, extractor=DEFAULT_EXTRACTOR, exclude=()):
+    """ Hash of the path, mtime and size of every module in root_dir, and of
+    what else the graph depends on. Only stats files, so it is cheap enough
+    to check before every query.
+    """
+    digest = hashlib.sha1(
+        "{}\n{}\n{}\n".format(INTERPRETER_KEY, extractor, SNAPSHOT_FORMAT).encode(
+            "utf-8"
+        )
+    )
+    for _, path in sorted(iter_py_files(root_dir, exclude=exclude)):
+        mtime, size = stat_key(path)
+        digest.update("{}\0{}\0{}\n".format(path, mtime, size).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def load_project_graph(
+    root_dir,
+    cache=None,
+    jobs=1,
+    extractor=DEFAULT_EXTRACTOR,
+    exclude=(),
+    io_threads=0,
+    io_buffer=DEFAULT_IO_BUFFER,
+):
+    """ The ModuleGraph of the project in root_dir, loaded from the snapshot
+    in its cache dir when no module changed since it was saved (or was
+    added or removed, e.g. by a different exclude). Otherwise the project is
+    scanned (through cache if given) and a new snapshot is saved.
+    """
+    cache_dir = os.path.join(os.path.abspath(root_dir), CACHE_DIR_NAME)
+    path = os.path.join(cache_dir, GRAPH_SNAPSHOT_NAME.format(extractor))
+    fingerprint = project_fingerprint(root_dir, extractor, exclude)
+    try:
+        graph, meta = load_graph(path)
+        if meta == {"fingerprint": fingerprint}:
+            return graph
+    except (IOError, OSError, SnapshotError):
+        pass
+    mod_dict = get_modules_in_dir(root_dir, exclude=exclude)
+    graph = add_immediate_deps_to_modules(
+        mod_dict, cache, jobs, extractor, io_threads=io_threads, io_buffer=io_buffer
+    )
+    if not os.path.isdir(cache_dir):
+        os.makedirs(cache_dir)
+    # the snapshot is for queries, which mostly need the reverse index
+    graph.reverse
+    save_graph(graph, path, {"fingerprint": fingerprint})
+    return graph
+
+
+def save_project_graph(graph, path, root_dir):
+    """ Save graph to a snapshot at path, for --load-graph or diff. """
+    root_dir = os.path.abspath(root_dir)
+    meta = {"project": os.path.basename(root_dir), "root": root_dir}
+    save_graph(graph, path, meta)
+
+
+def load_saved_graph(path):
+    """ Load a snapshot written by save_project_graph(). Returns (graph,
+    project name, project root), and exits with a message if path isn't a
+    snapshot.
+    """
+    try:
+        graph, meta = load_graph(path)
+    except (IOError, OSError, SnapshotError) as e:
+        sys.exit("Can't load graph from {}: {}".format(path, e))
+    meta = meta or {}
+    project_name = meta.get("project") or os.path.splitext(os.path.basename(path))[0]
+    return graph, project_name, meta.get("root", os.curdir)
+
+
+def modules_from_graph(graph):
+    """ A module dictionary of the project modules in graph, such as one
+    loaded from a snapshot, with their direct_imports, import_scopes and
+    imported_by pointing at graph.
+    """
+    mod_dict = {}
+    for node, name in enumerate(graph.names):
+        meta = graph.nodes[node]
+        if meta.internal:
+            mod_dict[name] = Module(name, meta.file)
+    attach_views(mod_dict, graph)
+    return mod_dict
+
+
+def print_diff(diff, limit=None):
+    """ Print a graphdiff.GraphDiff, at most limit lines per section. """
+
+    def section(title, lines):
+        lines = list(lines)
+        if not lines:
+            return
+        print("\n{}: {}".format(title, len(lines)))
+        for line in lines[:limit]:
+            print("    " + line)
+        if limit is not None and len(lines) > limit:
+            print("    ... {} more".format(len(lines) - limit))
+
+    if not diff:
+        print("No changes")
+    section("Added modules", diff.added_modules)
+    section("Removed modules", diff.removed_modules)
+    section("Added imports", ("{} -> {}".format(*edge) for edge in diff.added_edges))
+    section(
+        "Removed imports", ("{} -> {}".format(*edge) for edge in diff.removed_edges)
+    )
+    section(
+        "Imports moved",
+        ("{} -> {}: {} -> {}".format(*change) for change in diff.scope_changes),
+    )
+    section("New import cycles", (" -> ".join(c) for _, c in diff.new_cycles))
+    section("Fixed import cycles", (" -> ".join(c) for _, c in diff.fixed_cycles))
+    section(
+        "Import closure size changes",
+        (
+            "{:<50} {:>6} -> {:<6} ({} importer(s))".format(*change)
+            for change in diff.closure_changes
+        ),
+    )
+
+
+def print_critical_path(mod_dict, entry, weight, top=10, import_times=None):
+    """ Print the heaviest chain of module level imports starting at the
+    entry module, and the imports that would save the most if deferred.
+    Weighing by import time needs the import_times of profile_entry().
+    """
+    from analysis import critical_path, node_weights
+
+    graph = graph_of(mod_dict).module_level()
+    names = graph.names
+    if entry not in graph.ids:
+        sys.exit("Unknown entry module: {}".format(entry))
+    weights = node_weights(names, mod_dict, weight, import_times)
+    report = critical_path(graph.succ, weights, graph.ids[entry], top)
+
+    print("\nHeaviest import chain from {} (by {}):".format(entry, weight))
+    for component, comp_weight in report.path:
+        label = " <-> ".join(names[v] for v in component)
+        if len(component) > 1:
+            label = "[cycle] " + label
+        print("    {:<60} {:>12}".format(label, comp_weight))
+    print("    {:<60} {:>12}".format("total", report.total))
+    print("    {:<60} {:>12}".format("everything imported", report.reachable_weight))
+
+    print("\nImports to defer:")
+    for importer, imported, saved, count in report.deferrable:
+        print(
+            "    {} -> {}: saves {} ({} module(s))".format(
+                names[importer], names[imported], saved, count
+            )
+        )
+
+
+def update_modules(
+    mod_dict, root_dir, changes, cache=None, extractor=DEFAULT_EXTRACTOR
+):
+    """ Patch a module dictionary in place after files were changed, added or
+    removed (see watch.Changes), rescanning only those files.
+
+    Adding or removing a module can change how other modules' imports resolve
+    (`from pkg import x` where x is now a module), so in that case every
+    module's deps are re-resolved, from the cache when possible.
+
+    Returns the sorted names of the modules whose direct_imports were updated.
+    """
+    root_dir = os.path.abspath(root_dir)
+    for path in changes.removed:
+        mod_dict.pop(_mod_name(root_dir, path), None)
+    for path in sorted(changes.added):
+        mod_name = _mod_name(root_dir, path)
+        if mod_name not in mod_dict:
+            mod_dict[mod_name] = Module(
+                mod_name, file=path, path=os.path.dirname(path)
+            )
+
+    if changes.added or changes.removed:
+        to_update = set(mod_dict)
+    else:
+        to_update = set(_mod_name(root_dir, path) for path in changes.changed)
+
+    classifier = ModuleClassifier(mod_dict, PY_VERSION)
+    packages = PackageIndex()
+    updated = []
+    for name in sorted(to_update):
+        module = mod_dict.get(name)
+        if module is None:
+            continue
+        scopes = {}
+        try:
+            module.direct_imports = get_fq_immediate_deps(
+                mod_dict, module, cache, classifier, extractor, scopes, packages
+            )
+            module.import_scopes = scopes
+        except (IOError, OSError, SyntaxError, ValueError) as err:
+            # Mid-edit files are expected in watch mode, keep the old edges
+            sys.stderr.write("Skipping {}: {}\n".format(module.__file__, err))
+            continue
+        updated.append(name)
+    if cache is not None:
+        cache.commit()
+    # patched modules hold plain dicts; rebuild the graph so that every
+    # module's views, imported_by included, reflect the update
+    attach_views(mod_dict, graph_of(mod_dict))
+    return updated
+
+
+def write_dot(dag, path=DAG_OUT):
+    """ Atomically write the DOT source of a graphviz graph to path, so that
+    viewers watching the file never see a partial graph.
+    """
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as fp:
+        fp.write(dag.source)
+    os.replace(tmp_path, path)
+
+
+def watch_project(
+    root_dir,
+    mod_dict,
+    cache=None,
+    dot_path=DAG_OUT,
+    extractor=DEFAULT_EXTRACTOR,
+    exclude=(),
+):
+    """ Keep a module dictionary up to date as files in root_dir change,
+    re-emitting the DOT output after every update. Runs until interrupted.
+    """
+    from watch import make_watcher
+
+    def list_files():
+        return [path for _, path in iter_py_files(root_dir, exclude=exclude)]
+
+    project_name = os.path.basename(os.path.abspath(root_dir))
+    write_dot(mod_dict_to_dag(mod_dict, project_name), dot_path)
+    watcher = make_watcher(root_dir, list_files, is_pruned_dir)
+    print("Watching {} ({}), writing {}".format(
+        root_dir, type(watcher).__name__, dot_path
+    ))
+    try:
+        while True:
+            changes = watcher.wait()
+            updated = update_modules(mod_dict, root_dir, changes, cache, extractor)
+            write_dot(mod_dict_to_dag(mod_dict, project_name), dot_path)
+            print("Updated {} module(s): {}".format(len(updated), ", ".join(updated)))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.close()
+
+
+def print_report(mod_dict, root_dir, args):
+    """ Print the module dependencies, and the import time and critical path
+    reports asked for on the command line. Returns the import times, if
+    measured.
+    """
+    print("Module dependencies:")
+    for name, module in sorted(mod_dict.items()):
+        print("\n" + name)
+        for dep in module.direct_imports:
+            scope = module.import_scopes.get(dep, MODULE_SCOPE)
+            if scope == MODULE_SCOPE:
+                print("    " + dep)
+            else:
+                print("    {} ({})".format(dep, scope))
+
+    import_times = None
+    if args.profile_entry:
+        import_times = profile_entry(args.profile_entry, root_dir)
+        attach_import_times(mod_dict, import_times)
+        print("\nSlowest imports (cumulative):")
+        slowest = sorted(import_times.items(), key=lambda item: -item[1][1])
+        for name, (self_us, cumulative_us) in slowest[:20]:
+            print(
+                "    {:<50} {:>10.1f} ms {:>10.1f} ms self".format(
+                    name, cumulative_us / 1000.0, self_us / 1000.0
+                )
+            )
+
+    if args.cycles:
+        print_cycles(mod_dict)
+
+    if args.critical_path:
+        print_critical_path(
+            mod_dict, args.critical_path, args.weight, args.top, import_times
+        )
+
+    return import_times
+
+
+def output_graph(mod_dict, root_dir, project_name, args):
+    """ Print the reports and write the graph of a module dictionary, as
+    asked for on the command line.
+    """
+    if args.skip_deferred:
+        drop_deferred_imports(mod_dict)
+
+    # with --output -, stdout is reserved for the graph
+    report_out = sys.stderr if args.output == "-" else sys.stdout
+    with contextlib.redirect_stdout(report_out):
+        import_times = print_report(mod_dict, root_dir, args)
+
+    distributions = None
+    if args.distributions:
+        from distinfo import distribution_index
+
+        with stats.timer("distribution index"):
+            distributions = distribution_index()
+    if args.format == FORMAT_PDF:
+        with stats.timer("mod_dict_to_dag"):
+            dag = mod_dict_to_dag(
+                mod_dict, project_name, import_times, args.collapse_depth, distributions
+            )
+        with stats.timer("render"):
+            if args.output:
+                dag.render(os.path.splitext(args.output)[0], view=True)
+            else:
+                dag.view()
+        return
+    from render import render_graph
+
+    output = args.output or "{}.{}".format(project_name, args.format)
+    with stats.timer("render"):
+        render_graph(
+            graph_of(mod_dict),
+            output,
+            args.format,
+            project_name,
+            import_times,
+            args.collapse_depth,
+            distributions,
+        )
+    if output != "-":
+        print("\nWrote {}".format(output))
+
+
+def stream_project(root_dir, cache, args):
+    """ Write the imports of the project in root_dir as they are found (see
+    iter_project_edges()), for --stream.
+    """
+    from render import write_edge_stream
+
+    project_name = os.path.basename(os.path.abspath(root_dir))
+    edges = iter_project_edges(
+        root_dir,
+        cache,
+        args.jobs or None,
+        args.extractor,
+        args.exclude,
+        args.io_threads,
+        args.io_buffer * 1024 * 1024,
+    )
+    if args.skip_deferred:
+        edges = (edge for edge in edges if edge[2] == MODULE_SCOPE)
+    output = args.output or "{}.{}".format(project_name, args.format)
+    if output == "-":
+        write_edge_stream(edges, sys.stdout, args.format, project_name)
+        return
+    with open(output, "w") as fp:
+        count = write_edge_stream(edges, fp, args.format, project_name)
+    print("Wrote {} imports to {}".format(count, output))
+
+
 def get_args():
     """ Parse and return command line args. """
+    from analysis import WEIGHT_IMPORTTIME, WEIGHTS
+
     parser = argparse.ArgumentParser(
         description="Visualize imports of a given" " python script."
     )
     parser.add_argument(
         "path",
         type=str,
+        nargs="?",
         help="main python script/entry point for project, or"
         " the root directory of the project",
     )
@@ -290,35 +919,424 @@ def get_args():
         help="alternate root, if the project root differs from"
         " the directory that the main script is in",
     )
-    # TODO implement ability to ignore certain modules
-    # parser.add_argument('-i', '--ignore', dest='ignorefile', type=str,
-    # help='file that contains names of modules to ignore')
-    return parser.parse_args()
+    parser.add_argument(
+        "--no-cache",
+        dest="use_cache",
+        action="store_false",
+        help="don't read or write the import scan cache kept in"
+        " <root>/.import-visualizer",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=1,
+        help="number of processes used to scan files, 0 for one per CPU"
+        " (default: 1)",
+    )
+    parser.add_argument(
+        "--io-threads",
+        type=int,
+        default=0,
+        metavar="N",
+        help="read files on N threads, ahead of the scans, which hides the"
+        " latency of network file systems (default: 0, read each file when"
+        " it is scanned)",
+    )
+    parser.add_argument(
+        "--io-buffer",
+        type=int,
+        default=DEFAULT_IO_BUFFER // (1024 * 1024),
+        metavar="MB",
+        help="with --io-threads, stop reading ahead while MB megabytes of"
+        " files wait to be scanned (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--extractor",
+        choices=sorted(EXTRACTORS),
+        default=DEFAULT_EXTRACTOR,
+        help="how imports are found in each file: compile it and scan the"
+        " bytecode, parse it into a syntax tree, or stream its tokens"
+        " (default: {})".format(DEFAULT_EXTRACTOR),
+    )
+    parser.add_argument(
+        "--skip-deferred",
+        action="store_true",
+        help="leave out imports that don't run when a module is imported:"
+        " those inside functions or `if TYPE_CHECKING:` blocks",
+    )
+    parser.add_argument(
+        "--profile-entry",
+        metavar="SCRIPT",
+        help="run SCRIPT with `python -X importtime` and shade modules by how"
+        " long they take to import",
+    )
+    parser.add_argument(
+        "--cycles",
+        action="store_true",
+        help="report the import cycles between modules (they are drawn in"
+        " red in the graph)",
+    )
+    parser.add_argument(
+        "--critical-path",
+        metavar="MODULE",
+        help="report the heaviest chain of module level imports starting at"
+        " MODULE, and which imports would save the most if deferred",
+    )
+    parser.add_argument(
+        "--weight",
+        choices=WEIGHTS,
+        default=WEIGHTS[0],
+        help="module weight for --critical-path: file size, self import time"
+        " (needs --profile-entry) or bytecode size (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--top",
+        type=int,
+        default=10,
+        help="number of imports to defer reported by --critical-path"
+        " (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--rdeps",
+        metavar="MODULE",
+        help="only list the modules that import MODULE, directly or not."
+        " The graph is kept in <root>/.import-visualizer, so repeated"
+        " queries don't rescan anything until a file changes",
+    )
+    parser.add_argument(
+        "--depth",
+        type=int,
+        help="with --rdeps, only follow this many imports (1 for the"
+        " modules importing MODULE directly)",
+    )
+    parser.add_argument(
+        "-w",
+        "--watch",
+        action="store_true",
+        help="keep running, re-analyzing only the files that change and"
+        " rewriting the DOT output ({}) after each change".format(DAG_OUT),
+    )
+    parser.add_argument(
+        "-f",
+        "--format",
+        choices=FORMATS + (FORMAT_JSONL,),
+        default=DEFAULT_FORMAT,
+        help="output format: a PDF rendered by graphviz, or DOT, node-link"
+        " JSON, GraphML or an interactive HTML page, written without"
+        " graphviz and usable on much larger graphs (default: %(default)s)."
+        " jsonl, one import per line, is for --stream",
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="write the imports as they are found, as jsonl (the default)"
+        " or dot, keeping only the module names in memory, for very large"
+        " projects; reports and graph options don't apply",
+    )
+    parser.add_argument(
+        "--collapse-depth",
+        type=int,
+        metavar="N",
+        help="merge modules into one node per package, keeping the first N"
+        " components of their names; html output can expand packages again,"
+        " and json output writes each package's modules to <output>.d/",
+    )
+    parser.add_argument(
+        "--distributions",
+        action="store_true",
+        help="group the modules imported from installed third party packages"
+        " by the distribution providing them, and give its version; the"
+        " index of installed distributions is cached between runs",
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        help="output file, - for stdout (default: <project name>.<format>)",
+    )
+    parser.add_argument(
+        "--rev",
+        metavar="REV",
+        help="analyze the project as of the git commit REV (a sha, branch or"
+        " tag), reading files straight from the repository instead of the"
+        " working tree, which isn't needed",
+    )
+    parser.add_argument(
+        "--save-graph",
+        metavar="FILE",
+        help="save the import graph to FILE, to be reloaded with --load-graph"
+        " or compared with `vis.py diff`",
+    )
+    parser.add_argument(
+        "--load-graph",
+        metavar="FILE",
+        help="use the graph saved to FILE by --save-graph instead of scanning"
+        " a project",
+    )
+    parser.add_argument(
+        "--exclude",
+        metavar="PATTERN",
+        action="append",
+        default=[],
+        help="leave out the files and directories matching PATTERN, in"
+        " .gitignore syntax relative to the project root (e.g. tests/ or"
+        " '*_pb2.py'); can be repeated. Files ignored by .gitignore are"
+        " always left out",
+    )
+    parser.add_argument(
+        "--stats",
+        action="store_true",
+        help="print where the run's time went to stderr: the time of each"
+        " stage, files/s, bytes read, scan cache hits and the slowest files."
+        " Also turned on by setting ${} to 1 (or to a file for JSON)".format(
+            stats.STATS_ENV
+        ),
+    )
+    parser.add_argument(
+        "--stats-json",
+        metavar="FILE",
+        help="like --stats, but save the stats to FILE as JSON",
+    )
+    parser.add_argument(
+        "--stats-top",
+        type=int,
+        default=stats.DEFAULT_TOP,
+        metavar="N",
+        help="number of slowest files in the stats (default: %(default)s)."
+        " Files scanned with -j are left out",
+    )
+    args = parser.parse_args()
+    if args.rev and (args.watch or args.load_graph):
+        parser.error("--rev can't be used with --watch or --load-graph")
+    if args.path is None and args.load_graph is None:
+        parser.error("a script or project directory is needed, or --load-graph")
+    if args.load_graph and args.watch:
+        parser.error("--watch can't be used with --load-graph")
+    if args.weight == WEIGHT_IMPORTTIME and not args.profile_entry:
+        parser.error("--weight importtime needs --profile-entry")
+    if args.stream:
+        conflicts = [
+            option
+            for option, value in [
+                ("--rev", args.rev),
+                ("--watch", args.watch),
+                ("--load-graph", args.load_graph),
+                ("--save-graph", args.save_graph),
+                ("--rdeps", args.rdeps),
+                ("--cycles", args.cycles),
+                ("--critical-path", args.critical_path),
+                ("--profile-entry", args.profile_entry),
+                ("--collapse-depth", args.collapse_depth),
+                ("--distributions", args.distributions),
+            ]
+            if value
+        ]
+        if conflicts:
+            parser.error("--stream can't be used with {}".format(", ".join(conflicts)))
+        if args.format == DEFAULT_FORMAT:
+            args.format = FORMAT_JSONL
+        elif args.format not in STREAM_FORMATS:
+            parser.error("--stream writes jsonl or dot, not {}".format(args.format))
+    elif args.format == FORMAT_JSONL:
+        parser.error("jsonl output needs --stream")
+    return args
+
+
+def get_diff_args(argv):
+    """ Parse and return the args of `vis.py diff`. """
+    parser = argparse.ArgumentParser(
+        prog="vis.py diff",
+        description="Compare two import graphs saved with --save-graph.",
+    )
+    parser.add_argument("old", help="graph from before the change")
+    parser.add_argument("new", help="graph from after the change")
+    parser.add_argument(
+        "--limit",
+        type=int,
+        default=50,
+        help="most lines printed per section, 0 for all (default: %(default)s)",
+    )
+    return parser.parse_args(argv)
+
+
+def diff_main(argv):
+    from graphdiff import diff_graphs
+
+    args = get_diff_args(argv)
+    old, _, _ = load_saved_graph(args.old)
+    new, _, _ = load_saved_graph(args.new)
+    print_diff(diff_graphs(old, new), args.limit or None)
+
+
+def _get_modules(
+    script, root_dir, source=None, exclude=(), cache=None, extractor=DEFAULT_EXTRACTOR
+):
+    if script:
+        return get_modules_from_file(
+            script, root_dir=root_dir, cache=cache, extractor=extractor
+        )
+    if source is not None:
+        return get_modules_at_rev(source, exclude=exclude)
+    return get_modules_in_dir(root_dir, exclude=exclude)
+
+
+def start_stats(destination, top=stats.DEFAULT_TOP):
+    """ Collect stats for the rest of the run, and report them on exit to
+    stderr if destination is "-" or "1", or else to the JSON file
+    destination.
+    """
+    stats.enable(top)
+    json_path = None if destination in ("-", "1") else destination
+    atexit.register(stats.report, json_path)
 
 
 def main():
 
+    stats_env = os.environ.get(stats.STATS_ENV)
+    if sys.argv[1:2] == ["diff"]:
+        if stats_env:
+            start_stats(stats_env)
+        diff_main(sys.argv[2:])
+        return
+
     args = get_args()
+    if args.stats_json or args.stats:
+        start_stats(args.stats_json or "-", args.stats_top)
+    elif stats_env:
+        start_stats(stats_env, args.stats_top)
+    if args.load_graph:
+        graph, project_name, root_dir = load_saved_graph(args.load_graph)
+        if args.save_graph:
+            save_project_graph(graph, args.save_graph, root_dir)
+        if args.rdeps:
+            if args.skip_deferred:
+                graph = graph.module_level()
+            print_rdeps(graph, args.rdeps, args.depth)
+            return
+        mod_dict = modules_from_graph(graph)
+        output_graph(mod_dict, root_dir, project_name, args)
+        return
+
+    script = None
     if args.path[-3:] == ".py":
         script = args.path
         root_dir = os.path.dirname(args.path)
         if args.alt_root:
             root_dir = args.alt_root
-        mod_dict = get_modules_from_file(script, root_dir=root_dir)
+        if args.watch:
+            sys.exit("--watch needs a project directory, not a script")
+        if args.rev:
+            sys.exit("--rev needs a project directory, not a script")
     else:
         root_dir = args.path
-        mod_dict = get_modules_in_dir(root_dir)
 
-    add_immediate_deps_to_modules(mod_dict)
-    print("Module dependencies:")
-    for name, module in sorted(mod_dict.items()):
-        print("\n" + name)
-        for dep in module.direct_imports:
-            print("    " + dep)
+    source = None
+    if args.rev:
+        try:
+            source = GitSource(root_dir, args.rev)
+        except GitError as e:
+            sys.exit("Can't read revision {}: {}".format(args.rev, e))
+        if not source.blobs:
+            sys.exit("No python files in {} at revision {}".format(root_dir, args.rev))
+
+    if args.use_cache and source is not None:
+        # the working tree may not even have root_dir
+        cache = ScanCache(os.path.join(source.git_dir, CACHE_DIR_NAME), args.extractor)
+    elif args.use_cache:
+        cache = ScanCache.for_root(root_dir, args.extractor)
+    elif args.watch or script:
+        # script mode scans every module twice: to find it, then its deps
+        cache = MemoryScanCache()
+    else:
+        cache = None
+
+    if args.stream:
+        if script:
+            sys.exit("--stream needs a project directory, not a script")
+        try:
+            stream_project(root_dir, cache, args)
+        finally:
+            if cache is not None:
+                cache.close()
+        return
+
+    if args.rdeps:
+        try:
+            if script is None and source is None and args.use_cache:
+                graph = load_project_graph(
+                    root_dir,
+                    cache,
+                    args.jobs or None,
+                    args.extractor,
+                    args.exclude,
+                    args.io_threads,
+                    args.io_buffer * 1024 * 1024,
+                )
+            else:
+                graph = add_immediate_deps_to_modules(
+                    _get_modules(
+                        script,
+                        root_dir,
+                        source,
+                        args.exclude,
+                        cache,
+                        args.extractor,
+                    ),
+                    cache,
+                    jobs=args.jobs or None,
+                    extractor=args.extractor,
+                    source=source,
+                    io_threads=args.io_threads,
+                    io_buffer=args.io_buffer * 1024 * 1024,
+                )
+        finally:
+            if cache is not None:
+                cache.close()
+            if source is not None:
+                source.close()
+        if args.save_graph:
+            save_project_graph(graph, args.save_graph, root_dir)
+        if args.skip_deferred:
+            graph = graph.module_level()
+        print_rdeps(graph, args.rdeps, args.depth)
+        return
+
+    mod_dict = _get_modules(
+        script, root_dir, source, args.exclude, cache, args.extractor
+    )
+    graph = add_immediate_deps_to_modules(
+        mod_dict,
+        cache,
+        jobs=args.jobs or None,
+        extractor=args.extractor,
+        source=source,
+        io_threads=args.io_threads,
+        io_buffer=args.io_buffer * 1024 * 1024,
+    )
+    if source is not None:
+        source.close()
+    if args.save_graph:
+        save_project_graph(graph, args.save_graph, root_dir)
+
+    if args.watch:
+        try:
+            watch_project(
+                root_dir,
+                mod_dict,
+                cache,
+                extractor=args.extractor,
+                exclude=args.exclude,
+            )
+        finally:
+            if cache is not None:
+                cache.close()
+        return
+
+    if cache is not None:
+        cache.close()
 
     project_name = os.path.basename(os.path.abspath(root_dir))
-    dag = mod_dict_to_dag(mod_dict, project_name)
-    dag.view()
+    output_graph(mod_dict, root_dir, project_name, args)
 
 
 if __name__ == "__main__":
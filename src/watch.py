@@ -0,0 +1,190 @@
+""" Watch a project tree for changes to its python files.
+
+Uses inotify (through the optional `inotify_simple` package) when it is
+available, and falls back to polling stat snapshots otherwise. Either way,
+the watcher only reports which .py files were changed, added or removed;
+patching the module graph is up to the caller.
+"""
+
+
+import os
+import time
+
+try:
+    import inotify_simple
+except ImportError:
+    inotify_simple = None
+
+
+def _stat(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_mtime, st.st_size
+
+
+class Changes(object):
+    """ Sets of absolute .py file paths that changed since the last check. """
+
+    def __init__(self, changed=(), added=(), removed=()):
+        self.changed = set(changed)
+        self.added = set(added)
+        self.removed = set(removed)
+
+    def __bool__(self):
+        return bool(self.changed or self.added or self.removed)
+
+    def __repr__(self):
+        return "Changes(changed={}, added={}, removed={})".format(
+            sorted(self.changed), sorted(self.added), sorted(self.removed)
+        )
+
+
+class PollingWatcher(object):
+    """ Detect changes by re-listing the tree and comparing (mtime, size) of
+    every file against the previous snapshot.
+
+    :param list_files: callable returning the absolute paths of all the .py
+    files currently in the project
+    """
+
+    def __init__(self, list_files, interval=1.0):
+        self.list_files = list_files
+        self.interval = interval
+        self.snapshot = self._take_snapshot()
+
+    def _take_snapshot(self):
+        snapshot = {}
+        for path in self.list_files():
+            key = _stat(path)
+            if key is not None:
+                snapshot[path] = key
+        return snapshot
+
+    def poll(self):
+        """ Return the Changes since the last call, possibly empty. """
+        old, new = self.snapshot, self._take_snapshot()
+        self.snapshot = new
+        return Changes(
+            changed=(p for p in new if p in old and new[p] != old[p]),
+            added=(p for p in new if p not in old),
+            removed=(p for p in old if p not in new),
+        )
+
+    def wait(self):
+        """ Block until something changes, and return the Changes. """
+        while True:
+            changes = self.poll()
+            if changes:
+                return changes
+            time.sleep(self.interval)
+
+    def close(self):
+        pass
+
+
+class InotifyWatcher(object):
+    """ Detect changes with inotify watches on every directory in the tree.
+
+    Events are only used to learn which paths were touched; each touched path
+    is then classified by comparing its existence with the set of files known
+    from list_files(), so editors that save through renames are handled the
+    same as in-place writes. New files only count as added if list_files()
+    lists them, so the same ignore rules apply as to the initial listing.
+    """
+
+    def __init__(self, root_dir, list_files, is_ignored_dir=None, delay=0.05):
+        flags = inotify_simple.flags
+        self.mask = (
+            flags.CREATE
+            | flags.DELETE
+            | flags.MODIFY
+            | flags.CLOSE_WRITE
+            | flags.MOVED_FROM
+            | flags.MOVED_TO
+            | flags.DELETE_SELF
+        )
+        self.is_dir = flags.ISDIR
+        self.delay = delay
+        self.is_ignored_dir = is_ignored_dir or (lambda path: False)
+        self.list_files = list_files
+        self.known = set(list_files())
+        self.inotify = inotify_simple.INotify()
+        self.watches = {}
+        self._add_tree(os.path.abspath(root_dir))
+
+    def _add_tree(self, top):
+        """ Watch top and the directories under it, and return the paths of
+        the files in them.
+        """
+        found = []
+        for dirpath, dirs, files in os.walk(top):
+            if self.is_ignored_dir(dirpath):
+                dirs[:] = []
+                continue
+            try:
+                wd = self.inotify.add_watch(dirpath, self.mask)
+            except OSError:
+                continue
+            self.watches[wd] = dirpath
+            found.extend(os.path.join(dirpath, name) for name in files)
+        return found
+
+    def wait(self):
+        """ Block until something changes, and return the Changes. """
+        while True:
+            touched = set()
+            # Wait for the first event, then give the writer a moment to
+            # finish so one save yields one update
+            for event in self.inotify.read(read_delay=int(self.delay * 1000)):
+                top = self.watches.get(event.wd)
+                if top is None or not event.name:
+                    continue
+                path = os.path.join(top, event.name)
+                if event.mask & self.is_dir:
+                    if os.path.isdir(path):
+                        touched.update(self._add_tree(path))
+                    else:
+                        prefix = path + os.sep
+                        touched.update(p for p in self.known if p.startswith(prefix))
+                elif path.endswith(".py"):
+                    touched.add(path)
+            changes = self._classify(touched)
+            if changes:
+                return changes
+
+    def _classify(self, touched):
+        changes = Changes()
+        # the files list_files() would find, listed on the first new file
+        listed = None
+        for path in touched:
+            exists = path.endswith(".py") and os.path.isfile(path)
+            if exists and path in self.known:
+                changes.changed.add(path)
+            elif exists:
+                if listed is None:
+                    listed = set(self.list_files())
+                if path in listed:
+                    changes.added.add(path)
+                    self.known.add(path)
+            elif path in self.known:
+                changes.removed.add(path)
+                self.known.discard(path)
+        return changes
+
+    def close(self):
+        self.inotify.close()
+
+
+def make_watcher(root_dir, list_files, is_ignored_dir=None, interval=1.0):
+    """ Return an InotifyWatcher if inotify is usable here, otherwise a
+    PollingWatcher.
+    """
+    if inotify_simple is not None:
+        try:
+            return InotifyWatcher(root_dir, list_files, is_ignored_dir)
+        except OSError:
+            # e.g. not on Linux, or out of inotify watches
+            pass
+    return PollingWatcher(list_files, interval)